@@ -0,0 +1,741 @@
+"""
+Motor de Alocação
+=================
+
+Este módulo implementa o motor de alocação de professores em disciplinas sem
+depender da interface gráfica. A regra é a mesma da alocação gulosa original:
+as disciplinas são visitadas na ordem da lista e cada uma recebe, entre os
+professores compatíveis, aquele com menos disciplinas alocadas (empates
+resolvidos pela ordem do professor na lista).
+
+Um professor é compatível quando tem a modalidade da disciplina, está
+disponível em todos os horários dela, ainda não atingiu o limite de
+disciplinas e não tem outra disciplina alocada em nenhum desses horários.
+Disciplinas de laboratório também não podem ocupar o laboratório do seu
+prédio num horário já usado por outra disciplina.
+
+Essa é a configuração padrão das regras declarativas de regras.py, que podem
+mudar os limites (por número de disciplinas ou horas semanais), exigir ou
+preferir a área da disciplina, deixar uma modalidade atender outros tipos e
+pesar o custo de cada professor. As regras são compiladas uma vez por
+execução; os heaps abaixo passam a ser por grupo (tipo, área) e ordenados pelo
+custo, e as demais regras são verificadas ao montar e atualizar os heaps.
+
+Em vez de varrer todos os professores para cada disciplina, o motor mantém
+índices durante a execução:
+
+- horários livres de cada professor (disponibilidade menos horários já
+  ocupados) e horários ocupados de cada prédio como máscaras de bits da
+  grade (ver horarios.py), de modo que cada teste de conflito é um `&`;
+- para cada (grupo, horários exigidos) já visto, um heap ordenado por
+  (custo, posição na lista) com os professores que cobrem esses horários;
+  com as regras padrão, o grupo é o tipo da disciplina e o custo, a carga.
+
+Assim, cada disciplina consulta apenas o topo de um heap, e o custo total
+passa a ser O(R·(P + D log P)), onde R é o número de perfis distintos de
+horários das disciplinas (limitado pela grade, e não pelo tamanho dos dados).
+
+Professores com a mesma modalidade e disponibilidade formam uma classe (é o
+caso comum: a disponibilidade vem do produto dias x horários marcados no
+cadastro). Ao montar um heap, só os membros das classes que cobrem os
+horários exigidos são examinados, e os heaps cobertos por cada perfil
+(grupo, horários livres) ficam num cache limitado (LRU), de modo que
+professores que chegam ao mesmo perfil não repetem a varredura dos heaps.
+
+Modos:
+-----
+guloso: Regra original, disciplinas na ordem da lista
+fluxo: Cobertura máxima via fluxo máximo (ver fluxo.py), partindo da solução gulosa
+
+Em qualquer modo, o resultado pode ser refinado por busca local durante um
+tempo limitado (ver refinamento.py), equilibrando as cargas e alocando
+disciplinas que ficaram sem professor.
+
+Classes:
+-------
+CacheCompatibilidade: Heaps cobertos por cada perfil (grupo, horários livres), com limite LRU
+EstadoAlocacao: Cargas, horários ocupados e índices de uma execução
+AlocacaoIncremental: Reparo local da alocação após editar um professor ou disciplina
+
+Funções principais:
+-----------------
+alocar(): Aloca professores às disciplinas usando os índices
+alocar_sequencia(): Aloca, no modo guloso, disciplinas lidas sob demanda
+"""
+
+import heapq
+from collections import Counter, OrderedDict
+from itertools import islice
+
+import fluxo
+import horarios
+import metricas
+import refinamento
+from regras import AREA_EXIGIR, SEM_LIMITE
+from regras import compilar as compilar_regras
+
+# Máximo de disciplinas por professor, quando as regras não definem outro
+MAX_DISCIPLINAS = 4
+
+# Valor gravado nas disciplinas sem professor compatível
+NAO_ALOCADO = "Não alocado"
+
+# Modos de alocação
+MODO_GULOSO = "guloso"
+MODO_FLUXO = "fluxo"
+MODOS = [MODO_GULOSO, MODO_FLUXO]
+
+# Etapas informadas à função de progresso: progresso(etapa, feitas, total)
+ETAPA_GULOSO = "guloso"
+ETAPA_FLUXO = fluxo.ETAPA_FLUXO
+ETAPA_REPARO = "reparo"
+ETAPA_REFINAMENTO = refinamento.ETAPA_REFINAMENTO
+
+# Número de disciplinas entre dois avisos de progresso
+INTERVALO_PROGRESSO = 1000
+
+# Número máximo de perfis (grupo, horários livres) no cache de compatibilidade
+CAPACIDADE_CACHE = 4096
+
+
+# Exceção que a função de progresso pode levantar para interromper a alocação
+class AlocacaoCancelada(Exception):
+    pass
+
+
+# Função para calcular a máscara de horários exigida por uma disciplina (a
+# máscara de cada texto de horário é calculada uma única vez, ver horarios.py)
+def mascara_disciplina(disciplina):
+    return horarios.mascara(disciplina["horario"])
+
+
+# Classe que guarda, para cada perfil (grupo de disciplinas, horários livres),
+# as máscaras exigidas já vistas que esses horários cobrem, isto é, os heaps em
+# que um professor com esse perfil deve estar. As máscaras exigidas de cada
+# grupo só crescem (uma por heap criado), então cada entrada lembra quantas já
+# examinou e só testa as novas. A compatibilidade depende apenas das máscaras,
+# e não dos registros, então uma entrada nunca fica errada: um professor
+# editado passa a outro perfil. As entradas menos usadas são descartadas além
+# da capacidade.
+class CacheCompatibilidade:
+    def __init__(self, exigidas, capacidade=CAPACIDADE_CACHE):
+        # grupo -> máscaras exigidas que têm heap (a lista do estado)
+        self.exigidas = exigidas
+        self.capacidade = capacidade
+        # (grupo, livre) -> (máscaras examinadas, máscaras cobertas)
+        self.perfis = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.verificacoes = 0
+
+    # Máscaras exigidas cobertas pelos horários livres, na ordem de criação dos heaps
+    def cobertas(self, grupo, livre):
+        chave = (grupo, livre)
+        entrada = self.perfis.get(chave)
+        exigidas = self.exigidas.get(grupo, ())
+        if entrada is not None:
+            self.acertos += 1
+            self.perfis.move_to_end(chave)
+            vistas, cobertas = entrada
+            if vistas == len(exigidas):
+                return cobertas
+        else:
+            self.falhas += 1
+            vistas, cobertas = 0, []
+            if len(self.perfis) >= self.capacidade:
+                self.perfis.popitem(last=False)
+        ocupados = ~livre
+        self.verificacoes += len(exigidas) - vistas
+        cobertas.extend([exigida for exigida in islice(exigidas, vistas, None) if not exigida & ocupados])
+        self.perfis[chave] = (len(exigidas), cobertas)
+        return cobertas
+
+
+# Classe que guarda o estado de uma execução: carga, horas e horários livres de
+# cada professor, horários ocupados de cada prédio e um heap por (grupo de
+# disciplinas, horários exigidos) com os professores que podem recebê-las,
+# ordenado por (custo, posição). O grupo é (tipo, área), ver regras.py.
+# As entradas dos heaps são invalidadas de forma preguiçosa: cada professor tem
+# uma versão, incrementada a cada mudança de carga ou de horários livres, e uma
+# entrada (custo, posição, versão) só vale enquanto a versão for a atual. Toda
+# mudança publica novas entradas nos heaps compatíveis. Com o custo padrão (a
+# carga), todos os heaps recebem a mesma entrada.
+class EstadoAlocacao:
+    def __init__(self, professores, max_disciplinas=MAX_DISCIPLINAS, regras=None):
+        self.regras = compilar_regras(regras, max_disciplinas)
+        self.professores = []
+        self.ocupado_predio = {}
+
+        self.carga = []
+        # Horas semanais ocupadas (um horário da grade por hora)
+        self.horas = []
+        self.livre = []
+        self.versao = []
+        self.entrada = []
+        # Dados de cada professor guardados à parte, porque o registro pode ser
+        # alterado antes de redefinir_professor()
+        self.modalidade = []
+        self.area = []
+        self.disponibilidade = []
+        # Limites de disciplinas e de horas semanais de cada professor
+        self.limite = []
+        self.limite_horas = []
+        # Algum professor tem limite de horas (senão as horas não são verificadas)
+        self.limita_horas = False
+        # Há regras além das máscaras e da carga (área exigida, custo por grupo
+        # ou limite de horas); sem elas os heaps são montados e atualizados
+        # pelo caminho mais curto
+        self.restrito = self.regras.area == AREA_EXIGIR or self.regras.custo_por_grupo
+        # modalidade -> disponibilidade -> posições dos professores da classe
+        self.classes = {}
+
+        # (grupo, máscara exigida) -> heap de entradas compatíveis
+        self.heaps = {}
+        # grupo -> máscaras exigidas que já têm heap
+        self.exigidas = {}
+        # modalidade -> grupos com heap que os professores da modalidade atendem
+        self.grupos = {}
+        self.cache = CacheCompatibilidade(self.exigidas)
+
+        # Contadores para as métricas (ver publicar_metricas()): entradas de
+        # professores examinadas e testes de horário (cada `&` entre máscaras)
+        self.candidatos = 0
+        self.verificacoes = 0
+
+        for professor in professores:
+            self._acrescentar(professor)
+
+    def _incluir_na_classe(self, posicao):
+        modalidade = self.modalidade[posicao]
+        if modalidade not in self.grupos:
+            atendidos = self.regras.atende(modalidade)
+            self.grupos[modalidade] = [grupo for grupo in self.exigidas if grupo[0] in atendidos]
+        classes = self.classes.setdefault(modalidade, {})
+        classes.setdefault(self.disponibilidade[posicao], {})[posicao] = None
+
+    def _retirar_da_classe(self, posicao):
+        classes = self.classes[self.modalidade[posicao]]
+        membros = classes[self.disponibilidade[posicao]]
+        del membros[posicao]
+        if not membros:
+            del classes[self.disponibilidade[posicao]]
+
+    # Guardar os dados do professor na posição, sem disciplinas. A entrada
+    # criada ainda não está em nenhum heap (ver _publicar()).
+    def _definir(self, posicao, professor):
+        self.professores[posicao] = professor
+        self.carga[posicao] = 0
+        self.horas[posicao] = 0
+        self.livre[posicao] = self.disponibilidade[posicao] = horarios.mascara(professor["disponibilidade"])
+        self.modalidade[posicao] = professor["modalidade"]
+        self.area[posicao] = professor.get("area_atuacao")
+        self.limite[posicao], self.limite_horas[posicao] = self.regras.limites(professor)
+        if self.limite_horas[posicao] != SEM_LIMITE:
+            self.limita_horas = self.restrito = True
+        self._incluir_na_classe(posicao)
+        self.versao[posicao] += 1
+        self.entrada[posicao] = (0, posicao, self.versao[posicao])
+
+    def _acrescentar(self, professor):
+        posicao = len(self.professores)
+        for dados in (self.professores, self.modalidade, self.area, self.disponibilidade,
+                      self.limite, self.limite_horas, self.entrada):
+            dados.append(None)
+        for dados in (self.carga, self.horas, self.livre, self.versao):
+            dados.append(0)
+        self._definir(posicao, professor)
+        return posicao
+
+    # Verificar as regras que não estão nas máscaras: área exigida e limite de horas
+    def _admite(self, posicao, area, horas):
+        if area is not None and self.area[posicao] != area:
+            return False
+        return horas <= self.limite_horas[posicao] - self.horas[posicao]
+
+    # Entrada de um professor num heap cujo custo depende do grupo
+    def _entrada_grupo(self, posicao, grupo):
+        tipo, area = grupo
+        custo = self.regras.custo(self.carga[posicao], self.horas[posicao],
+                                  area is not None and area != self.area[posicao],
+                                  tipo != self.modalidade[posicao])
+        return (custo, posicao, self.versao[posicao])
+
+    # Heap dos professores que podem receber disciplinas do grupo nos horários
+    # exigidos (montado na primeira consulta). Só as classes cuja modalidade
+    # atende o tipo e cuja disponibilidade cobre os horários são examinadas;
+    # dentro delas, os professores com carga ou horários já ocupados são
+    # verificados um a um.
+    def _heap(self, grupo, exigida):
+        heap = self.heaps.get((grupo, exigida))
+        if heap is None:
+            heap = []
+            regras = self.regras
+            tipo, area = grupo
+            area_exigida = area if regras.area == AREA_EXIGIR else None
+            restrito = self.restrito
+            horas = horarios.contar(exigida)
+            carga = self.carga
+            limite = self.limite
+            livre = self.livre
+            entrada = self.entrada
+            for modalidade, classes in self.classes.items():
+                if tipo not in regras.atende(modalidade):
+                    continue
+                self.verificacoes += len(classes)
+                for disponibilidade, membros in classes.items():
+                    if exigida & ~disponibilidade:
+                        continue
+                    self.candidatos += len(membros)
+                    self.verificacoes += len(membros)
+                    if not restrito:
+                        heap.extend([entrada[posicao] for posicao in membros
+                                     if carga[posicao] < limite[posicao] and exigida & ~livre[posicao] == 0])
+                        continue
+                    for posicao in membros:
+                        if (carga[posicao] < limite[posicao] and exigida & ~livre[posicao] == 0
+                                and self._admite(posicao, area_exigida, horas)):
+                            heap.append(self._entrada_grupo(posicao, grupo) if regras.custo_por_grupo
+                                        else entrada[posicao])
+            heapq.heapify(heap)
+            self.heaps[(grupo, exigida)] = heap
+            if grupo not in self.exigidas:
+                self.exigidas[grupo] = []
+                for modalidade, grupos in self.grupos.items():
+                    if tipo in regras.atende(modalidade):
+                        grupos.append(grupo)
+            self.exigidas[grupo].append(exigida)
+        return heap
+
+    # Criar a entrada atual do professor e inseri-la nos heaps compatíveis
+    def _publicar(self, posicao):
+        versao = self.versao[posicao] + 1
+        self.versao[posicao] = versao
+        carga = self.carga[posicao]
+        regras = self.regras
+        custo = carga if regras.custo is None else regras.custo(carga, self.horas[posicao], False, False)
+        entrada = (custo, posicao, versao)
+        self.entrada[posicao] = entrada
+        if carga >= self.limite[posicao]:
+            return
+        livre = self.livre[posicao]
+        heaps = self.heaps
+        cobertas = self.cache.cobertas
+        grupos = self.grupos[self.modalidade[posicao]]
+        if not self.restrito:
+            for grupo in grupos:
+                for outra in cobertas(grupo, livre):
+                    heapq.heappush(heaps[(grupo, outra)], entrada)
+            return
+
+        area = self.area[posicao]
+        exige_area = regras.area == AREA_EXIGIR
+        horas_livres = self.limite_horas[posicao] - self.horas[posicao]
+        for grupo in grupos:
+            if exige_area and grupo[1] is not None and grupo[1] != area:
+                continue
+            if regras.custo_por_grupo:
+                entrada = self._entrada_grupo(posicao, grupo)
+            for outra in cobertas(grupo, livre):
+                if horarios.contar(outra) <= horas_livres:
+                    heapq.heappush(heaps[(grupo, outra)], entrada)
+
+    # Posição do professor de menor (custo, posição) que pode receber uma
+    # disciplina do grupo nos horários exigidos, ou None
+    def escolher(self, grupo, exigida):
+        heap = self._heap(grupo, exigida)
+        versao = self.versao
+        while heap:
+            self.candidatos += 1
+            entrada = heap[0]
+            if entrada[2] == versao[entrada[1]]:
+                return entrada[1]
+            # Entrada desatualizada
+            heapq.heappop(heap)
+        return None
+
+    # Registrar uma disciplina no professor, ocupando seus horários
+    def ocupar(self, posicao, exigida):
+        self.carga[posicao] += 1
+        self.horas[posicao] += horarios.contar(exigida)
+        self.livre[posicao] &= ~exigida
+        self._publicar(posicao)
+
+    # Desfazer ocupar(): devolver os horários da disciplina ao professor
+    def liberar(self, posicao, exigida):
+        if self.professores[posicao] is None:
+            return
+        self.carga[posicao] -= 1
+        self.horas[posicao] -= horarios.contar(exigida)
+        self.livre[posicao] |= exigida
+        self._publicar(posicao)
+
+    # Incluir um novo professor (sem disciplinas); devolve sua posição
+    def adicionar_professor(self, professor):
+        posicao = self._acrescentar(professor)
+        self._publicar(posicao)
+        return posicao
+
+    # Retirar o professor da posição; suas disciplinas devem ter sido liberadas antes
+    def remover_professor(self, posicao):
+        self._retirar_da_classe(posicao)
+        self.professores[posicao] = None
+        self.modalidade[posicao] = None
+        self.area[posicao] = None
+        self.carga[posicao] = self.horas[posicao] = 0
+        self.limite[posicao] = self.limite_horas[posicao] = 0
+        self.livre[posicao] = 0
+        self.disponibilidade[posicao] = 0
+        # Invalida as entradas do professor nos heaps
+        self.versao[posicao] += 1
+        self.entrada[posicao] = None
+
+    # Substituir os dados do professor da posição (modalidade, área,
+    # disponibilidade e limites podem mudar); suas disciplinas devem ter sido
+    # liberadas antes
+    def redefinir_professor(self, posicao, professor):
+        self.remover_professor(posicao)
+        self._definir(posicao, professor)
+        self._publicar(posicao)
+
+    # Verificar se uma disciplina pode ficar com o professor sem conflito de horário
+    def cabe(self, posicao, disciplina, exigida):
+        self.candidatos += 1
+        self.verificacoes += 1
+        return (self.carga[posicao] < self.limite[posicao]
+                and self.regras.compativel(self.modalidade[posicao], self.area[posicao],
+                                           self.regras.grupo(disciplina))
+                and exigida & ~self.livre[posicao] == 0
+                and horarios.contar(exigida) <= self.limite_horas[posicao] - self.horas[posicao])
+
+    # Verificar se o laboratório do prédio da disciplina está livre nos seus horários
+    def laboratorio_livre(self, disciplina, exigida):
+        if not disciplina.get("necessita_lab") or not disciplina.get("predio"):
+            return True
+        self.verificacoes += 1
+        return self.ocupado_predio.get(disciplina["predio"], 0) & exigida == 0
+
+    def ocupar_laboratorio(self, disciplina, exigida):
+        if disciplina.get("necessita_lab") and disciplina.get("predio"):
+            predio = disciplina["predio"]
+            self.ocupado_predio[predio] = self.ocupado_predio.get(predio, 0) | exigida
+
+    def liberar_laboratorio(self, predio, exigida):
+        if predio in self.ocupado_predio:
+            self.ocupado_predio[predio] &= ~exigida
+
+    # Alocar uma disciplina pela regra gulosa; devolve a posição do professor ou None
+    def alocar(self, disciplina):
+        exigida = mascara_disciplina(disciplina)
+        if not self.laboratorio_livre(disciplina, exigida):
+            return None
+        posicao = self.escolher(self.regras.grupo(disciplina), exigida)
+        if posicao is not None:
+            self.ocupar(posicao, exigida)
+            self.ocupar_laboratorio(disciplina, exigida)
+        return posicao
+
+    # Manter uma escolha já feita, se ela ainda for válida; devolve se foi mantida
+    def fixar(self, disciplina, posicao):
+        exigida = mascara_disciplina(disciplina)
+        if not self.cabe(posicao, disciplina, exigida) or not self.laboratorio_livre(disciplina, exigida):
+            return False
+        self.ocupar(posicao, exigida)
+        self.ocupar_laboratorio(disciplina, exigida)
+        return True
+
+    # Somar os contadores desta execução às métricas (ver metricas.py) e zerá-los
+    def publicar_metricas(self):
+        cache = self.cache
+        metricas.contar("alocacao.candidatos", self.candidatos)
+        metricas.contar("alocacao.verificacoes_horario", self.verificacoes + cache.verificacoes)
+        metricas.contar("alocacao.cache_acertos", cache.acertos)
+        metricas.contar("alocacao.cache_falhas", cache.falhas)
+        self.candidatos = self.verificacoes = 0
+        cache.acertos = cache.falhas = cache.verificacoes = 0
+
+
+# Função geradora que percorre os itens avisando o progresso da etapa a cada
+# INTERVALO_PROGRESSO itens (sem função de progresso, devolve os próprios itens)
+def _acompanhar(itens, etapa, progresso):
+    if progresso is None:
+        yield from itens
+        return
+    total = len(itens)
+    for feitas, item in enumerate(itens):
+        if feitas % INTERVALO_PROGRESSO == 0:
+            progresso(etapa, feitas, total)
+        yield item
+    progresso(etapa, total, total)
+
+
+# Função que executa a regra gulosa e devolve, para cada disciplina, a posição
+# do professor escolhido (ou None), sem alterar os registros
+def alocar_guloso(professores, disciplinas, max_disciplinas=MAX_DISCIPLINAS, progresso=None, regras=None):
+    with metricas.etapa("alocacao.guloso"):
+        estado = EstadoAlocacao(professores, max_disciplinas, regras)
+        escolhas = [estado.alocar(disciplina)
+                    for disciplina in _acompanhar(disciplinas, ETAPA_GULOSO, progresso)]
+        estado.publicar_metricas()
+    return escolhas
+
+
+# Função que mantém as escolhas propostas que não geram conflito e aloca as
+# demais disciplinas pela regra gulosa sobre o estado resultante
+@metricas.etapa("alocacao.reparo")
+def reparar_escolhas(professores, disciplinas, propostas, max_disciplinas=MAX_DISCIPLINAS, progresso=None,
+                     regras=None):
+    estado = EstadoAlocacao(professores, max_disciplinas, regras)
+    escolhas = [None] * len(disciplinas)
+    pendentes = []
+    for i in _acompanhar(range(len(disciplinas)), ETAPA_REPARO, progresso):
+        posicao = propostas[i]
+        if posicao is not None and estado.fixar(disciplinas[i], posicao):
+            escolhas[i] = posicao
+        else:
+            pendentes.append(i)
+    for i in pendentes:
+        escolhas[i] = estado.alocar(disciplinas[i])
+    estado.publicar_metricas()
+    return escolhas
+
+
+# Função para gravar uma escolha na disciplina e no professor escolhido
+def _registrar(professores, disciplina, posicao):
+    if posicao is None:
+        disciplina["professor_alocado"] = NAO_ALOCADO
+    else:
+        professor_escolhido = professores[posicao]
+        disciplina["professor_alocado"] = professor_escolhido["nome"]
+        professor_escolhido["disciplinas_alocadas"].append(disciplina["nome"])
+
+
+# Função geradora que aloca disciplinas lidas sob demanda (por exemplo, de um
+# arquivo), pela regra gulosa, devolvendo cada uma já com o professor alocado.
+# Só o índice de professores fica em memória, e não a lista de disciplinas.
+def alocar_sequencia(professores, disciplinas, max_disciplinas=MAX_DISCIPLINAS, regras=None):
+    for professor in professores:
+        professor["disciplinas_alocadas"] = []
+
+    estado = EstadoAlocacao(professores, max_disciplinas, regras)
+    total = alocadas = 0
+    for disciplina in disciplinas:
+        posicao = estado.alocar(disciplina)
+        _registrar(professores, disciplina, posicao)
+        total += 1
+        alocadas += posicao is not None
+        yield disciplina
+    estado.publicar_metricas()
+    metricas.contar("alocacao.disciplinas", total)
+    metricas.contar("alocacao.alocadas", alocadas)
+
+
+# Função para gravar nas estruturas de dados as escolhas calculadas
+@metricas.etapa("alocacao.aplicar")
+def aplicar_escolhas(professores, disciplinas, escolhas):
+    # Limpar alocações anteriores
+    for professor in professores:
+        professor["disciplinas_alocadas"] = []
+
+    for disciplina, posicao in zip(disciplinas, escolhas):
+        _registrar(professores, disciplina, posicao)
+
+
+def _contar_alocadas(escolhas):
+    return sum(1 for posicao in escolhas if posicao is not None)
+
+
+# Função para alocar professores às disciplinas usando os índices. A função
+# opcional progresso(etapa, feitas, total) é chamada periodicamente e pode
+# levantar AlocacaoCancelada para interromper a alocação antes de qualquer
+# registro ser alterado. As regras (ver regras.py) podem ser um dicionário ou
+# já compiladas; sem elas vale a regra original, com max_disciplinas. Com
+# tempo_refinamento (em segundos), o resultado é refinado por busca local
+# sorteada com a semente (ver refinamento.py); o objetivo antes e depois fica
+# nas métricas "refinamento.*".
+@metricas.etapa("alocacao")
+def alocar(professores, disciplinas, max_disciplinas=MAX_DISCIPLINAS, modo=MODO_GULOSO, progresso=None,
+           regras=None, tempo_refinamento=0, semente=None):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de alocação desconhecido: {modo}")
+    regras = compilar_regras(regras, max_disciplinas)
+
+    escolhas = alocar_guloso(professores, disciplinas, max_disciplinas, progresso, regras)
+
+    if modo == MODO_FLUXO:
+        # O fluxo máximo trata apenas os limites de disciplinas; os conflitos de
+        # horário e o limite de horas da proposta são reparados e fica a melhor
+        # das duas soluções
+        with metricas.etapa("alocacao.fluxo"):
+            propostas = fluxo.maximizar_cobertura(professores, disciplinas, escolhas, regras, progresso)
+        reparadas = reparar_escolhas(professores, disciplinas, propostas, max_disciplinas, progresso, regras)
+        if _contar_alocadas(reparadas) > _contar_alocadas(escolhas):
+            escolhas = reparadas
+
+    if tempo_refinamento:
+        with metricas.etapa("alocacao.refinamento"):
+            escolhas, relatorio = refinamento.refinar(professores, disciplinas, escolhas, regras,
+                                                      tempo_refinamento, semente=semente, progresso=progresso)
+        for momento in ("antes", "depois"):
+            for medida, valor in relatorio[momento].items():
+                metricas.definir(f"refinamento.{medida}_{momento}", valor)
+        metricas.contar("refinamento.movimentos", relatorio["movimentos"])
+        metricas.contar("refinamento.aceitos", relatorio["aceitos"])
+
+    aplicar_escolhas(professores, disciplinas, escolhas)
+    metricas.contar("alocacao.disciplinas", len(disciplinas))
+    metricas.contar("alocacao.alocadas", _contar_alocadas(escolhas))
+    return disciplinas
+
+
+# Função que devolve a posição do professor a quem uma disciplina foi gravada:
+# entre os professores com o nome gravado, o primeiro que ainda tem a disciplina
+# na sua lista de alocadas, ou o primeiro com o nome se nenhum a tiver
+def _posicao_gravada(posicoes, gravadas, nome):
+    if not posicoes:
+        return None
+    posicao = next((p for p in posicoes if gravadas[p][nome] > 0), posicoes[0])
+    if gravadas[posicao][nome] > 0:
+        gravadas[posicao][nome] -= 1
+    return posicao
+
+
+# Classe que mantém uma alocação já feita e a repara localmente a cada alteração
+# de professor ou disciplina, sem refazer a alocação inteira. Só as disciplinas
+# afetadas (as do professor editado ou excluído, ou a disciplina nova ou
+# editada) são realocadas pela regra gulosa; as demais alocações não mudam.
+# Todas as inclusões, edições e exclusões devem passar por esta classe enquanto
+# ela estiver em uso.
+class AlocacaoIncremental:
+    def __init__(self, professores, disciplinas, max_disciplinas=MAX_DISCIPLINAS, regras=None):
+        self.estado = EstadoAlocacao(professores, max_disciplinas, regras)
+        self.posicao = {id(p): posicao for posicao, p in enumerate(professores)}
+        # id(disciplina) -> (disciplina, posição do professor, máscara exigida, prédio do laboratório)
+        self.reservas = {}
+        # posição do professor -> disciplinas alocadas a ele
+        self.por_professor = {}
+        # Registros alterados desde a última chamada a drenar_alterados()
+        self.professores_alterados = {}
+        self.disciplinas_alteradas = {}
+
+        # Posições dos professores de cada nome e as disciplinas gravadas na
+        # lista de cada um, que distinguem os professores de mesmo nome
+        posicoes_por_nome = {}
+        gravadas = []
+        for posicao, professor in enumerate(professores):
+            posicoes_por_nome.setdefault(professor["nome"], []).append(posicao)
+            gravadas.append(Counter(professor.get("disciplinas_alocadas") or ()))
+            professor["disciplinas_alocadas"] = []
+
+        # Reconstruir o estado a partir das alocações gravadas; as que deixaram de
+        # ser válidas (professor inexistente ou conflito) são refeitas
+        invalidas = []
+        for disciplina in disciplinas:
+            alocado = disciplina.get("professor_alocado")
+            if alocado is None or alocado == NAO_ALOCADO:
+                continue
+            posicao = _posicao_gravada(posicoes_por_nome.get(alocado), gravadas, disciplina["nome"])
+            exigida = mascara_disciplina(disciplina)
+            if (posicao is not None and self.estado.cabe(posicao, disciplina, exigida)
+                    and self.estado.laboratorio_livre(disciplina, exigida)):
+                self._reservar(disciplina, posicao, exigida)
+            else:
+                invalidas.append(disciplina)
+        self.drenar_alterados()
+        for disciplina in invalidas:
+            self.alocar_disciplina(disciplina)
+
+    def _reservar(self, disciplina, posicao, exigida):
+        self.estado.ocupar(posicao, exigida)
+        self.estado.ocupar_laboratorio(disciplina, exigida)
+        predio = disciplina["predio"] if disciplina.get("necessita_lab") and disciplina.get("predio") else None
+        self.reservas[id(disciplina)] = (disciplina, posicao, exigida, predio)
+        self.por_professor.setdefault(posicao, []).append(disciplina)
+
+        professor = self.estado.professores[posicao]
+        disciplina["professor_alocado"] = professor["nome"]
+        professor["disciplinas_alocadas"].append(disciplina["nome"])
+        self.professores_alterados[id(professor)] = professor
+        self.disciplinas_alteradas[id(disciplina)] = disciplina
+
+    # Alocar uma disciplina pela regra gulosa; devolve o professor escolhido ou None
+    def alocar_disciplina(self, disciplina):
+        exigida = mascara_disciplina(disciplina)
+        posicao = None
+        if self.estado.laboratorio_livre(disciplina, exigida):
+            posicao = self.estado.escolher(self.estado.regras.grupo(disciplina), exigida)
+        if posicao is None:
+            disciplina["professor_alocado"] = NAO_ALOCADO
+            self.disciplinas_alteradas[id(disciplina)] = disciplina
+            return None
+        self._reservar(disciplina, posicao, exigida)
+        return self.estado.professores[posicao]
+
+    # Desfazer a alocação de uma disciplina, devolvendo os horários ao professor
+    def liberar_disciplina(self, disciplina):
+        reserva = self.reservas.get(id(disciplina))
+        if reserva is None or reserva[0] is not disciplina:
+            return
+        del self.reservas[id(disciplina)]
+        _, posicao, exigida, predio = reserva
+
+        self.estado.liberar(posicao, exigida)
+        if predio:
+            self.estado.liberar_laboratorio(predio, exigida)
+        self.por_professor[posicao] = [d for d in self.por_professor[posicao] if d is not disciplina]
+
+        professor = self.estado.professores[posicao]
+        if disciplina["nome"] in professor["disciplinas_alocadas"]:
+            professor["disciplinas_alocadas"].remove(disciplina["nome"])
+        disciplina["professor_alocado"] = None
+        self.professores_alterados[id(professor)] = professor
+        self.disciplinas_alteradas[id(disciplina)] = disciplina
+
+    def adicionar_disciplina(self, disciplina):
+        return self.alocar_disciplina(disciplina)
+
+    def remover_disciplina(self, disciplina):
+        self.liberar_disciplina(disciplina)
+
+    # Aplicar os campos alterados e realocar apenas esta disciplina
+    def editar_disciplina(self, disciplina, campos):
+        self.liberar_disciplina(disciplina)
+        disciplina.update(campos)
+        return self.alocar_disciplina(disciplina)
+
+    def adicionar_professor(self, professor):
+        professor["disciplinas_alocadas"] = []
+        self.posicao[id(professor)] = self.estado.adicionar_professor(professor)
+
+    def _liberar_professor(self, professor):
+        posicao = self.posicao[id(professor)]
+        afetadas = list(self.por_professor.get(posicao, ()))
+        for disciplina in afetadas:
+            self.liberar_disciplina(disciplina)
+        return posicao, afetadas
+
+    # Excluir o professor e realocar as disciplinas que eram dele; devolve essas disciplinas
+    def remover_professor(self, professor):
+        posicao, afetadas = self._liberar_professor(professor)
+        self.estado.remover_professor(posicao)
+        del self.posicao[id(professor)]
+        for disciplina in afetadas:
+            self.alocar_disciplina(disciplina)
+        return afetadas
+
+    # Aplicar os campos alterados e realocar as disciplinas que eram do professor
+    def editar_professor(self, professor, campos):
+        posicao, afetadas = self._liberar_professor(professor)
+        professor.update(campos)
+        self.estado.redefinir_professor(posicao, professor)
+        for disciplina in afetadas:
+            self.alocar_disciplina(disciplina)
+        return afetadas
+
+    # Devolver (e esquecer) os professores e disciplinas alterados desde a última chamada
+    def drenar_alterados(self):
+        self.estado.publicar_metricas()
+        professores = list(self.professores_alterados.values())
+        disciplinas = list(self.disciplinas_alteradas.values())
+        self.professores_alterados.clear()
+        self.disciplinas_alteradas.clear()
+        return professores, disciplinas
@@ -0,0 +1,461 @@
+"""
+Armazenamento dos Dados
+=======================
+
+Backends de persistência com a mesma interface, usados por nucleo.py:
+
+- ArmazenamentoJSON: professores.json e disciplinas.json como instantâneos,
+  mais o diário de alterações (ver diario.py). É o padrão.
+- ArmazenamentoSQLite: um banco SQLite (módulo sqlite3 da biblioteca padrão)
+  com tabelas de professores, disponibilidade, disciplinas, horários das
+  disciplinas, alocações e disciplinas alocadas a cada professor, indexadas por nome, modalidade, horário e prédio.
+  Um mesmo banco pode ser compartilhado entre a interface gráfica e as
+  tarefas em lote (cli.py --banco).
+
+Interface comum:
+--------------
+carregar(parcial=None): Devolve (professores, disciplinas) como listas de
+    registros; parcial(colecao, registros), se informada, recebe os registros
+    em lotes à medida que são lidos
+salvar(professores, disciplinas): Grava todos os dados de uma vez
+salvar_alocacoes(professores, disciplinas): Grava o resultado de uma alocação
+registrar(operacoes): Grava operações de registros individuais (Diario.salvar/remover)
+pendentes: Operações registradas desde a última gravação completa
+"""
+
+import os
+import sqlite3
+import threading
+
+from diario import OP_SALVAR, Diario, gravar_atomico
+from horarios import normalizar_campos
+from importacao import iterar_array_json
+from registros import Disciplina, Professor
+
+# Registros entregues de cada vez ao carregar aos poucos (carregar(parcial=...))
+LOTE_CARREGAMENTO = 2000
+
+
+# Função para montar os registros carregados: os que vieram do diário ainda
+# são dicionários e viram registros compactos (ver registros.py), com os
+# textos de horário repetidos num único objeto compartilhado e máscaras de bits
+# convertidas em texto (os lidos dos instantâneos já chegam assim)
+def _montar(professores, disciplinas):
+    for lista, classe in ((professores, Professor), (disciplinas, Disciplina)):
+        for posicao, registro in enumerate(lista):
+            if type(registro) is not classe:
+                lista[posicao] = normalizar_campos(classe(registro))
+
+
+# Função para dar um id (ver registros.py) aos registros que não têm, gravados
+# antes dos identificadores; devolve quantos receberam
+def _identificar(registros):
+    proximo = max((registro.get("id") or 0 for registro in registros), default=0) + 1
+    identificados = 0
+    for registro in registros:
+        if registro.get("id") is None:
+            registro["id"] = proximo
+            proximo += 1
+            identificados += 1
+    return identificados
+
+
+# Função que compara os ids gravados (em ordem) com os dos registros em memória
+def _mesmos_ids(gravados, registros):
+    ids = [registro.get("id") for registro in registros]
+    return None not in ids and sorted(ids) == gravados
+
+
+# Backend de arquivos JSON com diário de alterações
+class ArmazenamentoJSON:
+    def __init__(self, professores_file, disciplinas_file, diario_file):
+        self.professores_file = professores_file
+        self.disciplinas_file = disciplinas_file
+        self.diario = Diario(diario_file)
+
+    @property
+    def pendentes(self):
+        return self.diario.entradas
+
+    # Função para ler um instantâneo registro a registro; com parcial, cada
+    # lote de LOTE_CARREGAMENTO registros é entregue assim que é lido. Os
+    # registros de um instantâneo gravado antes dos ids recebem o seu ao serem
+    # lidos, para chegarem às tabelas já identificados (as compactações gravam
+    # todos os registros com id, então um instantâneo não mistura os dois).
+    # Devolve os registros e quantos receberam um id.
+    def _ler(self, caminho, classe, colecao, parcial):
+        registros = []
+        identificados = 0
+        if not os.path.exists(caminho):
+            return registros, identificados
+        maior = 0
+        with open(caminho, "r", encoding="utf-8") as f:
+            for campos in iterar_array_json(f):
+                registro = normalizar_campos(classe(campos))
+                if registro.get("id") is None:
+                    registro["id"] = maior + 1
+                    identificados += 1
+                maior = max(maior, registro["id"])
+                registros.append(registro)
+                if parcial is not None and len(registros) % LOTE_CARREGAMENTO == 0:
+                    parcial(colecao, registros[-LOTE_CARREGAMENTO:])
+        if parcial is not None and len(registros) % LOTE_CARREGAMENTO:
+            parcial(colecao, registros[-(len(registros) % LOTE_CARREGAMENTO):])
+        return registros, identificados
+
+    def carregar(self, parcial=None):
+        # Concluir uma compactação interrompida por falha, se houver
+        self.diario.recuperar()
+
+        professores, professores_identificados = self._ler(self.professores_file, Professor, "professores",
+                                                           parcial)
+        disciplinas, disciplinas_identificadas = self._ler(self.disciplinas_file, Disciplina, "disciplinas",
+                                                           parcial)
+
+        # Atualizar disciplinas antigas que não têm a chave 'predio'. O
+        # instantâneo só é regravado quando alguma precisou ser atualizada, e
+        # antes de reaplicar o diário, que continua valendo sobre ele.
+        migradas = 0
+        for disciplina in disciplinas:
+            if "predio" not in disciplina:
+                disciplina["predio"] = None
+                migradas += 1
+        if migradas:
+            gravar_atomico(self.disciplinas_file, disciplinas)
+
+        # Reaplicar as alterações feitas depois do último instantâneo
+        self.diario.aplicar({"professores": professores, "disciplinas": disciplinas})
+
+        _montar(professores, disciplinas)
+
+        # Os ids dados agora (na leitura ou aos registros incluídos pelo diário)
+        # só valem para o diário depois de gravados nos instantâneos, então
+        # dados antigos são compactados uma vez
+        identificados = professores_identificados + disciplinas_identificadas
+        if identificados + _identificar(professores) + _identificar(disciplinas):
+            self.salvar(professores, disciplinas)
+        return professores, disciplinas
+
+    # Compactação: regrava os instantâneos e esvazia o diário, de forma segura contra falhas
+    def salvar(self, professores, disciplinas):
+        self.diario.compactar({self.professores_file: professores, self.disciplinas_file: disciplinas})
+
+    def salvar_alocacoes(self, professores, disciplinas):
+        self.salvar(professores, disciplinas)
+
+    def registrar(self, operacoes):
+        self.diario.registrar(operacoes)
+
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS professores (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    area_atuacao TEXT,
+    modalidade TEXT
+);
+CREATE TABLE IF NOT EXISTS disponibilidade (
+    professor_id INTEGER NOT NULL REFERENCES professores(id) ON DELETE CASCADE,
+    ordem INTEGER NOT NULL,
+    horario TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS disciplinas (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    tipo TEXT,
+    necessita_lab INTEGER NOT NULL DEFAULT 0,
+    predio TEXT,
+    horario TEXT
+);
+CREATE TABLE IF NOT EXISTS horarios_disciplina (
+    disciplina_id INTEGER NOT NULL REFERENCES disciplinas(id) ON DELETE CASCADE,
+    horario TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alocacoes (
+    disciplina_id INTEGER PRIMARY KEY REFERENCES disciplinas(id) ON DELETE CASCADE,
+    professor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS disciplinas_alocadas (
+    professor_id INTEGER NOT NULL REFERENCES professores(id) ON DELETE CASCADE,
+    ordem INTEGER NOT NULL,
+    disciplina TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_professores_nome ON professores(nome);
+CREATE INDEX IF NOT EXISTS idx_professores_modalidade ON professores(modalidade);
+CREATE INDEX IF NOT EXISTS idx_disponibilidade_professor ON disponibilidade(professor_id);
+CREATE INDEX IF NOT EXISTS idx_disponibilidade_horario ON disponibilidade(horario, professor_id);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_nome ON disciplinas(nome);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_tipo ON disciplinas(tipo);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_predio ON disciplinas(predio);
+CREATE INDEX IF NOT EXISTS idx_horarios_disciplina_disciplina ON horarios_disciplina(disciplina_id);
+CREATE INDEX IF NOT EXISTS idx_horarios_disciplina_horario ON horarios_disciplina(horario, disciplina_id);
+CREATE INDEX IF NOT EXISTS idx_alocacoes_professor ON alocacoes(professor);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_alocadas_professor ON disciplinas_alocadas(professor_id);
+"""
+
+# Colunas dos campos opcionais das regras de alocação (ver regras.py),
+# acrescentadas também aos bancos criados antes delas
+COLUNAS_OPCIONAIS = {
+    "professores": (("max_disciplinas", "NUMERIC"), ("max_horas", "NUMERIC")),
+    "disciplinas": (("area_atuacao", "TEXT"),),
+}
+
+COLUNAS_PROFESSOR = "p.id, p.nome, p.area_atuacao, p.modalidade, p.max_disciplinas, p.max_horas"
+COLUNAS_DISCIPLINA = "d.id, d.nome, d.tipo, d.necessita_lab, d.predio, d.horario, d.area_atuacao, a.professor"
+
+
+# Função para copiar para o registro os campos opcionais gravados (os nulos
+# ficam ausentes, como nos arquivos JSON)
+def _opcionais(registro, colecao, valores):
+    for (campo, _), valor in zip(COLUNAS_OPCIONAIS[colecao], valores):
+        if valor is not None:
+            registro[campo] = valor
+    return registro
+
+
+# Backend SQLite. O id de cada linha é o campo "id" do registro (ver
+# registros.py), pelo qual as edições e exclusões acham a linha, já que os
+# nomes podem se repetir. A ordem das listas é a ordem dos ids: registros
+# novos recebem o maior id, como a posição na lista em memória. A lista de
+# disciplinas alocadas de cada professor é gravada como está em memória, na
+# mesma ordem, pelo id do professor.
+class ArmazenamentoSQLite:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.pendentes = 0
+        self._trava = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA foreign_keys = ON")
+        self._conexao.execute("PRAGMA journal_mode = WAL")
+        tabelas = {nome for (nome,) in self._conexao.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self._conexao.executescript(ESQUEMA_SQLITE)
+        self._migrar(antigo="professores" in tabelas and "disciplinas_alocadas" not in tabelas)
+
+    # Acrescentar as colunas opcionais que faltam num banco antigo e, num banco
+    # sem a tabela de disciplinas alocadas, preenchê-la a partir das alocações
+    # (cada disciplina no primeiro professor com o nome, na ordem dos ids)
+    def _migrar(self, antigo=False):
+        with self._conexao:
+            for tabela, colunas in COLUNAS_OPCIONAIS.items():
+                existentes = {linha[1] for linha in self._conexao.execute(f"PRAGMA table_info({tabela})")}
+                for coluna, tipo in colunas:
+                    if coluna not in existentes:
+                        self._conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+            if antigo:
+                self._conexao.execute(
+                    "INSERT INTO disciplinas_alocadas (professor_id, ordem, disciplina) "
+                    "SELECT p.id, d.id, d.nome FROM alocacoes a "
+                    "JOIN disciplinas d ON d.id = a.disciplina_id "
+                    "JOIN professores p ON p.id = (SELECT MIN(id) FROM professores WHERE nome = a.professor)")
+
+    def fechar(self):
+        self._conexao.close()
+
+    # Funções geradoras que montam os registros a partir das linhas do banco
+    def _ler_professores(self, condicao="", parametros=()):
+        disponibilidade = {}
+        for id_professor, horario in self._conexao.execute(
+                f"SELECT s.professor_id, s.horario FROM disponibilidade s "
+                f"JOIN professores p ON p.id = s.professor_id {condicao} ORDER BY s.professor_id, s.ordem",
+                parametros):
+            disponibilidade.setdefault(id_professor, []).append(horario)
+        alocadas = {}
+        for id_professor, disciplina in self._conexao.execute(
+                f"SELECT s.professor_id, s.disciplina FROM disciplinas_alocadas s "
+                f"JOIN professores p ON p.id = s.professor_id {condicao} ORDER BY s.professor_id, s.ordem",
+                parametros):
+            alocadas.setdefault(id_professor, []).append(disciplina)
+        cursor = self._conexao.execute(
+            f"SELECT {COLUNAS_PROFESSOR} FROM professores p {condicao} ORDER BY p.id", parametros)
+        for id_professor, nome, area_atuacao, modalidade, *opcionais in cursor:
+            yield normalizar_campos(_opcionais(Professor(
+                id=id_professor,
+                nome=nome,
+                area_atuacao=area_atuacao,
+                disponibilidade=disponibilidade.get(id_professor, []),
+                modalidade=modalidade,
+                disciplinas_alocadas=alocadas.get(id_professor, [])
+            ), "professores", opcionais))
+
+    def _ler_disciplinas(self, condicao="", parametros=()):
+        cursor = self._conexao.execute(
+            f"SELECT {COLUNAS_DISCIPLINA} FROM disciplinas d "
+            f"LEFT JOIN alocacoes a ON a.disciplina_id = d.id {condicao} ORDER BY d.id", parametros)
+        for id_disciplina, nome, tipo, necessita_lab, predio, horario, area_atuacao, professor in cursor:
+            yield normalizar_campos(_opcionais(Disciplina(
+                id=id_disciplina,
+                nome=nome,
+                tipo=tipo,
+                necessita_lab=bool(necessita_lab),
+                predio=predio,
+                horario=horario,
+                professor_alocado=professor
+            ), "disciplinas", (area_atuacao,)))
+
+    def carregar(self, parcial=None):
+        with self._trava:
+            professores = list(self._ler_professores())
+            disciplinas = list(self._ler_disciplinas())
+        # A leitura é feita sob a trava, então os lotes são entregues depois dela
+        if parcial is not None:
+            for colecao, registros in (("professores", professores), ("disciplinas", disciplinas)):
+                for inicio in range(0, len(registros), LOTE_CARREGAMENTO):
+                    parcial(colecao, registros[inicio:inicio + LOTE_CARREGAMENTO])
+        return professores, disciplinas
+
+    # Funções geradoras dos registros na ordem gravada, lidos aos poucos do banco
+    def iterar_professores(self):
+        yield from self._ler_professores()
+
+    def iterar_disciplinas(self):
+        yield from self._ler_disciplinas()
+
+    # Inserir um registro com o id informado ou o seu (sem id, o banco escolhe o próximo)
+    def _inserir_professor(self, professor, id_professor=None):
+        cursor = self._conexao.execute(
+            "INSERT INTO professores (id, nome, area_atuacao, modalidade, max_disciplinas, max_horas)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (professor.get("id") if id_professor is None else id_professor, professor["nome"],
+             professor.get("area_atuacao"), professor.get("modalidade"),
+             professor.get("max_disciplinas"), professor.get("max_horas")))
+        self._conexao.executemany(
+            "INSERT INTO disponibilidade (professor_id, ordem, horario) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, ordem, horario)
+             for ordem, horario in enumerate(professor.get("disponibilidade", []))])
+        self._inserir_alocadas(cursor.lastrowid, professor)
+
+    def _inserir_alocadas(self, id_professor, professor):
+        self._conexao.executemany(
+            "INSERT INTO disciplinas_alocadas (professor_id, ordem, disciplina) VALUES (?, ?, ?)",
+            [(id_professor, ordem, disciplina)
+             for ordem, disciplina in enumerate(professor.get("disciplinas_alocadas") or [])])
+
+    def _inserir_disciplina(self, disciplina, id_disciplina=None):
+        horario = disciplina.get("horario") or ""
+        cursor = self._conexao.execute(
+            "INSERT INTO disciplinas (id, nome, tipo, necessita_lab, predio, horario, area_atuacao)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (disciplina.get("id") if id_disciplina is None else id_disciplina, disciplina["nome"],
+             disciplina.get("tipo"), int(bool(disciplina.get("necessita_lab"))),
+             disciplina.get("predio"), horario, disciplina.get("area_atuacao")))
+        self._conexao.executemany(
+            "INSERT INTO horarios_disciplina (disciplina_id, horario) VALUES (?, ?)",
+            [(cursor.lastrowid, h) for h in horario.split(", ") if h])
+        if disciplina.get("professor_alocado") is not None:
+            self._conexao.execute("INSERT INTO alocacoes (disciplina_id, professor) VALUES (?, ?)",
+                                  (cursor.lastrowid, disciplina["professor_alocado"]))
+
+    # Gravação completa numa única transação
+    def salvar(self, professores, disciplinas):
+        with self._trava, self._conexao:
+            for tabela in ("alocacoes", "horarios_disciplina", "disciplinas", "disciplinas_alocadas",
+                           "disponibilidade", "professores"):
+                self._conexao.execute(f"DELETE FROM {tabela}")
+            for professor in professores:
+                self._inserir_professor(professor)
+            for disciplina in disciplinas:
+                self._inserir_disciplina(disciplina)
+        self.pendentes = 0
+
+    # Ids gravados de uma coleção, em ordem
+    def _ids(self, colecao):
+        return [id_registro for (id_registro,) in
+                self._conexao.execute(f"SELECT id FROM {colecao} ORDER BY id")]
+
+    # Gravar os pares (id da disciplina, professor alocado) e, com os
+    # professores, as listas de disciplinas alocadas a eles; sob a trava e
+    # dentro de uma transação
+    def _gravar_alocacoes(self, pares, professores):
+        self._conexao.execute("DELETE FROM alocacoes")
+        self._conexao.executemany(
+            "INSERT INTO alocacoes (disciplina_id, professor) VALUES (?, ?)",
+            ((id_disciplina, professor) for id_disciplina, professor in pares if professor is not None))
+        if professores is not None:
+            self._conexao.execute("DELETE FROM disciplinas_alocadas")
+            for professor in professores:
+                if professor.get("id") is not None:
+                    self._inserir_alocadas(professor["id"], professor)
+
+    # Gravar os professores alocados (um nome, "Não alocado" ou None por
+    # disciplina, na ordem gravada) e, com os professores (lidos do banco, com
+    # id), as listas de disciplinas alocadas a eles, numa única transação
+    def gravar_alocacoes(self, alocados, professores=None):
+        with self._trava, self._conexao:
+            self._gravar_alocacoes(zip(self._ids("disciplinas"), alocados), professores)
+
+    # Só as tabelas de alocações mudam, gravadas pelo id de cada registro; se
+    # os registros em memória não são os gravados (ids diferentes), grava tudo
+    def salvar_alocacoes(self, professores, disciplinas):
+        with self._trava, self._conexao:
+            mesmos = all(_mesmos_ids(self._ids(colecao), registros)
+                         for colecao, registros in (("professores", professores), ("disciplinas", disciplinas)))
+            if mesmos:
+                self._gravar_alocacoes(((d["id"], d.get("professor_alocado")) for d in disciplinas),
+                                       professores)
+        if not mesmos:
+            self.salvar(professores, disciplinas)
+
+    # Substituir a linha do registro (a do seu id, ou a inclui). As operações
+    # sem id, gravadas antes dos identificadores, acham a linha pelo nome.
+    def _salvar_registro(self, colecao, chave, registro):
+        id_registro = registro.get("id")
+        if id_registro is None:
+            existente = self._conexao.execute(
+                f"SELECT id FROM {colecao} WHERE nome IN (?, ?) ORDER BY nome != ?, id LIMIT 1",
+                (chave, registro["nome"], chave)).fetchone()
+            id_registro = existente[0] if existente else None
+        if id_registro is not None:
+            self._conexao.execute(f"DELETE FROM {colecao} WHERE id = ?", (id_registro,))
+        if colecao == "professores":
+            self._inserir_professor(registro, id_registro)
+        else:
+            self._inserir_disciplina(registro, id_registro)
+
+    # Aplicar as operações de diário (Diario.salvar/remover) numa única transação
+    def registrar(self, operacoes):
+        if not operacoes:
+            return
+        with self._trava, self._conexao:
+            for op in operacoes:
+                if op["op"] == OP_SALVAR:
+                    self._salvar_registro(op["colecao"], op["chave"], op["registro"])
+                elif op.get("id") is not None:
+                    self._conexao.execute(f"DELETE FROM {op['colecao']} WHERE id = ?", (op["id"],))
+                else:
+                    self._conexao.execute(f"DELETE FROM {op['colecao']} WHERE nome = ?", (op["chave"],))
+
+    # Consultas indexadas, sem carregar os dados inteiros
+    def buscar_professores(self, nome):
+        with self._trava:
+            return list(self._ler_professores("WHERE p.nome = ?", (nome,)))
+
+    def professores_por_modalidade(self, modalidade):
+        with self._trava:
+            return list(self._ler_professores("WHERE p.modalidade = ?", (modalidade,)))
+
+    def professores_disponiveis(self, horario):
+        with self._trava:
+            return list(self._ler_professores(
+                "WHERE p.id IN (SELECT professor_id FROM disponibilidade WHERE horario = ?)", (horario,)))
+
+    def buscar_disciplinas(self, nome):
+        with self._trava:
+            return list(self._ler_disciplinas("WHERE d.nome = ?", (nome,)))
+
+    def disciplinas_por_horario(self, horario):
+        with self._trava:
+            return list(self._ler_disciplinas(
+                "WHERE d.id IN (SELECT disciplina_id FROM horarios_disciplina WHERE horario = ?)", (horario,)))
+
+    def disciplinas_por_predio(self, predio):
+        with self._trava:
+            return list(self._ler_disciplinas("WHERE d.predio = ?", (predio,)))
+
+    def disciplinas_do_professor(self, nome):
+        with self._trava:
+            return list(self._ler_disciplinas("WHERE a.professor = ?", (nome,)))
+
+    def contar_uso_predios(self):
+        with self._trava:
+            return dict(self._conexao.execute(
+                "SELECT predio, COUNT(*) FROM disciplinas WHERE predio IS NOT NULL GROUP BY predio"))
@@ -0,0 +1,230 @@
+"""
+Benchmark da Alocação
+=====================
+
+Compara o motor indexado (alocacao.alocar) com a alocação gulosa original
+(acrescida de uma verificação ingênua de conflitos de horário) em dados
+sintéticos de tamanho crescente. Para cada tamanho verifica que os dois
+escolhem exatamente os mesmos professores e estima o expoente de crescimento
+do tempo do motor indexado (abaixo de 2 indica comportamento subquadrático).
+
+Com --inicializacao, mede o carregamento dos arquivos JSON ao abrir o
+programa: o tempo até o primeiro lote de registros chegar à interface, o tempo
+total e se disciplinas.json foi regravado (só deve acontecer na migração).
+
+Os dados sintéticos (gerar_dados) também são usados pela suíte de
+desempenho (ver desempenho.py).
+
+Uso:
+    python benchmark.py [--tamanhos 1000 2000 4000 8000] [--seed 42] [--fluxo]
+    python benchmark.py --inicializacao [--tamanhos 10000 100000]
+"""
+
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+import alocacao
+from armazenamento import ArmazenamentoJSON
+from diario import gravar_atomico
+from horarios import DIAS, GRADE, HORAS
+from nucleo import AREAS_ATUACAO, MODALIDADES, PREDIOS
+
+# Chance de cada horário da grade estar na disponibilidade de um professor e
+# fração das disciplinas de laboratório, quando não informadas
+DENSIDADE_PADRAO = 0.35
+FRACAO_LAB_PADRAO = 0.3
+
+
+# Função para gerar professores e disciplinas sintéticos, reprodutíveis pela
+# semente. Usa as áreas, modalidades e prédios do sistema e a grade de
+# horários; `modalidades` dá o peso de cada modalidade (de professores e de
+# disciplinas), `densidade` a chance de cada horário da grade estar na
+# disponibilidade de um professor (com pelo menos um) e `fracao_lab` a fração
+# das disciplinas que precisam de laboratório.
+def gerar_dados(num_disciplinas, num_professores, seed=42, modalidades=None,
+                densidade=DENSIDADE_PADRAO, fracao_lab=FRACAO_LAB_PADRAO):
+    rng = random.Random(seed)
+    pesos = modalidades or dict.fromkeys(MODALIDADES, 1)
+    nomes_modalidades = list(pesos)
+    pesos_modalidades = [pesos[modalidade] for modalidade in nomes_modalidades]
+    predios = list(PREDIOS)
+
+    professores = []
+    for i in range(num_professores):
+        disponibilidade = [horario for horario in GRADE if rng.random() < densidade]
+        if not disponibilidade:
+            disponibilidade = [rng.choice(GRADE)]
+        professores.append({
+            "nome": f"Professor {i}",
+            "area_atuacao": rng.choice(AREAS_ATUACAO),
+            "disponibilidade": disponibilidade,
+            "modalidade": rng.choices(nomes_modalidades, pesos_modalidades)[0],
+            "disciplinas_alocadas": []
+        })
+
+    disciplinas = []
+    for i in range(num_disciplinas):
+        dias = rng.sample(DIAS, rng.randint(1, 2))
+        horas = rng.sample(HORAS, rng.randint(1, 2))
+        necessita_lab = rng.random() < fracao_lab
+        disciplinas.append({
+            "nome": f"Disciplina {i}",
+            "tipo": rng.choices(nomes_modalidades, pesos_modalidades)[0],
+            "necessita_lab": necessita_lab,
+            "predio": rng.choice(predios) if necessita_lab else None,
+            "horario": ", ".join(f"{dia} - {hora}" for dia in dias for hora in horas),
+            "professor_alocado": None
+        })
+
+    return professores, disciplinas
+
+
+# Alocação gulosa original (com verificação ingênua de conflitos de horário e
+# de laboratório), usada como referência de resultado e de tempo
+def alocar_referencia(professores, disciplinas):
+    for professor in professores:
+        professor["disciplinas_alocadas"] = []
+    for disciplina in disciplinas:
+        disciplina["professor_alocado"] = None
+
+    ocupados = {id(p): set() for p in professores}
+    ocupados_predio = {}
+    for disciplina in disciplinas:
+        horarios = disciplina["horario"].split(", ")
+        lab = disciplina["necessita_lab"] and disciplina["predio"]
+        if lab and any(h in ocupados_predio.get(disciplina["predio"], ()) for h in horarios):
+            disciplina["professor_alocado"] = "Não alocado"
+            continue
+
+        candidatos = [
+            p for p in professores
+            if p["modalidade"] == disciplina["tipo"]
+            and all(horario in p["disponibilidade"] for horario in horarios)
+            and not any(horario in ocupados[id(p)] for horario in horarios)
+            and len(p["disciplinas_alocadas"]) < 4
+        ]
+
+        if candidatos:
+            candidatos.sort(key=lambda p: len(p["disciplinas_alocadas"]))
+            professor_escolhido = candidatos[0]
+            disciplina["professor_alocado"] = professor_escolhido["nome"]
+            professor_escolhido["disciplinas_alocadas"].append(disciplina["nome"])
+            ocupados[id(professor_escolhido)].update(horarios)
+            if lab:
+                ocupados_predio.setdefault(disciplina["predio"], set()).update(horarios)
+        else:
+            disciplina["professor_alocado"] = "Não alocado"
+
+
+def _cronometrar(funcao, professores, disciplinas):
+    inicio = time.perf_counter()
+    funcao(professores, disciplinas)
+    return time.perf_counter() - inicio
+
+
+def _contar_alocadas(disciplinas):
+    return sum(1 for d in disciplinas if d["professor_alocado"] != alocacao.NAO_ALOCADO)
+
+
+# Função para medir o carregamento inicial de arquivos JSON gerados: devolve
+# (tempo até o primeiro lote, tempo total, tempo de um json.load simples, se
+# disciplinas.json foi regravado)
+def medir_inicializacao(tamanho, seed=42):
+    professores, disciplinas = gerar_dados(tamanho, max(1, tamanho // 5), seed)
+    with tempfile.TemporaryDirectory() as diretorio:
+        professores_file = os.path.join(diretorio, "professores.json")
+        disciplinas_file = os.path.join(diretorio, "disciplinas.json")
+        gravar_atomico(professores_file, professores)
+        gravar_atomico(disciplinas_file, disciplinas)
+        antes = os.stat(disciplinas_file).st_mtime_ns
+        armazenamento = ArmazenamentoJSON(professores_file, disciplinas_file,
+                                          os.path.join(diretorio, "alteracoes.jsonl"))
+
+        primeiro = []
+        inicio = time.perf_counter()
+        armazenamento.carregar(
+            parcial=lambda colecao, registros: primeiro or primeiro.append(time.perf_counter() - inicio))
+        total = time.perf_counter() - inicio
+        regravado = os.stat(disciplinas_file).st_mtime_ns != antes
+
+        inicio = time.perf_counter()
+        for caminho in (professores_file, disciplinas_file):
+            with open(caminho, "r", encoding="utf-8") as f:
+                json.load(f)
+        simples = time.perf_counter() - inicio
+
+    return (primeiro[0] if primeiro else total), total, simples, regravado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do motor de alocação")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 2000, 4000, 8000],
+                        help="números de disciplinas (professores = disciplinas / 5)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sem-referencia", action="store_true",
+                        help="não executa a alocação original (útil para tamanhos grandes)")
+    parser.add_argument("--fluxo", action="store_true",
+                        help="compara também a cobertura do modo de fluxo máximo")
+    parser.add_argument("--inicializacao", action="store_true",
+                        help="mede só o carregamento inicial dos arquivos JSON")
+    args = parser.parse_args()
+
+    if args.inicializacao:
+        print(f"{'disciplinas':>12} {'1º lote (s)':>12} {'total (s)':>10}"
+              f" {'json.load (s)':>14} {'regravado':>10}")
+        for tamanho in args.tamanhos:
+            primeiro, total, simples, regravado = medir_inicializacao(tamanho, args.seed)
+            print(f"{tamanho:>12} {primeiro:>12.4f} {total:>10.4f}"
+                  f" {simples:>14.4f} {'sim' if regravado else 'não':>10}")
+        return
+
+    print(f"{'disciplinas':>12} {'professores':>12} {'original (s)':>14} {'indexado (s)':>14} {'iguais':>7}")
+    medicoes = []
+    for tamanho in args.tamanhos:
+        professores, disciplinas = gerar_dados(tamanho, max(1, tamanho // 5), args.seed)
+
+        tempo_indexado = _cronometrar(alocacao.alocar, professores, disciplinas)
+        medicoes.append((tamanho, tempo_indexado))
+
+        if args.sem_referencia:
+            print(f"{tamanho:>12} {len(professores):>12} {'-':>14} {tempo_indexado:>14.4f} {'-':>7}")
+            continue
+
+        professores_ref = copy.deepcopy(professores)
+        disciplinas_ref = copy.deepcopy(disciplinas)
+        tempo_original = _cronometrar(alocar_referencia, professores_ref, disciplinas_ref)
+        iguais = professores == professores_ref and disciplinas == disciplinas_ref
+        print(f"{tamanho:>12} {len(professores):>12} {tempo_original:>14.4f}"
+              f" {tempo_indexado:>14.4f} {'sim' if iguais else 'NÃO':>7}")
+        if not iguais:
+            raise SystemExit("Resultado do motor indexado difere da alocação original")
+
+    # Expoente de crescimento entre o menor e o maior tamanho (tempo ~ n^k)
+    if len(medicoes) >= 2 and medicoes[0][1] > 0:
+        (n0, t0), (n1, t1) = medicoes[0], medicoes[-1]
+        expoente = math.log(t1 / t0) / math.log(n1 / n0)
+        print(f"\nExpoente de crescimento do motor indexado: {expoente:.2f}"
+              f" ({'subquadrático' if expoente < 2 else 'quadrático ou pior'})")
+
+    if args.fluxo:
+        print(f"\n{'disciplinas':>12} {'professores':>12} {'alocadas guloso':>16}"
+              f" {'alocadas fluxo':>15} {'fluxo (s)':>10}")
+        for tamanho in args.tamanhos:
+            # Professores = disciplinas / 4 deixa a capacidade total próxima da demanda
+            professores, disciplinas = gerar_dados(tamanho, max(1, tamanho // 4), args.seed)
+            alocacao.alocar(professores, disciplinas)
+            alocadas_guloso = _contar_alocadas(disciplinas)
+            tempo_fluxo = _cronometrar(
+                lambda p, d: alocacao.alocar(p, d, modo=alocacao.MODO_FLUXO), professores, disciplinas
+            )
+            print(f"{tamanho:>12} {len(professores):>12} {alocadas_guloso:>16}"
+                  f" {_contar_alocadas(disciplinas):>15} {tempo_fluxo:>10.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Alocação em Lote pela Linha de Comando
+======================================
+
+Lê professores e disciplinas de arquivos JSON, JSON Lines ou CSV (ou da
+entrada padrão, com "-"), executa a alocação e escreve a grade em JSON Lines,
+JSON, CSV ou como quadro de horários por professor (ver exportacao.py), sem
+abrir a interface gráfica.
+
+No modo guloso as disciplinas são lidas, alocadas e escritas uma a uma: a
+memória usada é a do índice de professores, e não a do tamanho da entrada ou
+da saída. O modo fluxo precisa de todas as disciplinas em memória, assim como
+o refinamento por busca local (--refinar SEGUNDOS, ver refinamento.py), que
+informa o objetivo antes e depois na saída de erros.
+
+Com --banco, professores e disciplinas são lidos de um banco SQLite (o mesmo
+usado pela interface com ALOCACAO_BANCO) e a alocação é gravada de volta nele
+numa única transação.
+
+As regras de alocação (limites, áreas, modalidades e pesos, ver regras.py)
+são lidas de --regras ou, sem a opção, de regras.json, se existir.
+
+Com --metricas, os tempos de cada etapa e os contadores da alocação são
+gravados em JSON ao final (ver metricas.py).
+
+Exemplos:
+    python cli.py -p professores.json -d disciplinas.json -o grade.csv
+    python cli.py -o grade.csv --metricas metricas.json --perfil perfis --memoria
+    cat disciplinas.jsonl | python cli.py -p campus1/professores.csv -d - -f csv > grade.csv
+    python cli.py --banco alocacao.db -o grade.csv
+    python cli.py -o grade.csv --regras regras_hibrido.json
+    python cli.py -m fluxo -o grade.csv --refinar 5 --semente 1
+    for campus in campus*/; do
+        python cli.py -p "$campus/professores.json" -d "$campus/disciplinas.json" -o "$campus/grade.jsonl"
+    done
+"""
+
+import argparse
+import os
+import sys
+
+import alocacao
+import exportacao
+import importacao
+import metricas
+import nucleo
+import regras
+from armazenamento import ArmazenamentoSQLite
+
+
+def _parser():
+    parser = argparse.ArgumentParser(description="Aloca professores às disciplinas sem interface gráfica")
+    parser.add_argument("-p", "--professores", default=nucleo.PROFESSORES_FILE,
+                        help="arquivo de professores ('-' para entrada padrão)")
+    parser.add_argument("-d", "--disciplinas", default=nucleo.DISCIPLINAS_FILE,
+                        help="arquivo de disciplinas ('-' para entrada padrão)")
+    parser.add_argument("--formato-professores", choices=importacao.FORMATOS,
+                        help="formato do arquivo de professores (padrão: pela extensão)")
+    parser.add_argument("--formato-disciplinas", choices=importacao.FORMATOS,
+                        help="formato do arquivo de disciplinas (padrão: pela extensão)")
+    parser.add_argument("-o", "--saida", default="-",
+                        help="arquivo da grade ('-' para saída padrão)")
+    parser.add_argument("-f", "--formato-saida", choices=exportacao.FORMATOS,
+                        help="formato da grade (padrão: pela extensão, ou jsonl)")
+    parser.add_argument("-m", "--modo", choices=alocacao.MODOS, default=alocacao.MODO_GULOSO,
+                        help="modo de alocação")
+    parser.add_argument("--regras",
+                        help=f"arquivo JSON com as regras de alocação (padrão: {nucleo.REGRAS_FILE}, se existir)")
+    parser.add_argument("--refinar", type=float, default=0, metavar="SEGUNDOS",
+                        help="refinar a alocação por busca local durante SEGUNDOS")
+    parser.add_argument("--semente", type=int,
+                        help="semente do sorteio do refinamento")
+    parser.add_argument("--banco",
+                        help="banco SQLite de onde ler os dados e onde gravar a alocação")
+    parser.add_argument("--saida-professores",
+                        help="arquivo JSON para gravar os professores com as disciplinas alocadas")
+    metricas.adicionar_opcoes(parser)
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    metricas.aplicar_opcoes(args)
+
+    if args.professores == "-" and args.disciplinas == "-":
+        raise SystemExit("Apenas um dos arquivos de entrada pode ser a entrada padrão")
+
+    caminho_regras = args.regras
+    if caminho_regras is None and os.path.exists(nucleo.REGRAS_FILE):
+        caminho_regras = nucleo.REGRAS_FILE
+    try:
+        compiladas = regras.ler_regras(caminho_regras) if caminho_regras else regras.compilar()
+    except (OSError, ValueError) as erro:
+        raise SystemExit(f"Regras inválidas em {caminho_regras}: {erro}")
+
+    formato_saida = args.formato_saida
+    if formato_saida is None:
+        formato_saida = importacao.detectar_formato(args.saida)
+        if formato_saida not in exportacao.FORMATOS:
+            formato_saida = "jsonl"
+
+    banco = None
+    # No modo guloso as disciplinas são lidas e alocadas durante a etapa "exportar"
+    with metricas.etapa("ler_professores"):
+        if args.banco:
+            banco = ArmazenamentoSQLite(args.banco)
+            professores = list(banco.iterar_professores())
+            disciplinas = banco.iterar_disciplinas()
+        else:
+            professores = list(importacao.ler_professores(args.professores, args.formato_professores))
+            disciplinas = importacao.ler_disciplinas(args.disciplinas, args.formato_disciplinas)
+
+    if args.modo == alocacao.MODO_GULOSO and not args.refinar:
+        grade = alocacao.alocar_sequencia(professores, disciplinas, regras=compiladas)
+    else:
+        grade = alocacao.alocar(professores, list(disciplinas), modo=args.modo, regras=compiladas,
+                                tempo_refinamento=args.refinar, semente=args.semente)
+
+    alocadas = 0
+    # Professor de cada disciplina, para gravar no banco depois da saída
+    alocados = []
+
+    def contar(grade):
+        nonlocal alocadas
+        for disciplina in grade:
+            if disciplina["professor_alocado"] != alocacao.NAO_ALOCADO:
+                alocadas += 1
+            if banco is not None:
+                alocados.append(disciplina["professor_alocado"])
+            yield disciplina
+
+    total = exportacao.escrever(contar(grade), args.saida, formato_saida)
+
+    if banco is not None:
+        with metricas.etapa("salvar_alocacoes"):
+            banco.gravar_alocacoes(alocados, professores)
+        banco.fechar()
+
+    if args.saida_professores:
+        exportacao.escrever_json(professores, args.saida_professores)
+
+    print(f"{total} disciplinas, {alocadas} alocadas, {total - alocadas} não alocadas", file=sys.stderr)
+    if args.refinar:
+        valores = metricas.relatorio()["valores"]
+        for momento in ("antes", "depois"):
+            print(f"Refinamento, {momento}: objetivo {valores[f'refinamento.objetivo_{momento}']:.4g}, "
+                  f"variância {valores[f'refinamento.variancia_{momento}']:.4g}, "
+                  f"{valores[f'refinamento.nao_alocadas_{momento}']} não alocadas", file=sys.stderr)
+    if args.metricas:
+        metricas.gravar(args.metricas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Suíte de Desempenho
+===================
+
+Mede as etapas do sistema como são usadas pela interface e pelas tarefas em
+lote, sobre dados sintéticos reprodutíveis (ver benchmark.gerar_dados):
+
+- carregar: nucleo.carregar_dados(), dos arquivos JSON ou do banco SQLite
+- alocar: nucleo.alocar_professores(), com a gravação das alocações
+- salvar: nucleo.salvar_dados()
+- exportar_json / exportar_csv: a grade escrita num arquivo (ver exportacao.py)
+
+Para cada etapa informa o tempo (o menor entre as repetições), a vazão em
+registros por segundo e o pico de memória alocada durante a etapa. O pico é
+medido com tracemalloc numa execução à parte, porque o rastreamento deixa o
+código bem mais lento.
+
+Com --salvar-referencia os resultados são gravados num arquivo JSON; com
+--comparar, comparados com uma referência gravada antes (com os mesmos
+parâmetros, na mesma máquina): o programa termina com erro se alguma etapa
+ficou mais lenta ou usou mais memória que a referência além da tolerância.
+
+Uso:
+    python desempenho.py --tamanho 20000 --salvar-referencia referencia.json
+    python desempenho.py --tamanho 20000 --comparar referencia.json [--tolerancia 0.25]
+    python desempenho.py --tamanho 5000 --modalidades presencial=3 ead=1 híbrido=1 --densidade 0.2
+
+Funções principais:
+-----------------
+medir(): Mede o tempo, a vazão e o pico de memória de cada etapa
+comparar(): Lista as etapas que pioraram em relação a uma referência
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import alocacao
+import exportacao
+import nucleo
+from armazenamento import ArmazenamentoSQLite
+from benchmark import DENSIDADE_PADRAO, FRACAO_LAB_PADRAO, gerar_dados
+from diario import gravar_atomico
+
+ETAPAS = ["carregar", "alocar", "salvar", "exportar_json", "exportar_csv"]
+ARMAZENAMENTOS = ["json", "sqlite"]
+
+
+# Função para gravar os dados gerados no armazenamento escolhido, dentro do
+# diretório, e apontar o núcleo para ele
+def _preparar(diretorio, armazenamento, professores, disciplinas):
+    nucleo.PROFESSORES_FILE = os.path.join(diretorio, "professores.json")
+    nucleo.DISCIPLINAS_FILE = os.path.join(diretorio, "disciplinas.json")
+    nucleo.DIARIO_FILE = os.path.join(diretorio, "alteracoes.jsonl")
+    if armazenamento == "sqlite":
+        nucleo.BANCO_FILE = os.path.join(diretorio, "alocacao.db")
+        banco = ArmazenamentoSQLite(nucleo.BANCO_FILE)
+        banco.salvar(professores, disciplinas)
+        banco.fechar()
+    else:
+        nucleo.BANCO_FILE = None
+        gravar_atomico(nucleo.PROFESSORES_FILE, professores)
+        gravar_atomico(nucleo.DISCIPLINAS_FILE, disciplinas)
+
+
+# Funções de cada etapa, na ordem, sobre os dados do núcleo
+def _etapas(diretorio, modo):
+    return [
+        ("carregar", nucleo.carregar_dados),
+        ("alocar", lambda: nucleo.alocar_professores(modo)),
+        ("salvar", nucleo.salvar_dados),
+        ("exportar_json", lambda: exportacao.escrever_json(
+            nucleo.disciplinas, os.path.join(diretorio, "grade.json"))),
+        ("exportar_csv", lambda: exportacao.escrever_csv(
+            nucleo.disciplinas, os.path.join(diretorio, "grade.csv"))),
+    ]
+
+
+# Função para executar todas as etapas uma vez, num diretório novo; devolve o
+# tempo (ou, com memoria=True, o pico de memória em bytes) de cada etapa
+def _executar(armazenamento, modo, professores, disciplinas, memoria=False):
+    resultado = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        _preparar(diretorio, armazenamento, professores, disciplinas)
+        for nome, etapa in _etapas(diretorio, modo):
+            if memoria:
+                tracemalloc.start()
+                etapa()
+                resultado[nome] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                inicio = time.perf_counter()
+                etapa()
+                resultado[nome] = time.perf_counter() - inicio
+    return resultado
+
+
+# Função para medir as etapas sobre dados gerados com os parâmetros
+# informados; devolve {"parametros": ..., "etapas": {etapa: {"tempo", "vazao",
+# "memoria"}}}. Os arquivos do núcleo são restaurados ao final.
+def medir(tamanho, num_professores=None, seed=42, modalidades=None,
+          densidade=DENSIDADE_PADRAO, fracao_lab=FRACAO_LAB_PADRAO,
+          armazenamento="json", modo=alocacao.MODO_GULOSO, repeticoes=3):
+    num_professores = num_professores or max(1, tamanho // 5)
+    parametros = {
+        "tamanho": tamanho,
+        "professores": num_professores,
+        "seed": seed,
+        "modalidades": modalidades,
+        "densidade": densidade,
+        "fracao_lab": fracao_lab,
+        "armazenamento": armazenamento,
+        "modo": modo,
+    }
+    professores, disciplinas = gerar_dados(tamanho, num_professores, seed, modalidades,
+                                           densidade, fracao_lab)
+    # Registros processados em cada etapa, para a vazão
+    registros = {
+        "carregar": num_professores + tamanho,
+        "alocar": tamanho,
+        "salvar": num_professores + tamanho,
+        "exportar_json": tamanho,
+        "exportar_csv": tamanho,
+    }
+
+    configuracao = (nucleo.PROFESSORES_FILE, nucleo.DISCIPLINAS_FILE, nucleo.DIARIO_FILE,
+                    nucleo.BANCO_FILE)
+    try:
+        tempos = [_executar(armazenamento, modo, professores, disciplinas)
+                  for _ in range(max(1, repeticoes))]
+        picos = _executar(armazenamento, modo, professores, disciplinas, memoria=True)
+    finally:
+        (nucleo.PROFESSORES_FILE, nucleo.DISCIPLINAS_FILE, nucleo.DIARIO_FILE,
+         nucleo.BANCO_FILE) = configuracao
+        nucleo.professores[:] = []
+        nucleo.disciplinas[:] = []
+
+    etapas = {}
+    for nome in ETAPAS:
+        tempo = min(medicao[nome] for medicao in tempos)
+        etapas[nome] = {
+            "tempo": tempo,
+            "vazao": registros[nome] / tempo if tempo > 0 else None,
+            "memoria": picos[nome],
+        }
+    return {
+        "parametros": parametros,
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "etapas": etapas,
+    }
+
+
+# Função para comparar uma medição com a referência: devolve a lista de
+# (etapa, medida, valor atual, valor de referência) das medidas que pioraram
+# além da tolerância (0.25 = 25% acima da referência)
+def comparar(atual, referencia, tolerancia=0.25):
+    if atual["parametros"] != referencia["parametros"]:
+        raise ValueError("A referência foi medida com outros parâmetros: "
+                         f"{json.dumps(referencia['parametros'], ensure_ascii=False)}")
+    pioras = []
+    for nome, medidas in atual["etapas"].items():
+        anterior = referencia["etapas"].get(nome)
+        if anterior is None:
+            continue
+        for medida in ("tempo", "memoria"):
+            if medidas[medida] > anterior[medida] * (1 + tolerancia):
+                pioras.append((nome, medida, medidas[medida], anterior[medida]))
+    return pioras
+
+
+def _variacao(atual, anterior):
+    if not anterior:
+        return "-"
+    return f"{(atual / anterior - 1) * 100:+.0f}%"
+
+
+def _imprimir(resultado, referencia=None):
+    parametros = resultado["parametros"]
+    print(f"{parametros['tamanho']} disciplinas, {parametros['professores']} professores,"
+          f" armazenamento {parametros['armazenamento']}, modo {parametros['modo']}")
+    cabecalho = f"{'etapa':<14} {'tempo (s)':>10} {'registros/s':>12} {'pico (MiB)':>11}"
+    if referencia:
+        cabecalho += f" {'Δ tempo':>8} {'Δ pico':>8}"
+    print(cabecalho)
+    for nome, medidas in resultado["etapas"].items():
+        vazao = f"{medidas['vazao']:.0f}" if medidas["vazao"] else "-"
+        linha = (f"{nome:<14} {medidas['tempo']:>10.4f} {vazao:>12}"
+                 f" {medidas['memoria'] / (1 << 20):>11.1f}")
+        if referencia:
+            anterior = referencia["etapas"].get(nome, {})
+            linha += (f" {_variacao(medidas['tempo'], anterior.get('tempo')):>8}"
+                      f" {_variacao(medidas['memoria'], anterior.get('memoria')):>8}")
+        print(linha)
+
+
+# Função para ler os pesos das modalidades no formato "modalidade=peso"
+def _modalidades(valores, parser):
+    if not valores:
+        return None
+    pesos = {}
+    for valor in valores:
+        modalidade, _, peso = valor.partition("=")
+        if modalidade not in nucleo.MODALIDADES:
+            parser.error(f"modalidade desconhecida: {modalidade!r} (use {', '.join(nucleo.MODALIDADES)})")
+        try:
+            pesos[modalidade] = float(peso)
+        except ValueError:
+            parser.error(f"peso inválido para {modalidade}: {peso!r}")
+    return pesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de desempenho das etapas do sistema")
+    parser.add_argument("--tamanho", type=int, default=10000, help="número de disciplinas")
+    parser.add_argument("--professores", type=int, help="número de professores (padrão: tamanho / 5)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--modalidades", nargs="+", metavar="MODALIDADE=PESO",
+                        help="peso de cada modalidade (padrão: todas com o mesmo peso)")
+    parser.add_argument("--densidade", type=float, default=DENSIDADE_PADRAO,
+                        help="chance de cada horário estar na disponibilidade de um professor")
+    parser.add_argument("--fracao-lab", type=float, default=FRACAO_LAB_PADRAO,
+                        help="fração das disciplinas que precisam de laboratório")
+    parser.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default="json")
+    parser.add_argument("-m", "--modo", choices=alocacao.MODOS, default=alocacao.MODO_GULOSO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--salvar-referencia", metavar="ARQUIVO",
+                        help="grava os resultados como referência")
+    parser.add_argument("--comparar", metavar="ARQUIVO",
+                        help="compara com uma referência gravada e falha se alguma etapa piorou")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="piora aceita em relação à referência (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    referencia = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            referencia = json.load(f)
+
+    resultado = medir(args.tamanho, args.professores, args.seed,
+                      _modalidades(args.modalidades, parser), args.densidade, args.fracao_lab,
+                      args.armazenamento, args.modo, args.repeticoes)
+    _imprimir(resultado, referencia)
+
+    if args.salvar_referencia:
+        gravar_atomico(args.salvar_referencia, resultado)
+        print(f"\nReferência gravada em {args.salvar_referencia}")
+
+    if referencia is not None:
+        try:
+            pioras = comparar(resultado, referencia, args.tolerancia)
+        except ValueError as erro:
+            raise SystemExit(str(erro))
+        if pioras:
+            print(f"\nEtapas acima da referência (tolerância {args.tolerancia:.0%}):")
+            for nome, medida, valor, anterior in pioras:
+                print(f"  {nome}: {medida} {valor:.4g} (referência {anterior:.4g})")
+            raise SystemExit(1)
+        print(f"\nSem regressões em relação à referência (tolerância {args.tolerancia:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Diário de Alterações
+====================
+
+Persistência incremental dos dados: cada inclusão, edição ou exclusão de um
+registro é anexada como uma linha JSON ao arquivo de diário, em vez de
+regravar professores.json e disciplinas.json inteiros. O custo de salvar uma
+alteração é proporcional ao tamanho da alteração, e não ao dos dados.
+
+Os arquivos JSON passam a ser instantâneos (snapshots): ao carregar, o
+instantâneo é lido e as operações do diário são reaplicadas sobre ele.
+Periodicamente o diário é compactado: os instantâneos são regravados e o
+diário é esvaziado.
+
+Segurança contra falhas:
+----------------------
+- cada gravação no diário é seguida de fsync;
+- uma última linha incompleta (queda no meio da gravação) é ignorada e
+  cortada do arquivo, para que a próxima gravação comece numa linha nova;
+- a compactação grava os novos instantâneos em arquivos temporários e só então
+  grava um marcador (de forma atômica). Com o marcador presente, os temporários
+  estão completos: eles são renomeados sobre os instantâneos e o diário é
+  esvaziado. Se o programa cair no meio disso, recuperar() conclui a
+  compactação na próxima carga; se cair antes do marcador, valem os
+  instantâneos antigos mais o diário.
+
+Formato de cada linha:
+    {"op": "salvar", "colecao": "professores", "chave": "<nome anterior>", "id": 7, "registro": {...}}
+    {"op": "remover", "colecao": "disciplinas", "chave": "<nome>", "id": 12}
+
+As operações acham o registro pelo "id" (ver registros.py), então dois
+registros com o mesmo nome nunca se confundem: um "salvar" com um id ainda
+inexistente é sempre uma inclusão. As operações gravadas antes dos
+identificadores (sem "id") continuam sendo reaplicadas pelo nome.
+"""
+
+import json
+import os
+
+import metricas
+from registros import serializar
+
+OP_SALVAR = "salvar"
+OP_REMOVER = "remover"
+
+
+# Função para gravar um arquivo JSON de forma atômica (temporário + renomeação)
+def gravar_atomico(caminho, dados):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=4, ensure_ascii=False, default=serializar)
+        f.flush()
+        os.fsync(f.fileno())
+        metricas.contar("bytes_gravados", os.fstat(f.fileno()).st_size)
+    os.replace(temporario, caminho)
+
+
+# Classe que representa o arquivo de diário
+class Diario:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # Número de operações gravadas desde a última compactação
+        self.entradas = 0
+
+    # Montar a operação de inclusão/edição de um registro
+    @staticmethod
+    def salvar(colecao, chave, registro):
+        return {"op": OP_SALVAR, "colecao": colecao, "chave": chave, "id": registro.get("id"),
+                "registro": registro}
+
+    # Montar a operação de exclusão do registro com o id informado (sem id,
+    # de todos os registros com o nome)
+    @staticmethod
+    def remover(colecao, chave, identificador=None):
+        return {"op": OP_REMOVER, "colecao": colecao, "chave": chave, "id": identificador}
+
+    # Anexar operações ao diário com uma única gravação e um único fsync
+    def registrar(self, operacoes):
+        if not operacoes:
+            return
+        linhas = "".join(json.dumps(op, ensure_ascii=False, default=serializar) + "\n" for op in operacoes)
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            inicio = f.tell()
+            f.write(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+            metricas.contar("bytes_gravados", os.fstat(f.fileno()).st_size - inicio)
+        self.entradas += len(operacoes)
+
+    # Função geradora das operações gravadas. Uma última linha incompleta é
+    # ignorada e cortada do arquivo (e a uma última linha completa sem "\n" é
+    # acrescentado o "\n") antes de qualquer operação ser devolvida: senão, a
+    # próxima gravação seria emendada nela e se perderia.
+    def ler(self):
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, "rb") as f:
+            conteudo = f.read()
+        linhas = conteudo.split(b"\n")
+        operacoes = []
+        # Posição, em bytes, do início da linha atual
+        inicio = 0
+        for numero, linha in enumerate(linhas):
+            if linha.strip():
+                try:
+                    operacoes.append(json.loads(linha))
+                except ValueError:
+                    if any(resto.strip() for resto in linhas[numero + 1:]):
+                        raise
+                    self._reparar(inicio)
+                    break
+            inicio += len(linha) + 1
+        else:
+            if not conteudo.endswith(b"\n") and conteudo.strip():
+                self._reparar(len(conteudo), b"\n")
+        yield from operacoes
+
+    # Cortar o diário no tamanho informado e acrescentar o final, com fsync
+    def _reparar(self, tamanho, final=b""):
+        with open(self.caminho, "r+b") as f:
+            f.truncate(tamanho)
+            f.seek(tamanho)
+            f.write(final)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Reaplicar as operações do diário sobre as coleções carregadas do instantâneo
+    def aplicar(self, colecoes):
+        # id -> posição e nome -> posições (para as operações sem id) de cada
+        # coleção, para não varrer a lista a cada operação
+        indices = {}
+        removidos = False
+        self.entradas = 0
+
+        for op in self.ler():
+            lista = colecoes[op["colecao"]]
+            if op["colecao"] not in indices:
+                por_id = {}
+                por_nome = {}
+                for posicao, registro in enumerate(lista):
+                    if registro.get("id") is not None:
+                        por_id[registro["id"]] = posicao
+                    por_nome.setdefault(registro["nome"], []).append(posicao)
+                indices[op["colecao"]] = (por_id, por_nome)
+            por_id, por_nome = indices[op["colecao"]]
+            identificador = op.get("id")
+
+            if op["op"] == OP_SALVAR and identificador is not None:
+                registro = op["registro"]
+                posicao = por_id.get(identificador)
+                if posicao is None:
+                    por_id[identificador] = len(lista)
+                    lista.append(registro)
+                else:
+                    lista[posicao] = registro
+            elif op["op"] == OP_SALVAR:
+                registro = op["registro"]
+                posicoes = por_nome.get(op["chave"]) or por_nome.get(registro["nome"])
+                if posicoes:
+                    posicao = posicoes.pop(0)
+                    lista[posicao] = registro
+                else:
+                    posicao = len(lista)
+                    lista.append(registro)
+                por_nome.setdefault(registro["nome"], []).insert(0, posicao)
+            elif identificador is not None:
+                posicao = por_id.pop(identificador, None)
+                if posicao is not None:
+                    lista[posicao] = None
+                    removidos = True
+            else:
+                for posicao in por_nome.pop(op["chave"], ()):
+                    lista[posicao] = None
+                    removidos = True
+            self.entradas += 1
+
+        if removidos:
+            for lista in colecoes.values():
+                lista[:] = [registro for registro in lista if registro is not None]
+
+    # Regravar os instantâneos ({caminho: dados}) e esvaziar o diário
+    def compactar(self, instantaneos):
+        for caminho, dados in instantaneos.items():
+            with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(dados, f, indent=4, ensure_ascii=False, default=serializar)
+                f.flush()
+                os.fsync(f.fileno())
+                metricas.contar("bytes_gravados", os.fstat(f.fileno()).st_size)
+        gravar_atomico(self.caminho + ".compactando", list(instantaneos))
+        self.recuperar()
+
+    # Concluir uma compactação interrompida (ou recém-marcada); devolve se havia uma
+    def recuperar(self):
+        marcador = self.caminho + ".compactando"
+        if not os.path.exists(marcador):
+            return False
+        with open(marcador, "r", encoding="utf-8") as f:
+            caminhos = json.load(f)
+        for caminho in caminhos:
+            if os.path.exists(caminho + ".tmp"):
+                os.replace(caminho + ".tmp", caminho)
+        self.limpar()
+        os.remove(marcador)
+        return True
+
+    # Esvaziar o diário depois de uma compactação
+    def limpar(self):
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.entradas = 0
@@ -0,0 +1,188 @@
+"""
+Exportação da Grade
+===================
+
+Escrita da grade (disciplinas com o professor alocado) em CSV, JSON, JSON
+Lines ou como quadro de horários por professor. As funções recebem qualquer
+iterável de disciplinas e o destino: um caminho de arquivo ("-" para a saída
+padrão) ou um arquivo já aberto. Cada disciplina é escrita à medida que chega,
+de modo que a memória usada não depende do tamanho da saída (o quadro por
+professor guarda apenas uma referência a cada disciplina alocada, para
+agrupá-las).
+
+Funções principais:
+-----------------
+abrir_destino(): Abre um caminho para escrita, ou usa o arquivo já aberto
+escrever_csv(): Escreve a grade em CSV (mesmas colunas de grade.csv)
+escrever_json(): Escreve a grade como um array JSON (mesmo formato de grade.json)
+escrever_jsonl(): Escreve a grade em JSON Lines (uma disciplina por linha)
+escrever_horarios(): Escreve, em CSV, os horários de cada professor
+escrever(): Escreve a grade no formato informado
+"""
+
+import contextlib
+import csv
+import json
+import os
+import sys
+
+import horarios
+import metricas
+from alocacao import NAO_ALOCADO
+from registros import Registro, serializar
+
+FORMATOS = ["jsonl", "csv", "json", "horarios"]
+
+CABECALHO_CSV = ["Disciplina", "Tipo", "Laboratório", "Horário", "Professor"]
+CABECALHO_HORARIOS = ["Professor", "Horário", "Disciplina", "Tipo", "Prédio"]
+
+# Recuo de cada nível em grade.json
+RECUO_JSON = 4
+
+# Codificador compartilhado: criar um por chamada de json.dumps custa mais que
+# codificar um registro pequeno
+_JSON = json.JSONEncoder(ensure_ascii=False, default=serializar)
+
+# Literais JSON dos valores simples mais comuns nos registros
+_LITERAIS = {None: "null", True: "true", False: "false"}
+
+
+# Função para abrir o destino da escrita: um caminho ("-" é a saída padrão) ou
+# um arquivo já aberto, que é usado como está e não é fechado. A escrita é
+# medida como a etapa "exportar" (ver metricas.py), com os bytes gravados nos
+# caminhos.
+@contextlib.contextmanager
+def abrir_destino(destino):
+    with metricas.etapa("exportar"):
+        if not isinstance(destino, str):
+            yield destino
+        elif destino == "-":
+            yield sys.stdout
+        else:
+            with open(destino, "w", encoding="utf-8", newline="") as f:
+                yield f
+                f.flush()
+                metricas.contar("bytes_exportados", os.fstat(f.fileno()).st_size)
+
+
+# Função para montar a linha CSV de uma disciplina
+def linha_csv(disciplina):
+    return [
+        disciplina["nome"], disciplina["tipo"], "Sim" if disciplina["necessita_lab"] else "Não",
+        disciplina["horario"], disciplina["professor_alocado"]
+    ]
+
+
+# Função para escrever a grade em CSV; devolve o número de disciplinas escritas
+def escrever_csv(disciplinas, destino):
+    with abrir_destino(destino) as f:
+        writer = csv.writer(f)
+        writer.writerow(CABECALHO_CSV)
+        total = 0
+        for disciplina in disciplinas:
+            writer.writerow(linha_csv(disciplina))
+            total += 1
+        return total
+
+
+# Função que produz o mesmo texto de json.dumps(valor, indent=...,
+# ensure_ascii=False) a partir da margem do nível atual. Com indent, o json da
+# biblioteca padrão não usa o codificador em C; aqui só os valores simples são
+# codificados, e por ele.
+def _json_recuado(valor, margem, recuo):
+    # Os valores simples vêm primeiro: são quase todos os valores de um registro
+    if type(valor) is str:
+        return json.encoder.encode_basestring(valor)
+    if valor is None or valor is True or valor is False:
+        return _LITERAIS[valor]
+    if isinstance(valor, Registro):
+        valor = valor.para_dict()
+    if isinstance(valor, (list, tuple)) and valor:
+        interna = margem + recuo
+        itens = (_json_recuado(item, interna, recuo) for item in valor)
+        return "[" + interna + ("," + interna).join(itens) + margem + "]"
+    if isinstance(valor, dict) and valor:
+        if not all(isinstance(chave, str) for chave in valor):
+            texto = json.dumps(valor, indent=len(recuo), ensure_ascii=False, default=serializar)
+            return texto.replace("\n", margem)
+        interna = margem + recuo
+        itens = (f"{json.encoder.encode_basestring(chave)}: {_json_recuado(item, interna, recuo)}"
+                 for chave, item in valor.items())
+        return "{" + interna + ("," + interna).join(itens) + margem + "}"
+    return _JSON.encode(valor)
+
+
+# Função para escrever a grade como um array JSON, um elemento por vez, com o
+# mesmo texto de json.dump(disciplinas, indent=4, ensure_ascii=False); devolve
+# o número de disciplinas escritas
+def escrever_json(disciplinas, destino, recuo=RECUO_JSON):
+    recuo = " " * recuo
+    margem = "\n" + recuo
+    total = 0
+    with abrir_destino(destino) as f:
+        f.write("[")
+        for disciplina in disciplinas:
+            f.write("," + margem if total else margem)
+            f.write(_json_recuado(disciplina, margem, recuo))
+            total += 1
+        f.write("\n]" if total else "]")
+    return total
+
+
+# Função para escrever a grade em JSON Lines; devolve o número de disciplinas escritas
+def escrever_jsonl(disciplinas, destino):
+    total = 0
+    with abrir_destino(destino) as f:
+        for disciplina in disciplinas:
+            f.write(_JSON.encode(disciplina))
+            f.write("\n")
+            total += 1
+    return total
+
+
+# Função para escrever o quadro de horários de cada professor em CSV: uma
+# linha por professor e horário, com os professores em ordem alfabética e os
+# horários na ordem da grade. As disciplinas sem professor não aparecem;
+# devolve o número de disciplinas lidas.
+def escrever_horarios(disciplinas, destino):
+    por_professor = {}
+    total = 0
+    for disciplina in disciplinas:
+        total += 1
+        professor = disciplina.get("professor_alocado")
+        if professor and professor != NAO_ALOCADO:
+            por_professor.setdefault(professor, []).append(disciplina)
+
+    with abrir_destino(destino) as f:
+        writer = csv.writer(f)
+        writer.writerow(CABECALHO_HORARIOS)
+        for professor in sorted(por_professor):
+            quadro = []
+            for disciplina in por_professor[professor]:
+                valor = horarios.mascara(disciplina["horario"]) if disciplina.get("horario") else 0
+                while valor:
+                    menor = valor & -valor
+                    quadro.append((menor.bit_length(), disciplina))
+                    valor ^= menor
+            quadro.sort(key=lambda item: item[0])
+            for posicao, disciplina in quadro:
+                writer.writerow([
+                    professor, horarios.formatar(1 << (posicao - 1)), disciplina["nome"],
+                    disciplina["tipo"], disciplina.get("predio") or ""
+                ])
+    return total
+
+
+ESCRITORES = {
+    "jsonl": escrever_jsonl,
+    "csv": escrever_csv,
+    "json": escrever_json,
+    "horarios": escrever_horarios,
+}
+
+
+# Função para escrever a grade no formato informado, num caminho ou arquivo aberto
+def escrever(disciplinas, destino, formato):
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato de saída desconhecido: {formato}")
+    return ESCRITORES[formato](disciplinas, destino)
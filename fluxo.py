@@ -0,0 +1,217 @@
+"""
+Alocação por Fluxo Máximo
+=========================
+
+Resolve a alocação como um problema de fluxo máximo em grafo bipartido:
+
+    fonte -> disciplina (capacidade 1)
+    disciplina -> professor compatível (modalidade e área aceitas pelas regras e
+                  todos os horários disponíveis)
+    professor -> sumidouro (capacidade: o limite de disciplinas do professor)
+
+O fluxo máximo corresponde ao maior número de disciplinas alocadas dentro
+dos limites de disciplinas dos professores, independente da ordem da lista de
+disciplinas (os conflitos entre disciplinas de um professor ficam de fora,
+ver abaixo).
+
+Para manter o grafo pequeno, disciplinas com o mesmo (grupo, horários) formam
+um grupo (ver regras.RegrasCompiladas.grupo) e professores com a mesma
+(modalidade, disponibilidade, área, limite) formam uma classe; dentro de um
+grupo ou de uma classe os elementos são intercambiáveis, então o fluxo máximo
+do grafo comprimido é igual ao do grafo original.
+
+O fluxo parte da solução gulosa e é aumentado por caminhos mínimos
+(Edmonds-Karp) no grafo residual até não existir caminho aumentante, o que
+dá a cobertura máxima do modelo. O custo é O(F·E) no pior caso, onde F é o ganho de
+cobertura sobre a solução gulosa e E o número de arestas grupo -> classe.
+
+O modelo de fluxo considera apenas o limite de disciplinas por professor; os
+conflitos de horário e de laboratório e o limite de horas semanais da
+proposta são reparados depois por alocacao.reparar_escolhas(), que pode
+deixar disciplinas sem professor: o resultado final não é garantidamente o
+máximo possível com esses conflitos.
+
+Funções principais:
+-----------------
+maximizar_cobertura(): Aumenta a solução gulosa até a cobertura máxima
+"""
+
+import heapq
+from collections import deque
+
+import horarios
+from regras import AREA_EXIGIR
+
+# Etapa informada à função de progresso (ver alocacao.alocar)
+ETAPA_FLUXO = "fluxo"
+
+
+# Função para agrupar elementos intercambiáveis pela chave informada
+def _agrupar(chaves):
+    ids = {}
+    membros = []
+    grupo_de = []
+    for posicao, chave in enumerate(chaves):
+        gid = ids.get(chave)
+        if gid is None:
+            gid = len(membros)
+            ids[chave] = gid
+            membros.append([])
+        membros[gid].append(posicao)
+        grupo_de.append(gid)
+    return list(ids), membros, grupo_de
+
+
+# Função para procurar, por busca em largura, um caminho aumentante no grafo residual.
+# Devolve (classe_destino, pai_classe, pai_grupo) ou None se o fluxo já é máximo.
+def _buscar_caminho(adjacencia, pendentes, grupos_em_classe, carga, capacidade):
+    pai_grupo = {g: None for g, falta in enumerate(pendentes) if falta > 0}
+    pai_classe = {}
+    fila = deque(pai_grupo)
+
+    while fila:
+        g = fila.popleft()
+        for c in adjacencia[g]:
+            if c in pai_classe:
+                continue
+            pai_classe[c] = g
+            if carga[c] < capacidade[c]:
+                return c, pai_classe, pai_grupo
+            # Aresta reversa: um grupo que já usa a classe pode ceder sua vaga
+            for g2 in grupos_em_classe[c]:
+                if g2 not in pai_grupo:
+                    pai_grupo[g2] = c
+                    fila.append(g2)
+    return None
+
+
+# Função para aumentar a solução gulosa até a cobertura máxima. A função
+# opcional progresso(etapa, feitas, total) recebe as disciplinas já cobertas
+# entre as que a solução gulosa deixou sem professor. As regras são as já
+# compiladas da alocação (ver regras.py).
+def maximizar_cobertura(professores, disciplinas, escolhas, regras, progresso=None):
+    # A área só separa classes quando as regras a exigem
+    exige_area = regras.area == AREA_EXIGIR
+    chaves_classes, membros_classe, classe_do_professor = _agrupar(
+        (p["modalidade"], horarios.mascara(p["disponibilidade"]),
+         p.get("area_atuacao") if exige_area else None, regras.limites(p)[0])
+        for p in professores
+    )
+    chaves_grupos, membros_grupo, grupo_da_disciplina = _agrupar(
+        (regras.grupo(d), horarios.mascara(d["horario"])) for d in disciplinas
+    )
+
+    # Arestas grupo -> classe compatível
+    adjacencia = [
+        [c for c, (modalidade, mascara, area, _) in enumerate(chaves_classes)
+         if exigida & ~mascara == 0 and regras.compativel(modalidade, area, grupo)]
+        for grupo, exigida in chaves_grupos
+    ]
+
+    # Fluxo inicial a partir da solução gulosa
+    limite_classe = [limite for _, _, _, limite in chaves_classes]
+    capacidade = [len(membros) * limite for membros, limite in zip(membros_classe, limite_classe)]
+    carga = [0] * len(membros_classe)
+    pendentes = [0] * len(membros_grupo)
+    fluxo = [{} for _ in membros_grupo]
+    grupos_em_classe = [set() for _ in membros_classe]
+    for i, posicao in enumerate(escolhas):
+        g = grupo_da_disciplina[i]
+        if posicao is None:
+            pendentes[g] += 1
+        else:
+            c = classe_do_professor[posicao]
+            fluxo[g][c] = fluxo[g].get(c, 0) + 1
+            carga[c] += 1
+            grupos_em_classe[c].add(g)
+
+    # Aumentar enquanto houver caminho da fonte ao sumidouro
+    sem_professor = sum(pendentes)
+    cobertas = 0
+    while True:
+        if progresso is not None:
+            progresso(ETAPA_FLUXO, cobertas, sem_professor)
+        encontrado = _buscar_caminho(adjacencia, pendentes, grupos_em_classe, carga, capacidade)
+        if encontrado is None:
+            break
+        destino, pai_classe, pai_grupo = encontrado
+
+        # Calcular o gargalo do caminho
+        gargalo = capacidade[destino] - carga[destino]
+        c = destino
+        while True:
+            g = pai_classe[c]
+            anterior = pai_grupo[g]
+            if anterior is None:
+                gargalo = min(gargalo, pendentes[g])
+                break
+            gargalo = min(gargalo, fluxo[g][anterior])
+            c = anterior
+
+        # Aplicar o gargalo ao longo do caminho
+        cobertas += gargalo
+        carga[destino] += gargalo
+        c = destino
+        while True:
+            g = pai_classe[c]
+            fluxo[g][c] = fluxo[g].get(c, 0) + gargalo
+            grupos_em_classe[c].add(g)
+            anterior = pai_grupo[g]
+            if anterior is None:
+                pendentes[g] -= gargalo
+                break
+            fluxo[g][anterior] -= gargalo
+            if fluxo[g][anterior] == 0:
+                del fluxo[g][anterior]
+                grupos_em_classe[anterior].discard(g)
+            c = anterior
+
+    return _distribuir(escolhas, fluxo, membros_grupo, membros_classe, classe_do_professor, limite_classe)
+
+
+# Função para converter o fluxo entre grupos e classes em professores concretos,
+# mantendo sempre que possível as escolhas da solução gulosa
+def _distribuir(escolhas, fluxo, membros_grupo, membros_classe, classe_do_professor, limite_classe):
+    novas = [None] * len(escolhas)
+    carga_professor = {}
+    sobras_por_grupo = []
+
+    # Primeiro manter as escolhas gulosas que o fluxo ainda comporta
+    for g, membros in enumerate(membros_grupo):
+        restante = dict(fluxo[g])
+        sobras = []
+        for i in membros:
+            posicao = escolhas[i]
+            if posicao is not None:
+                c = classe_do_professor[posicao]
+                if restante.get(c, 0) > 0:
+                    restante[c] -= 1
+                    novas[i] = posicao
+                    carga_professor[posicao] = carga_professor.get(posicao, 0) + 1
+                    continue
+            sobras.append(i)
+        sobras_por_grupo.append((iter(sobras), restante))
+
+    # Depois distribuir o restante ao professor menos carregado de cada classe
+    heaps = {}
+    for sobras, restante in sobras_por_grupo:
+        for c, quantidade in restante.items():
+            if quantidade <= 0:
+                continue
+            heap = heaps.get(c)
+            limite = limite_classe[c]
+            if heap is None:
+                heap = [(carga_professor.get(p, 0), p) for p in membros_classe[c]
+                        if carga_professor.get(p, 0) < limite]
+                heapq.heapify(heap)
+                heaps[c] = heap
+            for _ in range(quantidade):
+                i = next(sobras)
+                carga, posicao = heap[0]
+                novas[i] = posicao
+                if carga + 1 < limite:
+                    heapq.heapreplace(heap, (carga + 1, posicao))
+                else:
+                    heapq.heappop(heap)
+
+    return novas
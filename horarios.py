@@ -0,0 +1,146 @@
+"""
+Grade de Horários
+=================
+
+Define a grade fixa de horários usada pelo sistema (6 dias x 4 horários) e a
+representação canônica de conjuntos de horários como máscaras de bits: cada
+horário "Dia - Hora" da grade ocupa um bit fixo (dia * len(HORAS) + hora), de
+modo que verificar se dois conjuntos de horários se sobrepõem é uma única
+operação `&` entre inteiros.
+
+Horários fora da grade (digitados livremente na edição) recebem bits extras,
+acima dos bits da grade, na ordem em que aparecem durante a execução. Por
+isso os arquivos continuam gravando os horários como texto; as máscaras são
+a representação em memória usada pela alocação.
+
+Os textos dos horários são compartilhados: normalizar_disponibilidade() e
+normalizar_horario() devolvem sempre o mesmo objeto para o mesmo horário, em
+vez de uma cópia por registro, e a máscara de um texto "Dia - Hora, Dia - Hora"
+é calculada uma única vez.
+
+Funções principais:
+-----------------
+mascara(): Converte horários (texto, lista ou máscara) em máscara de bits
+horarios_da_mascara(): Lista os horários de uma máscara, na ordem dos bits
+contar(): Número de horários de uma máscara
+formatar(): Texto "Dia - Hora, Dia - Hora" de uma máscara
+normalizar_disponibilidade(): Lista canônica de horários de um professor
+normalizar_horario(): Texto canônico do horário de uma disciplina
+normalizar_campos(): Normaliza os campos de horário de um registro
+"""
+
+import threading
+
+DIAS = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado"]
+HORAS = ["18h", "19h", "20h", "21h"]
+
+# Texto "Dia - Hora" de cada posição da grade, na ordem dos bits
+GRADE = [f"{dia} - {hora}" for dia in DIAS for hora in HORAS]
+
+# Máscara com todos os horários da grade
+MASCARA_GRADE = (1 << len(GRADE)) - 1
+
+# Separador dos horários no campo "horario" das disciplinas
+SEPARADOR = ", "
+
+# Texto de cada bit (os da grade e os extras) e bit de cada texto
+_horarios = list(GRADE)
+_bits = {horario: 1 << posicao for posicao, horario in enumerate(GRADE)}
+_trava = threading.Lock()
+
+# Máscara de cada texto "Dia - Hora, Dia - Hora" já visto, e o próprio texto
+# compartilhado
+_mascaras_texto = {}
+_textos = {}
+
+
+# Função que devolve o bit de um horário, registrando um bit extra se for novo
+def bit(horario):
+    valor = _bits.get(horario)
+    if valor is None:
+        with _trava:
+            valor = _bits.get(horario)
+            if valor is None:
+                valor = 1 << len(_horarios)
+                _horarios.append(horario)
+                _bits[horario] = valor
+    return valor
+
+
+# Função para converter horários em máscara: aceita o texto "Dia - Hora, ...",
+# uma lista de textos ou uma máscara já pronta
+def mascara(horarios):
+    if isinstance(horarios, int):
+        return horarios
+    if isinstance(horarios, str):
+        valor = _mascaras_texto.get(horarios)
+        if valor is None:
+            valor = mascara(horarios.split(SEPARADOR))
+            _mascaras_texto[horarios] = valor
+        return valor
+    valor = 0
+    for horario in horarios:
+        valor |= bit(horario)
+    return valor
+
+
+# Função que lista os horários de uma máscara, na ordem dos bits
+def horarios_da_mascara(valor):
+    horarios = []
+    posicao = 0
+    while valor:
+        if valor & 1:
+            horarios.append(_horarios[posicao])
+        valor >>= 1
+        posicao += 1
+    return horarios
+
+
+# Função que conta os horários de uma máscara (int.bit_count() exige Python 3.10)
+def contar(valor):
+    return bin(valor).count("1")
+
+
+def formatar(valor):
+    return SEPARADOR.join(horarios_da_mascara(valor))
+
+
+# Função que devolve o objeto compartilhado de um horário "Dia - Hora"
+def canonico(horario):
+    return _horarios[bit(horario).bit_length() - 1]
+
+
+# Função para normalizar a disponibilidade de um professor numa lista de
+# horários compartilhados. Aceita uma máscara, uma lista (mantida como está) ou
+# um texto separado por vírgulas, como nas colunas de arquivos CSV.
+def normalizar_disponibilidade(valor):
+    if isinstance(valor, int):
+        return horarios_da_mascara(valor)
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        return [canonico(horario.strip()) for horario in valor.split(",") if horario.strip()]
+    return [canonico(horario) for horario in valor]
+
+
+# Função para normalizar o horário de uma disciplina (máscara, lista ou texto,
+# mantido como está) no texto "Dia - Hora, Dia - Hora" compartilhado entre
+# disciplinas com o mesmo horário
+def normalizar_horario(valor):
+    if isinstance(valor, int):
+        texto = formatar(valor)
+    elif isinstance(valor, str):
+        texto = valor
+    else:
+        texto = SEPARADOR.join(valor)
+    return _textos.setdefault(texto, texto)
+
+
+# Função para normalizar os campos de horário presentes num registro (ou nos
+# campos de uma edição): "disponibilidade" de professores e "horario" de disciplinas
+def normalizar_campos(registro):
+    if "disponibilidade" in registro:
+        registro["disponibilidade"] = normalizar_disponibilidade(registro["disponibilidade"])
+    if "horario" in registro:
+        registro["horario"] = normalizar_horario(registro["horario"])
+    return registro
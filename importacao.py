@@ -0,0 +1,191 @@
+"""
+Importação de Dados
+===================
+
+Leitura de professores e disciplinas de arquivos JSON, JSON Lines ou CSV (ou
+da entrada padrão, com o caminho "-"). JSON Lines e CSV são lidos registro a
+registro, sem carregar o arquivo inteiro em memória; arrays JSON também são
+lidos aos poucos (iterar_array_json), um elemento de cada vez.
+
+Nos arquivos CSV, as listas de horários ("disponibilidade" dos professores e
+"horario" das disciplinas) ficam numa única coluna no formato
+"Dia - Hora, Dia - Hora", como no campo "horario" de disciplinas.json. Em
+JSON e JSON Lines também são aceitas máscaras de bits (ver horarios.py).
+
+Funções principais:
+-----------------
+iterar_array_json(): Devolve os elementos de um array JSON à medida que são lidos
+ler_professores(): Lê e normaliza professores de um arquivo
+ler_disciplinas(): Lê e normaliza disciplinas de um arquivo
+"""
+
+import csv
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import horarios
+from registros import Disciplina, Professor
+
+FORMATOS = ["json", "jsonl", "csv"]
+
+# Valores aceitos como verdadeiro na coluna "necessita_lab" de arquivos CSV
+VALORES_VERDADEIROS = {"1", "true", "sim", "s", "yes", "y", "verdadeiro"}
+
+# Caracteres lidos do arquivo de cada vez ao percorrer um array JSON
+TAMANHO_BLOCO = 1 << 16
+
+_ESPACOS = re.compile(r"[ \t\n\r]*")
+
+
+# Função para deduzir o formato pela extensão do arquivo (entrada padrão: JSON Lines)
+def detectar_formato(caminho):
+    extensao = os.path.splitext(caminho)[1].lower().lstrip(".")
+    if extensao == "ndjson":
+        return "jsonl"
+    if extensao in FORMATOS:
+        return extensao
+    return "jsonl"
+
+
+@contextmanager
+def _abrir(caminho):
+    if caminho == "-":
+        yield sys.stdin
+    else:
+        with open(caminho, "r", encoding="utf-8", newline="") as f:
+            yield f
+
+
+# Função geradora que devolve os elementos de um array JSON de um arquivo
+# aberto, interpretando um de cada vez, sem ler o arquivo inteiro antes
+def iterar_array_json(arquivo):
+    decodificador = json.JSONDecoder()
+    texto = ""
+    posicao = 0
+    fim_arquivo = False
+    inicio = True
+
+    while True:
+        posicao = _ESPACOS.match(texto, posicao).end()
+        if posicao == len(texto):
+            if fim_arquivo:
+                raise json.JSONDecodeError("Array JSON incompleto", texto, posicao)
+            texto, posicao = texto[posicao:] + arquivo.read(TAMANHO_BLOCO), 0
+            fim_arquivo = posicao == len(texto)
+            continue
+
+        if inicio:
+            if texto[posicao] != "[":
+                raise json.JSONDecodeError("Esperado um array JSON", texto, posicao)
+            inicio = False
+            posicao += 1
+            continue
+        if texto[posicao] == "]":
+            return
+        if texto[posicao] == ",":
+            posicao += 1
+            continue
+
+        try:
+            valor, fim = decodificador.raw_decode(texto, posicao)
+        except json.JSONDecodeError:
+            if fim_arquivo:
+                raise
+            fim = None
+        # Um elemento só está completo se vier seguido do separador (um número
+        # no fim do bloco pode estar cortado): senão, ler mais e interpretar de novo
+        seguinte = None if fim is None else _ESPACOS.match(texto, fim).end()
+        completo = seguinte is not None and seguinte < len(texto) and texto[seguinte] in ",]"
+        if not completo and not fim_arquivo:
+            bloco = arquivo.read(TAMANHO_BLOCO)
+            fim_arquivo = not bloco
+            texto, posicao = texto[posicao:] + bloco, 0
+            continue
+        if not completo:
+            raise json.JSONDecodeError("Esperado ',' ou ']'", texto, seguinte)
+        yield valor
+        posicao = seguinte + 1 if texto[seguinte] == "," else seguinte
+
+
+# Função geradora que devolve os registros brutos (dicionários) de um arquivo
+def ler_registros(caminho, formato=None):
+    formato = formato or detectar_formato(caminho)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de entrada desconhecido: {formato}")
+
+    with _abrir(caminho) as f:
+        if formato == "json":
+            yield from iterar_array_json(f)
+        elif formato == "jsonl":
+            for linha in f:
+                linha = linha.strip()
+                if linha:
+                    yield json.loads(linha)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in VALORES_VERDADEIROS
+
+
+# Converter um limite (número ou texto de uma coluna CSV); vazio fica None
+def _numero(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    valor = str(valor).strip()
+    if not valor:
+        return None
+    numero = float(valor)
+    return int(numero) if numero.is_integer() else numero
+
+
+# Função para normalizar um professor lido de qualquer formato. Os limites
+# opcionais das regras de alocação (ver regras.py) só ficam no registro quando
+# informados.
+def normalizar_professor(registro):
+    professor = Professor(
+        nome=registro["nome"],
+        area_atuacao=registro.get("area_atuacao", ""),
+        disponibilidade=horarios.normalizar_disponibilidade(registro.get("disponibilidade")),
+        modalidade=registro["modalidade"],
+        disciplinas_alocadas=[]
+    )
+    for campo in ("max_disciplinas", "max_horas"):
+        valor = _numero(registro.get(campo))
+        if valor is not None:
+            professor[campo] = valor
+    return professor
+
+
+# Função para normalizar uma disciplina lida de qualquer formato
+def normalizar_disciplina(registro):
+    disciplina = Disciplina(
+        nome=registro["nome"],
+        tipo=registro["tipo"],
+        necessita_lab=_booleano(registro.get("necessita_lab", False)),
+        predio=registro.get("predio") or None,
+        horario=horarios.normalizar_horario(horarios.normalizar_disponibilidade(registro.get("horario"))),
+        professor_alocado=None
+    )
+    # Área opcional, usada pelas regras de alocação (ver regras.py)
+    if registro.get("area_atuacao"):
+        disciplina["area_atuacao"] = registro["area_atuacao"]
+    return disciplina
+
+
+# Função geradora de professores normalizados
+def ler_professores(caminho, formato=None):
+    for registro in ler_registros(caminho, formato):
+        yield normalizar_professor(registro)
+
+
+# Função geradora de disciplinas normalizadas
+def ler_disciplinas(caminho, formato=None):
+    for registro in ler_registros(caminho, formato):
+        yield normalizar_disciplina(registro)
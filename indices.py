@@ -0,0 +1,135 @@
+"""
+Índices dos Registros
+=====================
+
+Índices em memória para as operações de edição e exclusão, em vez de buscas
+lineares pelo nome:
+
+- identificador -> registro e nome -> registros, para professores e
+  disciplinas. O identificador de um registro é o seu id persistente
+  (registro["id"], ver registros.py), que não muda com as edições nem ao
+  recarregar os dados; é também a chave das linhas das tabelas (ver
+  tabelas.py). Os nomes podem se repetir, então cada nome guarda os registros
+  com ele, na ordem de inclusão.
+- professor -> disciplinas alocadas a ele, pelo nome gravado em
+  "professor_alocado", para propagar renomeações às alocações.
+
+Todas as operações podem ser repetidas sem efeito (adicionar duas vezes o
+mesmo registro, remover um registro ausente), então um índice montado depois
+de uma alteração continua correto.
+
+Classes:
+-------
+IndiceNomes: Registros de uma coleção por identificador e por nome
+IndiceAlocacoes: Disciplinas alocadas a cada professor
+IndicesDados: Os índices de professores, disciplinas e alocações
+"""
+
+from collections import Counter
+
+from alocacao import NAO_ALOCADO
+
+
+class IndiceNomes:
+    def __init__(self, registros=()):
+        self.por_id = {}
+        # nome -> {identificador: registro}, na ordem de inclusão
+        self.por_nome = {}
+        for registro in registros:
+            self.adicionar(registro)
+
+    def adicionar(self, registro):
+        self.por_id[registro["id"]] = registro
+        self.por_nome.setdefault(registro["nome"], {})[registro["id"]] = registro
+
+    # Remover um registro; com um nome informado, do nome que ele tinha antes
+    # de uma edição
+    def remover(self, registro, nome=None):
+        self.por_id.pop(registro["id"], None)
+        nome = registro["nome"] if nome is None else nome
+        mesmos = self.por_nome.get(nome)
+        if mesmos is not None:
+            mesmos.pop(registro["id"], None)
+            if not mesmos:
+                del self.por_nome[nome]
+
+    def renomear(self, registro, nome_antigo):
+        self.remover(registro, nome_antigo)
+        self.adicionar(registro)
+
+    # Primeiro registro com o nome, ou None
+    def buscar(self, nome):
+        mesmos = self.por_nome.get(nome)
+        return next(iter(mesmos.values())) if mesmos else None
+
+    # Todos os registros com o nome
+    def todos(self, nome):
+        return list(self.por_nome.get(nome, {}).values())
+
+    def __contains__(self, nome):
+        return nome in self.por_nome
+
+
+class IndiceAlocacoes:
+    def __init__(self, disciplinas=()):
+        # nome do professor -> {identificador da disciplina: disciplina}
+        self.por_professor = {}
+        # identificador da disciplina -> professor sob o qual ela está no índice
+        self.professor_de = {}
+        for disciplina in disciplinas:
+            self.atualizar(disciplina)
+
+    # Levar o índice ao professor atual da disciplina
+    def atualizar(self, disciplina):
+        atual = disciplina.get("professor_alocado")
+        if atual == NAO_ALOCADO:
+            atual = None
+        chave = disciplina["id"]
+        anterior = self.professor_de.get(chave)
+        if anterior == atual:
+            return
+        self.remover(disciplina)
+        if atual is not None:
+            self.por_professor.setdefault(atual, {})[chave] = disciplina
+            self.professor_de[chave] = atual
+
+    def remover(self, disciplina):
+        chave = disciplina["id"]
+        anterior = self.professor_de.pop(chave, None)
+        if anterior is None:
+            return
+        disciplinas = self.por_professor[anterior]
+        disciplinas.pop(chave, None)
+        if not disciplinas:
+            del self.por_professor[anterior]
+
+    def disciplinas_de(self, nome):
+        return list(self.por_professor.get(nome, {}).values())
+
+    # Mover as disciplinas de um professor renomeado para o novo nome. Outro
+    # professor pode ter o mesmo nome, então só são movidas as disciplinas com
+    # os nomes em `alocadas` (a lista "disciplinas_alocadas" do professor).
+    # Devolve essas disciplinas (o campo "professor_alocado" é de quem chama).
+    def renomear(self, nome_antigo, nome_novo, alocadas):
+        disciplinas = self.por_professor.get(nome_antigo, {})
+        restantes = Counter(alocadas)
+        movidas = {}
+        for chave, disciplina in disciplinas.items():
+            if restantes[disciplina["nome"]] > 0:
+                restantes[disciplina["nome"]] -= 1
+                movidas[chave] = disciplina
+        for chave in movidas:
+            del disciplinas[chave]
+            self.professor_de[chave] = nome_novo
+        if not disciplinas:
+            self.por_professor.pop(nome_antigo, None)
+        if movidas:
+            self.por_professor.setdefault(nome_novo, {}).update(movidas)
+        return list(movidas.values())
+
+
+class IndicesDados:
+    def __init__(self, professores, disciplinas):
+        self.professores = IndiceNomes(professores)
+        self.disciplinas = IndiceNomes(disciplinas)
+        self.alocacoes = IndiceAlocacoes(disciplinas)
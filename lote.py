@@ -0,0 +1,210 @@
+"""
+Alocação de Várias Instâncias em Paralelo
+=========================================
+
+Resolve problemas de alocação independentes (um por campus, por período...)
+num conjunto de processos (concurrent.futures.ProcessPoolExecutor). Cada
+instância é alocada inteira num processo de trabalho, então o tempo total cai
+quase linearmente com o número de núcleos quando há instâncias suficientes.
+
+Uma instância é um dicionário:
+    {
+        "nome": "campus1-2024.1",
+        "professores": [...] ou "campus1/professores.json",
+        "disciplinas": [...] ou "campus1/disciplinas.json",
+        "modo": "guloso",            # opcional
+        "max_disciplinas": 4,        # opcional
+        "regras": {...} ou "campus1/regras.json",  # opcional (ver regras.py)
+        "refinar": 2.0,              # opcional: segundos de busca local (ver refinamento.py)
+        "semente": 1,                # opcional: semente do refinamento
+        "saida": "campus1/grade.csv",# opcional
+        "formato": "csv"             # opcional (padrão: pela extensão da saída)
+    }
+
+Professores e disciplinas podem ser listas em memória ou caminhos de arquivo
+(JSON, JSON Lines ou CSV, ver importacao.py); com caminhos, a leitura também
+acontece no processo de trabalho. As regras também podem ser um dicionário ou
+um arquivo JSON; na linha de comando, valem as de --regras ou o regras.json
+de cada diretório, se existir. Com "saida", a grade é escrita pelo próprio
+processo (ver exportacao.py) e os registros não são devolvidos.
+
+Cada resultado traz também as métricas da sua instância (ver metricas.py); com
+--metricas, as de todas as instâncias são gravadas num arquivo JSON, por nome.
+
+Exemplo:
+    python lote.py campus1 campus2 campus3 -j 4 -m fluxo -f csv
+    python lote.py campus1 campus2 --metricas metricas.json --memoria
+
+Funções principais:
+-----------------
+resolver_instancia(): Aloca uma instância e mede os tempos de cada etapa
+resolver_lote(): Aloca várias instâncias em paralelo, devolvendo os resultados na ordem
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import alocacao
+import exportacao
+import importacao
+import metricas
+import nucleo
+import regras
+from diario import gravar_atomico
+
+
+# Função para obter os registros de uma instância (lista ou caminho de arquivo)
+def _registros(valor, leitor):
+    if isinstance(valor, str):
+        return list(leitor(valor))
+    return valor
+
+
+# Função para alocar uma instância; devolve os contadores, os tempos (em
+# segundos) de cada etapa, as métricas da instância e, sem "saida", os
+# registros alocados. As métricas do processo são zeradas no início.
+def resolver_instancia(instancia):
+    metricas.zerar()
+    inicio = time.perf_counter()
+    professores = _registros(instancia["professores"], importacao.ler_professores)
+    disciplinas = _registros(instancia["disciplinas"], importacao.ler_disciplinas)
+    lidos = time.perf_counter()
+
+    max_disciplinas = instancia.get("max_disciplinas", alocacao.MAX_DISCIPLINAS)
+    regras_instancia = instancia.get("regras")
+    if isinstance(regras_instancia, str):
+        with open(regras_instancia, "r", encoding="utf-8") as f:
+            regras_instancia = json.load(f)
+    alocacao.alocar(professores, disciplinas,
+                    max_disciplinas=max_disciplinas,
+                    modo=instancia.get("modo", alocacao.MODO_GULOSO),
+                    regras=regras.compilar(regras_instancia, max_disciplinas),
+                    tempo_refinamento=instancia.get("refinar", 0),
+                    semente=instancia.get("semente"))
+    alocados = time.perf_counter()
+
+    resultado = {
+        "nome": instancia.get("nome"),
+        "total": len(disciplinas),
+        "alocadas": sum(1 for d in disciplinas if d["professor_alocado"] != alocacao.NAO_ALOCADO),
+        "processo": os.getpid(),
+    }
+    saida = instancia.get("saida")
+    if saida:
+        formato = instancia.get("formato") or importacao.detectar_formato(saida)
+        if formato not in exportacao.FORMATOS:
+            formato = "jsonl"
+        exportacao.escrever(disciplinas, saida, formato)
+    else:
+        resultado["professores"] = professores
+        resultado["disciplinas"] = disciplinas
+    fim = time.perf_counter()
+
+    resultado["tempos"] = {
+        "leitura": lidos - inicio,
+        "alocacao": alocados - lidos,
+        "escrita": fim - alocados,
+        "total": fim - inicio,
+    }
+    resultado["metricas"] = metricas.relatorio()
+    return resultado
+
+
+# Função para alocar várias instâncias independentes em paralelo. Devolve um
+# resultado por instância, na ordem recebida; uma instância que falha devolve
+# {"nome": ..., "erro": "..."} sem interromper as demais.
+def resolver_lote(instancias, processos=None):
+    instancias = list(instancias)
+    if processos == 1 or len(instancias) <= 1:
+        resultados = []
+        for instancia in instancias:
+            try:
+                resultados.append(resolver_instancia(instancia))
+            except Exception as erro:
+                resultados.append({"nome": instancia.get("nome"), "erro": str(erro)})
+        return resultados
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(resolver_instancia, instancia) for instancia in instancias]
+        resultados = []
+        for instancia, futuro in zip(instancias, futuros):
+            try:
+                resultados.append(futuro.result())
+            except Exception as erro:
+                resultados.append({"nome": instancia.get("nome"), "erro": str(erro)})
+        return resultados
+
+
+def _parser():
+    parser = argparse.ArgumentParser(description="Aloca várias instâncias (um diretório cada) em paralelo")
+    parser.add_argument("diretorios", nargs="+",
+                        help="diretórios com professores.json e disciplinas.json")
+    parser.add_argument("-j", "--processos", type=int, default=None,
+                        help="número de processos (padrão: número de núcleos)")
+    parser.add_argument("-m", "--modo", choices=alocacao.MODOS, default=alocacao.MODO_GULOSO,
+                        help="modo de alocação")
+    parser.add_argument("-f", "--formato-saida", choices=exportacao.FORMATOS, default="jsonl",
+                        help="formato da grade gravada em cada diretório")
+    parser.add_argument("--refinar", type=float, default=0, metavar="SEGUNDOS",
+                        help="refinar a alocação de cada instância por busca local durante SEGUNDOS")
+    parser.add_argument("--semente", type=int,
+                        help="semente do sorteio do refinamento")
+    parser.add_argument("--regras",
+                        help=f"arquivo JSON com as regras de alocação de todas as instâncias "
+                             f"(padrão: o {nucleo.REGRAS_FILE} de cada diretório, se existir)")
+    metricas.adicionar_opcoes(parser)
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    metricas.aplicar_opcoes(args)
+    instancias = [
+        {
+            "nome": diretorio,
+            "professores": os.path.join(diretorio, nucleo.PROFESSORES_FILE),
+            "disciplinas": os.path.join(diretorio, nucleo.DISCIPLINAS_FILE),
+            "modo": args.modo,
+            "refinar": args.refinar,
+            "semente": args.semente,
+            "saida": os.path.join(diretorio, f"grade.{args.formato_saida}"),
+            "formato": args.formato_saida,
+        }
+        for diretorio in args.diretorios
+    ]
+    for instancia in instancias:
+        caminho = args.regras or os.path.join(instancia["nome"], nucleo.REGRAS_FILE)
+        if args.regras or os.path.exists(caminho):
+            instancia["regras"] = caminho
+
+    inicio = time.perf_counter()
+    resultados = resolver_lote(instancias, args.processos)
+    decorrido = time.perf_counter() - inicio
+
+    soma = 0.0
+    falhas = 0
+    for resultado in resultados:
+        if "erro" in resultado:
+            falhas += 1
+            print(f"{resultado['nome']}: erro: {resultado['erro']}", file=sys.stderr)
+            continue
+        soma += resultado["tempos"]["total"]
+        print(f"{resultado['nome']}: {resultado['total']} disciplinas, {resultado['alocadas']} alocadas "
+              f"em {resultado['tempos']['total']:.2f}s", file=sys.stderr)
+
+    print(f"{len(resultados)} instâncias em {decorrido:.2f}s "
+          f"(soma dos tempos {soma:.2f}s, aceleração {soma / decorrido if decorrido else 0:.1f}x)",
+          file=sys.stderr)
+    if args.metricas:
+        gravar_atomico(args.metricas, {resultado["nome"]: resultado["metricas"]
+                                       for resultado in resultados if "metricas" in resultado})
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,130 +23,65 @@ Funções principais:
 cadastrar_professor(): Cadastra um novo professor no sistema
 cadastrar_disciplina(): Cadastra uma nova disciplina no sistema
 alocar_professores(): Realiza a alocação automática de professores às disciplinas
-salvar_dados(): Persiste os dados em arquivos JSON
-carregar_dados(): Carrega os dados dos arquivos JSON
+atualizar_tabelas(): Atualiza as tabelas após uma alteração
+iniciar_carregamento(): Carrega os dados em segundo plano, exibindo as linhas aos poucos
+
+O modelo de dados, a persistência e a alocação ficam em nucleo.py, que pode ser
+importado sem Tkinter; este módulo contém apenas a interface gráfica.
 
 Autor: Seu Nome
 Data: Janeiro 2024
 Versão: 1.0
 """
 
-import random
-import json
-import csv
-import os
 import tkinter as tk
-from tkinter import messagebox, ttk
-
-# Arquivos de armazenamento
-PROFESSORES_FILE = "professores.json"
-DISCIPLINAS_FILE = "disciplinas.json"
-
-# Estruturas de dados
-professores = []
-disciplinas = []
-
-# Constantes
-AREAS_ATUACAO = [
-    "desenvolvimento web",
-    "desenvolvimento mobile",
-    "desenvolvimento de jogos",
-    "desenvolvimento desktop",
-    "infraestrutura de redes",
-    "infraestrutura cloud",
-    "segurança da informação",
-    "banco de dados",
-    "inteligência artificial",
-    "machine learning",
-    "computação gráfica",
-    "engenharia de software",
-    "sistemas distribuídos",
-    "arquitetura de software",
-    "devops",
-    "análise de dados",
-    "big data",
-    "iot",
-    "blockchain",
-    "realidade virtual/aumentada"
-]
-
-# Função para salvar os dados em arquivos JSON
-def salvar_dados():
-    with open(PROFESSORES_FILE, "w", encoding="utf-8") as f:
-        json.dump(professores, f, indent=4, ensure_ascii=False)
-    
-    with open(DISCIPLINAS_FILE, "w", encoding="utf-8") as f:
-        json.dump(disciplinas, f, indent=4, ensure_ascii=False)
-    
-    # Atualizar as tabelas após salvar
-    atualizar_tabela_professores()
-    atualizar_tabela_disciplinas()
-
-# Função para carregar os dados ao iniciar o programa
-def carregar_dados():
-    global professores, disciplinas
-    
-    if os.path.exists(PROFESSORES_FILE):
-        with open(PROFESSORES_FILE, "r", encoding="utf-8") as f:
-            professores = json.load(f)
-
-    if os.path.exists(DISCIPLINAS_FILE):
-        with open(DISCIPLINAS_FILE, "r", encoding="utf-8") as f:
-            disciplinas = json.load(f)
-            # Atualizar disciplinas antigas que não têm a chave 'predio'
-            for disciplina in disciplinas:
-                if "predio" not in disciplina:
-                    disciplina["predio"] = None
-        # Salvar as disciplinas atualizadas
-        with open(DISCIPLINAS_FILE, "w", encoding="utf-8") as f:
-            json.dump(disciplinas, f, indent=4, ensure_ascii=False)
-
-# Função para atualizar a tabela de professores
+from tkinter import filedialog, messagebox, ttk
+
+import alocacao
+import importacao
+import metricas
+import nucleo
+from horarios import DIAS, HORAS
+from nucleo import AREAS_ATUACAO, MODALIDADES
+from tabelas import TabelaDiferencial
+
+# Função para atualizar as tabelas após uma alteração. É registrada como
+# observadora do núcleo, que a chama com as coleções alteradas; as tabelas são
+# montadas a partir dos dados em memória, sem ler os arquivos.
+def atualizar_tabelas(colecoes=nucleo.COLECOES):
+    if "professores" in colecoes:
+        atualizar_tabela_professores()
+    if "disciplinas" in colecoes:
+        atualizar_tabela_disciplinas()
+
+# Funções que montam os valores das linhas das tabelas
+def linha_professor(professor):
+    disponibilidade = ", ".join(professor["disponibilidade"]) if professor["disponibilidade"] else "Não definido"
+    return (
+        professor["nome"],
+        professor["area_atuacao"],
+        professor["modalidade"],
+        disponibilidade
+    )
+
+def linha_disciplina(disciplina):
+    lab_info = f"Sim (Prédio {disciplina.get('predio', 'N/A')})" if disciplina["necessita_lab"] else "Não"
+    return (
+        disciplina["nome"],
+        disciplina["tipo"],
+        lab_info,
+        disciplina["horario"] if "horario" in disciplina else "Não definido",
+        disciplina.get("professor_alocado", "Não alocado")
+    )
+
+# Funções para atualizar as tabelas (só as linhas que mudaram são alteradas)
+@metricas.etapa("atualizar_tabela_professores")
 def atualizar_tabela_professores():
-    # Limpar tabela atual
-    for item in tree_professores.get_children():
-        tree_professores.delete(item)
-    
-    # Carregar dados atualizados
-    with open(PROFESSORES_FILE, 'r', encoding='utf-8') as file:
-        professores = json.load(file)
-    
-    # Inserir dados na tabela
-    for professor in professores:
-        disponibilidade = ", ".join(professor["disponibilidade"]) if professor["disponibilidade"] else "Não definido"
-        tree_professores.insert("", "end", values=(
-            professor["nome"],
-            professor["area_atuacao"],
-            professor["modalidade"],
-            disponibilidade
-        ))
-
-# Função para atualizar a tabela de disciplinas
+    tabela_professores.atualizar(nucleo.professores)
+
+@metricas.etapa("atualizar_tabela_disciplinas")
 def atualizar_tabela_disciplinas():
-    # Limpar tabela atual
-    for item in tree_disciplinas.get_children():
-        tree_disciplinas.delete(item)
-    
-    # Carregar dados atualizados
-    with open(DISCIPLINAS_FILE, 'r', encoding='utf-8') as file:
-        disciplinas = json.load(file)
-    
-    # Inserir dados na tabela
-    for disciplina in disciplinas:
-        lab_info = f"Sim (Prédio {disciplina.get('predio', 'N/A')})" if disciplina["necessita_lab"] else "Não"
-        tree_disciplinas.insert("", "end", values=(
-            disciplina["nome"],
-            disciplina["tipo"],
-            lab_info,
-            disciplina["horario"] if "horario" in disciplina else "Não definido",
-            disciplina.get("professor_alocado", "Não alocado")
-        ))
-
-# Função para contar uso dos prédios
-def contar_uso_predios():
-    predio1 = sum(1 for d in disciplinas if d.get("predio") == "1")
-    predio2 = sum(1 for d in disciplinas if d.get("predio") == "2")
-    return {"1": predio1, "2": predio2}
+    tabela_disciplinas.atualizar(nucleo.disciplinas)
 
 class DropdownFrame:
     def __init__(self, parent, title, options, is_checkbutton=True):
@@ -221,8 +156,21 @@ class DropdownFrame:
         else:  # Radiobuttons
             self.var.set(self.var._values[0])
 
+# Carregamento inicial em andamento (ver iniciar_carregamento)
+carregamento_em_andamento = None
+
+# Função para impedir alterações e exportações antes do fim do carregamento;
+# devolve True (avisando o usuário) se os dados ainda estão sendo carregados
+def aguardar_carregamento():
+    if carregamento_em_andamento is None:
+        return False
+    messagebox.showinfo("Aguarde", "Os dados ainda estão sendo carregados.")
+    return True
+
 # Função para cadastrar professor
 def cadastrar_professor():
+    if aguardar_carregamento():
+        return
     nome = entry_nome_professor.get()
     area = combo_area.get()
     dias_selecionados = dias_dropdown.get_selected()
@@ -243,8 +191,7 @@ def cadastrar_professor():
         "modalidade": modalidade,
         "disciplinas_alocadas": []
     }
-    professores.append(professor)
-    salvar_dados()
+    nucleo.adicionar_professor(professor)
     messagebox.showinfo("Sucesso", f"Professor {nome} cadastrado!")
 
     entry_nome_professor.delete(0, tk.END)
@@ -253,22 +200,16 @@ def cadastrar_professor():
     horarios_dropdown.clear_selection()
     modalidade_dropdown.clear_selection()
 
-    atualizar_tabela_professores()
-
 # Função para cadastrar disciplina
 def cadastrar_disciplina():
+    if aguardar_carregamento():
+        return
     nome = entry_nome_disciplina.get()
     tipo = tipo_dropdown.get_selected()
     necessita_lab = var_lab.get()
     dias_selecionados = dias_disc_dropdown.get_selected()
     horarios_selecionados = horarios_disc_dropdown.get_selected()
     
-    # Alocar prédio automaticamente se necessitar de laboratório
-    predio = None
-    if necessita_lab:
-        uso_predios = contar_uso_predios()
-        predio = "1" if uso_predios["1"] <= uso_predios["2"] else "2"
-
     if not nome or not tipo or not dias_selecionados or not horarios_selecionados:
         messagebox.showerror("Erro", "Preencha todos os campos e selecione pelo menos um dia e um horário!")
         return
@@ -276,6 +217,12 @@ def cadastrar_disciplina():
     disponibilidade_disciplina = [f"{dia} - {hora}" for dia in dias_selecionados 
                                 for hora in horarios_selecionados]
 
+    # Alocar prédio automaticamente se necessitar de laboratório: o menos
+    # usado entre os livres nos horários da disciplina
+    predio = None
+    if necessita_lab:
+        predio = nucleo.escolher_predio(disponibilidade_disciplina)
+
     disciplina = {
         "nome": nome,
         "tipo": tipo,
@@ -284,8 +231,7 @@ def cadastrar_disciplina():
         "horario": ", ".join(disponibilidade_disciplina),
         "professor_alocado": None
     }
-    disciplinas.append(disciplina)
-    salvar_dados()
+    nucleo.adicionar_disciplina(disciplina)
     messagebox.showinfo("Sucesso", f"Disciplina {nome} cadastrada!" + 
                        (f"\nAlocada ao Prédio {predio}" if necessita_lab else ""))
 
@@ -295,86 +241,204 @@ def cadastrar_disciplina():
     horarios_disc_dropdown.clear_selection()
     tipo_dropdown.clear_selection()
 
-    atualizar_tabela_disciplinas()
+# Alocação em andamento (ver alocar_professores)
+alocacao_em_andamento = None
 
-# Função para alocar professores corretamente
+# Intervalo, em milissegundos, entre duas verificações do progresso da alocação
+INTERVALO_VERIFICACAO = 100
+
+# Tempo, em segundos, do refinamento por busca local (ver refinamento.py)
+TEMPO_REFINAMENTO = 2.0
+
+# Função para alocar professores corretamente. A alocação roda numa thread do
+# núcleo, sobre uma cópia dos dados; a janela continua respondendo e o
+# progresso é acompanhado por verificar_alocacao()
 def alocar_professores():
-    # Limpar alocações anteriores
-    for professor in professores:
-        professor["disciplinas_alocadas"] = []
-    for disciplina in disciplinas:
-        disciplina["professor_alocado"] = None
-
-    # Alocar professores
-    for disciplina in disciplinas:
-        candidatos = [
-            p for p in professores
-            if p["modalidade"] == disciplina["tipo"]  # Modalidade deve ser compatível
-            and all(horario in p["disponibilidade"] for horario in disciplina["horario"].split(", "))  # Todos os horários devem ser compatíveis
-            and len(p["disciplinas_alocadas"]) < 4  # Máximo de 4 disciplinas por professor
-        ]
-
-        if candidatos:
-            # Ordenar candidatos por número de disciplinas alocadas (menos disciplinas primeiro)
-            candidatos.sort(key=lambda p: len(p["disciplinas_alocadas"]))
-            professor_escolhido = candidatos[0]
-            disciplina["professor_alocado"] = professor_escolhido["nome"]
-            professor_escolhido["disciplinas_alocadas"].append(disciplina["nome"])
-        else:
-            disciplina["professor_alocado"] = "Não alocado"
-    
-    salvar_dados()
-    messagebox.showinfo("Alocação", "Professores alocados!")
-    atualizar_tabela_disciplinas()
-    
+    global alocacao_em_andamento
+    if alocacao_em_andamento is not None or aguardar_carregamento():
+        return
+    alocacao_em_andamento = nucleo.AlocacaoEmSegundoPlano(
+        modo=modo_alocacao_dropdown.get_selected(),
+        refinamento=TEMPO_REFINAMENTO if refinar_var.get() else 0)
+    botao_alocar.configure(state="disabled")
+    botao_cancelar.configure(state="normal")
+    root.after(INTERVALO_VERIFICACAO, verificar_alocacao)
+
+# Função para acompanhar a alocação em andamento e aplicar o resultado ao final
+def verificar_alocacao():
+    global alocacao_em_andamento
+    tarefa = alocacao_em_andamento
+    etapa, feitas, total = tarefa.progresso
+    barra_progresso["value"] = 100 * feitas / total if total else 0
+    label_progresso.config(text=f"Alocando ({etapa}): {feitas}/{total}" if etapa else "Alocando...")
+
+    if tarefa.em_andamento():
+        root.after(INTERVALO_VERIFICACAO, verificar_alocacao)
+        return
+
+    alocacao_em_andamento = None
+    botao_alocar.configure(state="normal")
+    botao_cancelar.configure(state="disabled")
+    barra_progresso["value"] = 0
+    label_progresso.config(text="")
+
+    # O resultado é aplicado de uma só vez pelo núcleo, que avisa as tabelas
+    if tarefa.cancelada:
+        messagebox.showinfo("Alocação", "Alocação cancelada.")
+    elif tarefa.erro is not None:
+        messagebox.showerror("Erro", f"Falha na alocação: {tarefa.erro}")
+    elif not tarefa.aplicar():
+        messagebox.showwarning("Alocação", "Os dados foram alterados durante a alocação. Aloque novamente.")
+    elif tarefa.refinamento:
+        valores = metricas.relatorio()["valores"]
+        messagebox.showinfo("Alocação", "Professores alocados!\n\nRefinamento (antes → depois):\n"
+                            f"Não alocadas: {valores['refinamento.nao_alocadas_antes']} → "
+                            f"{valores['refinamento.nao_alocadas_depois']}\n"
+                            f"Variância da carga: {valores['refinamento.variancia_antes']:.3f} → "
+                            f"{valores['refinamento.variancia_depois']:.3f}")
+    else:
+        messagebox.showinfo("Alocação", "Professores alocados!")
+
+# Função para carregar os dados numa thread do núcleo: a janela aparece logo e
+# as linhas chegam às tabelas aos poucos, acompanhadas por verificar_carregamento()
+def iniciar_carregamento():
+    global carregamento_em_andamento
+    carregamento_em_andamento = nucleo.CarregamentoEmSegundoPlano()
+    label_progresso.config(text="Carregando...")
+    root.after(INTERVALO_VERIFICACAO, verificar_carregamento)
+
+# Função para exibir os registros lidos desde a última verificação e, ao
+# final, aplicar os dados carregados
+def verificar_carregamento():
+    global carregamento_em_andamento
+    tarefa = carregamento_em_andamento
+    lidos = tarefa.lidos
+    tabela_professores.acrescentar(lidos["professores"][len(tabela_professores.linhas):])
+    tabela_disciplinas.acrescentar(lidos["disciplinas"][len(tabela_disciplinas.linhas):])
+    label_progresso.config(text=f"Carregando: {len(tabela_professores.linhas)} professores, "
+                                f"{len(tabela_disciplinas.linhas)} disciplinas")
+
+    if tarefa.em_andamento():
+        root.after(INTERVALO_VERIFICACAO, verificar_carregamento)
+        return
+
+    carregamento_em_andamento = None
+    label_progresso.config(text="")
+    # Os dados carregados (com o diário reaplicado) passam a valer de uma só
+    # vez; o núcleo avisa as tabelas, que só alteram as linhas que mudaram
+    if not tarefa.aplicar():
+        atualizar_tabelas()
+        messagebox.showerror("Erro", f"Falha ao carregar os dados: {tarefa.erro}")
+
+# Função para cancelar a alocação em andamento
+def cancelar_alocacao():
+    if alocacao_em_andamento is not None:
+        alocacao_em_andamento.cancelar()
+    
+# Função para exportar a grade numa thread do núcleo, sobre uma cópia das
+# disciplinas: a janela continua respondendo (e editável) durante a gravação,
+# e a mensagem aparece ao final
+def exportar_grade(destino, formato, mensagem):
+    if aguardar_carregamento():
+        return
+    tarefa = nucleo.TarefaEmSegundoPlano(nucleo.exportar_grade, destino, formato)
+    root.after(INTERVALO_VERIFICACAO, verificar_exportacao, tarefa, destino, mensagem)
+
+def verificar_exportacao(tarefa, destino, mensagem):
+    if tarefa.em_andamento():
+        root.after(INTERVALO_VERIFICACAO, verificar_exportacao, tarefa, destino, mensagem)
+    elif tarefa.erro is not None:
+        messagebox.showerror("Erro", f"Falha ao exportar '{destino}': {tarefa.erro}")
+    else:
+        messagebox.showinfo("Exportação", mensagem)
+
 # Exportar para JSON
 def exportar_json():
-    with open("grade.json", "w", encoding="utf-8") as f:
-        json.dump(disciplinas, f, indent=4, ensure_ascii=False)
-    messagebox.showinfo("Exportação", "Grade exportada para 'grade.json'.")
+    exportar_grade("grade.json", "json", "Grade exportada para 'grade.json'.")
     
 # Exportar para CSV
 def exportar_csv():
-    with open("grade.csv", mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Disciplina", "Tipo", "Laboratório", "Horário", "Professor"])
-        for disciplina in disciplinas:
-            writer.writerow([
-                disciplina["nome"], disciplina["tipo"], "Sim" if disciplina["necessita_lab"] else "Não",
-                disciplina["horario"], disciplina["professor_alocado"]
-            ])
-    messagebox.showinfo("Exportação", "Grade exportada para 'grade.csv'.")
+    exportar_grade("grade.csv", "csv", "Grade exportada para 'grade.csv'.")
+
+# Número de recusas listadas no resumo de uma importação
+RECUSAS_EXIBIDAS = 10
+
+# Função para importar professores ou disciplinas de um arquivo JSON, JSON
+# Lines ou CSV; tudo é gravado de uma vez pelo núcleo, que atualiza a tabela
+def importar_arquivo(titulo, importar):
+    if aguardar_carregamento():
+        return
+    caminho = filedialog.askopenfilename(
+        title=titulo,
+        filetypes=[("JSON, JSON Lines ou CSV", "*.json *.jsonl *.ndjson *.csv"), ("Todos", "*")]
+    )
+    if not caminho:
+        return
+    try:
+        aceitos, recusados = importar(importacao.ler_registros(caminho))
+    except (OSError, ValueError) as erro:
+        messagebox.showerror("Erro", f"Falha ao ler '{caminho}': {erro}")
+        return
+
+    resumo = f"{len(aceitos)} registros importados, {len(recusados)} recusados."
+    if recusados:
+        resumo += "\n\n" + "\n".join(
+            f"Registro {posicao + 1} ({nome or 'sem nome'}): {motivo}"
+            for posicao, nome, motivo in recusados[:RECUSAS_EXIBIDAS])
+    messagebox.showinfo("Importação", resumo)
+
+def importar_professores():
+    importar_arquivo("Importar Professores", nucleo.importar_professores)
+
+def importar_disciplinas():
+    importar_arquivo("Importar Disciplinas", nucleo.importar_disciplinas)
+
+# Exportar os horários de cada professor
+def exportar_horarios():
+    exportar_grade("horarios_professores.csv", "horarios",
+                   "Horários dos professores exportados para 'horarios_professores.csv'.")
+
+# Exibir as métricas de desempenho acumuladas (ver metricas.py) e, se
+# confirmado, gravá-las num arquivo JSON
+def exibir_metricas():
+    linhas = metricas.resumo() or ["Nenhuma etapa medida ainda."]
+    if not messagebox.askyesno("Métricas", "\n".join(linhas) + "\n\nGravar as métricas em arquivo?"):
+        return
+    caminho = filedialog.asksaveasfilename(
+        title="Gravar Métricas", initialfile="metricas.json", defaultextension=".json",
+        filetypes=[("JSON", "*.json")]
+    )
+    if caminho:
+        metricas.gravar(caminho)
+        messagebox.showinfo("Métricas", f"Métricas gravadas em '{caminho}'.")
 
 # Excluir Professor
 def excluir_professor():
+    if aguardar_carregamento():
+        return
     selecionado = tree_professores.selection()
     if not selecionado:
         messagebox.showwarning("Aviso", "Selecione um professor para excluir.")
         return
 
-    for item in selecionado:
-        nome_professor = tree_professores.item(item, "values")[0]
-        professores[:] = [p for p in professores if p["nome"] != nome_professor]
-
-    salvar_dados()
-    atualizar_tabela_professores()
+    # As linhas são identificadas pelo registro (ver tabelas.py), e não pelo nome exibido
+    nucleo.remover_professores([int(item) for item in selecionado])
 
 # Excluir Disciplina
 def excluir_disciplina():
+    if aguardar_carregamento():
+        return
     selecionado = tree_disciplinas.selection()
     if not selecionado:
         messagebox.showwarning("Aviso", "Selecione uma disciplina para excluir.")
         return
 
-    for item in selecionado:
-        nome_disciplina = tree_disciplinas.item(item, "values")[0]
-        disciplinas[:] = [d for d in disciplinas if d["nome"] != nome_disciplina]
-
-    salvar_dados()
-    atualizar_tabela_disciplinas()
+    nucleo.remover_disciplinas([int(item) for item in selecionado])
 
 # Editar Professor
 def editar_professor():
+    if aguardar_carregamento():
+        return
     selecionado = tree_professores.selection()
     if not selecionado:
         messagebox.showwarning("Aviso", "Selecione um professor para editar.")
@@ -409,7 +473,7 @@ def editar_professor():
     # Modalidade
     tk.Label(info_frame, text="Modalidade:").pack(pady=5)
     modalidade_var = tk.StringVar(value=valores[2])
-    for mod in ["presencial", "ead", "híbrido"]:
+    for mod in MODALIDADES:
         tk.Radiobutton(info_frame, text=mod.capitalize(), variable=modalidade_var, value=mod).pack()
     
     # Disponibilidade
@@ -419,7 +483,6 @@ def editar_professor():
     entry_disp.pack(pady=5)
     
     def salvar_edicao():
-        nome_antigo = valores[0]
         novo_nome = entry_nome.get()
         nova_area = combo_area_edit.get()
         nova_modalidade = modalidade_var.get()
@@ -429,16 +492,13 @@ def editar_professor():
             messagebox.showerror("Erro", "Todos os campos são obrigatórios!")
             return
 
-        for professor in professores:
-            if professor["nome"] == nome_antigo:
-                professor["nome"] = novo_nome
-                professor["area_atuacao"] = nova_area
-                professor["modalidade"] = nova_modalidade
-                professor["disponibilidade"] = nova_disponibilidade
-                break
+        nucleo.editar_professor(int(item), {
+            "nome": novo_nome,
+            "area_atuacao": nova_area,
+            "modalidade": nova_modalidade,
+            "disponibilidade": nova_disponibilidade
+        })
         
-        salvar_dados()
-        atualizar_tabela_professores()
         janela_edicao.destroy()
         messagebox.showinfo("Sucesso", "Professor atualizado com sucesso!")
     
@@ -446,6 +506,8 @@ def editar_professor():
 
 # Editar Disciplina
 def editar_disciplina():
+    if aguardar_carregamento():
+        return
     selecionado = tree_disciplinas.selection()
     if not selecionado:
         messagebox.showwarning("Aviso", "Selecione uma disciplina para editar.")
@@ -475,7 +537,7 @@ def editar_disciplina():
     # Tipo
     tk.Label(info_disc_frame, text="Tipo:").pack(pady=5)
     tipo_var = tk.StringVar(value=valores[1])
-    for tipo in ["presencial", "ead", "híbrido"]:
+    for tipo in MODALIDADES:
         tk.Radiobutton(info_disc_frame, text=tipo.capitalize(), variable=tipo_var, value=tipo).pack()
     
     # Laboratório
@@ -497,7 +559,6 @@ def editar_disciplina():
     entry_horario.pack(pady=5)
     
     def salvar_edicao():
-        nome_antigo = valores[0]
         novo_nome = entry_nome.get()
         novo_tipo = tipo_var.get()
         necessita_lab_novo = lab_var.get()
@@ -513,20 +574,16 @@ def editar_disciplina():
             if "Prédio" in valores[2]:  # Manter o mesmo prédio se já tinha
                 predio_novo = valores[2].split("Prédio")[1].strip("() ")
             else:  # Alocar novo prédio
-                uso_predios = contar_uso_predios()
-                predio_novo = "1" if uso_predios["1"] <= uso_predios["2"] else "2"
+                predio_novo = nucleo.escolher_predio(novo_horario)
         
-        for disciplina in disciplinas:
-            if disciplina["nome"] == nome_antigo:
-                disciplina["nome"] = novo_nome
-                disciplina["tipo"] = novo_tipo
-                disciplina["necessita_lab"] = necessita_lab_novo
-                disciplina["predio"] = predio_novo
-                disciplina["horario"] = novo_horario
-                break
+        nucleo.editar_disciplina(int(item), {
+            "nome": novo_nome,
+            "tipo": novo_tipo,
+            "necessita_lab": necessita_lab_novo,
+            "predio": predio_novo,
+            "horario": novo_horario
+        })
         
-        salvar_dados()
-        atualizar_tabela_disciplinas()
         janela_edicao.destroy()
         mensagem = "Disciplina atualizada com sucesso!"
         if necessita_lab_novo and predio_novo:
@@ -702,9 +759,25 @@ main_canvas.configure(yscrollcommand=scrollbar.set)
 frame_botoes = tk.Frame(scrollable_frame)
 frame_botoes.pack(pady=10, anchor="w", fill="x", padx=10)  # Adicionei padding horizontal
 
-tk.Button(frame_botoes, text="Alocar Professores", command=alocar_professores).pack(side="left", padx=10)
+botao_alocar = tk.Button(frame_botoes, text="Alocar Professores", command=alocar_professores)
+botao_alocar.pack(side="left", padx=10)
+modo_alocacao_dropdown = DropdownFrame(frame_botoes, "Modo de Alocação", alocacao.MODOS, False)
+refinar_var = tk.BooleanVar(value=False)
+tk.Checkbutton(frame_botoes, text="Refinar carga", variable=refinar_var).pack(side="left", padx=5)
+botao_cancelar = tk.Button(frame_botoes, text="Cancelar Alocação", command=cancelar_alocacao, state="disabled")
+botao_cancelar.pack(side="left", padx=10)
 tk.Button(frame_botoes, text="Exportar para JSON", command=exportar_json).pack(side="left", padx=10)
 tk.Button(frame_botoes, text="Exportar para CSV", command=exportar_csv).pack(side="left", padx=10)
+tk.Button(frame_botoes, text="Exportar Horários", command=exportar_horarios).pack(side="left", padx=10)
+tk.Button(frame_botoes, text="Importar Professores", command=importar_professores).pack(side="left", padx=10)
+tk.Button(frame_botoes, text="Importar Disciplinas", command=importar_disciplinas).pack(side="left", padx=10)
+tk.Button(frame_botoes, text="Métricas", command=exibir_metricas).pack(side="left", padx=10)
+
+# Progresso da alocação
+barra_progresso = ttk.Progressbar(frame_botoes, length=150, maximum=100)
+barra_progresso.pack(side="left", padx=10)
+label_progresso = tk.Label(frame_botoes, text="")
+label_progresso.pack(side="left", padx=5)
 
 # Aba de Professores
 frame_professor = tk.LabelFrame(scrollable_frame, text="Cadastrar Professor")
@@ -731,12 +804,10 @@ dropdowns_frame = tk.Frame(info_frame)
 dropdowns_frame.pack(side="left", fill="x", padx=10)
 
 # Criar dropdowns com tamanho fixo
-dias_dropdown = DropdownFrame(dropdowns_frame, "Dias", 
-                            ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado"])
-horarios_dropdown = DropdownFrame(dropdowns_frame, "Horários", 
-                                ["18h", "19h", "20h", "21h"])
+dias_dropdown = DropdownFrame(dropdowns_frame, "Dias", DIAS)
+horarios_dropdown = DropdownFrame(dropdowns_frame, "Horários", HORAS)
 modalidade_dropdown = DropdownFrame(dropdowns_frame, "Modalidade", 
-                                  ["presencial", "ead", "híbrido"], False)
+                                  MODALIDADES, False)
 
 # Configurar largura fixa para os botões dos dropdowns
 dias_dropdown.button.configure(width=15)
@@ -758,7 +829,8 @@ paned_window_prof.pack(fill="both", expand=True)
 container_tabela_prof = ttk.Frame(paned_window_prof)
 paned_window_prof.add(container_tabela_prof, weight=1)
 
-tree_professores = ttk.Treeview(container_tabela_prof, columns=("Nome", "Área", "Disponibilidade", "Modalidade"), show="headings", height=10)
+tree_professores = ttk.Treeview(container_tabela_prof, columns=("Nome", "Área", "Disponibilidade", "Modalidade"),
+                                show="headings", height=10)
 for col in ("Nome", "Área", "Disponibilidade", "Modalidade"):
     tree_professores.heading(col, text=col)
     tree_professores.column(col, width=150)
@@ -768,6 +840,7 @@ scrollbar_prof = ttk.Scrollbar(container_tabela_prof, orient="vertical", command
 tree_professores.configure(yscrollcommand=scrollbar_prof.set)
 scrollbar_prof.pack(side="right", fill="y")
 tree_professores.pack(side="left", fill="both", expand=True)
+tabela_professores = TabelaDiferencial(tree_professores, scrollbar_prof, linha_professor)
 
 # Frame para botões da tabela de professores
 frame_botoes_prof = tk.Frame(frame_lista_professores)
@@ -804,12 +877,10 @@ dropdowns_disc_frame = tk.Frame(info_disc_frame)
 dropdowns_disc_frame.pack(side="left", fill="x", padx=10)
 
 # Criar dropdowns para disciplina com tamanho fixo
-dias_disc_dropdown = DropdownFrame(dropdowns_disc_frame, "Dias", 
-                                 ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado"])
-horarios_disc_dropdown = DropdownFrame(dropdowns_disc_frame, "Horários", 
-                                     ["18h", "19h", "20h", "21h"])
+dias_disc_dropdown = DropdownFrame(dropdowns_disc_frame, "Dias", DIAS)
+horarios_disc_dropdown = DropdownFrame(dropdowns_disc_frame, "Horários", HORAS)
 tipo_dropdown = DropdownFrame(dropdowns_disc_frame, "Tipo", 
-                            ["presencial", "ead", "híbrido"], False)
+                            MODALIDADES, False)
 
 # Configurar largura fixa para os botões dos dropdowns
 dias_disc_dropdown.button.configure(width=15)
@@ -831,7 +902,9 @@ paned_window_disc.pack(fill="both", expand=True)
 container_tabela_disc = ttk.Frame(paned_window_disc)
 paned_window_disc.add(container_tabela_disc, weight=1)
 
-tree_disciplinas = ttk.Treeview(container_tabela_disc, columns=("Nome", "Tipo", "Laboratório", "Horário", "Professor"), show="headings", height=10)
+tree_disciplinas = ttk.Treeview(container_tabela_disc,
+                                columns=("Nome", "Tipo", "Laboratório", "Horário", "Professor"),
+                                show="headings", height=10)
 for col in ("Nome", "Tipo", "Laboratório", "Horário", "Professor"):
     tree_disciplinas.heading(col, text=col)
     tree_disciplinas.column(col, width=150)
@@ -841,6 +914,7 @@ scrollbar_disc = ttk.Scrollbar(container_tabela_disc, orient="vertical", command
 tree_disciplinas.configure(yscrollcommand=scrollbar_disc.set)
 scrollbar_disc.pack(side="right", fill="y")
 tree_disciplinas.pack(side="left", fill="both", expand=True)
+tabela_disciplinas = TabelaDiferencial(tree_disciplinas, scrollbar_disc, linha_disciplina)
 
 # Frame para botões da tabela de disciplinas
 frame_botoes_disc = tk.Frame(frame_lista_disciplinas)
@@ -864,10 +938,10 @@ root.after(100, configurar_tamanho_minimo)
 main_canvas.pack(side="left", fill="both", expand=True, padx=5)  # Adicionei padding
 scrollbar.pack(side="right", fill="y")
 
-# Carregar os dados ao iniciar
-carregar_dados()
-atualizar_tabela_professores()
-atualizar_tabela_disciplinas()
+# Carregar os dados ao iniciar, em segundo plano (as tabelas são atualizadas
+# pelo núcleo)
+nucleo.observar(atualizar_tabelas)
+iniciar_carregamento()
 
 # Ajustar o tamanho das colunas das tabelas
 def ajustar_colunas():
@@ -0,0 +1,291 @@
+"""
+Métricas de Desempenho
+======================
+
+Cronômetros por etapa e contadores dos trechos mais custosos do sistema
+(carregamento, alocação, gravação, exportação e atualização das tabelas). As
+medições ficam sempre ligadas, porque são baratas: uma etapa custa duas
+leituras do relógio, e os laços internos acumulam os contadores em variáveis
+locais e os somam aqui uma vez por execução.
+
+A captura, que deixa o programa mais lento, é opcional: cada etapa pode ser
+perfilada com cProfile e ter o pico de memória medido com tracemalloc. Ela é
+ligada por configurar() ou pelas variáveis de ambiente:
+
+    ALOCACAO_METRICAS=metricas.json   grava as métricas ao fim de cada etapa
+    ALOCACAO_PERFIL=perfis            perfila as etapas (um arquivo .prof por etapa)
+    ALOCACAO_MEMORIA=1                mede o pico de memória de cada etapa
+
+As métricas são gravadas em JSON (ver relatorio() para o formato), tanto pela
+interface quanto pela linha de comando; os perfis podem ser lidos com
+`python -m pstats perfis/alocar.prof`.
+
+O tempo de uma etapa inclui o das etapas dentro dela (a alocação dentro de
+alocar_professores, por exemplo). O cProfile aceita um único perfil ativo, então
+só a etapa mais externa em andamento é perfilada; as internas aparecem no
+perfil dela. Com várias threads o pico de memória é aproximado, porque o
+tracemalloc mede o processo inteiro.
+
+Funções principais:
+-----------------
+etapa(): Mede uma etapa (gerenciador de contexto ou decorador)
+contar(): Soma um valor a um contador
+definir(): Guarda o valor atual de uma medida (o último, sem somar)
+configurar(): Liga ou desliga a captura e a gravação automática
+relatorio(): Dicionário com os tempos, contadores, picos de memória e perfis
+gravar(): Grava o relatório em JSON (e os perfis, com a captura ligada)
+resumo(): Linhas de texto com as etapas mais demoradas e os contadores
+zerar(): Descarta as métricas acumuladas
+adicionar_opcoes()/aplicar_opcoes(): Opções --metricas, --perfil e --memoria da linha de comando
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Arquivo gravado ao fim de cada etapa mais externa (None para não gravar)
+ARQUIVO = os.environ.get("ALOCACAO_METRICAS")
+# Diretório dos perfis cProfile (None para não perfilar)
+PERFIL = os.environ.get("ALOCACAO_PERFIL")
+# Medir o pico de memória de cada etapa com tracemalloc
+MEMORIA = bool(os.environ.get("ALOCACAO_MEMORIA"))
+
+# Funções de cada perfil listadas no relatório, pelo tempo acumulado
+FUNCOES_PERFIL = 10
+
+# Etapas listadas em resumo(), pelo tempo total
+ETAPAS_RESUMO = 10
+
+_trava = threading.Lock()
+# Etapas em andamento na thread: [memória no início, maior pico das internas]
+_local = threading.local()
+
+# etapa -> [chamadas, tempo total, maior tempo, último tempo, maior pico de memória]
+_etapas = {}
+_contadores = {}
+_valores = {}
+# etapa -> cProfile.Profile acumulado entre as chamadas
+_perfis = {}
+# Perfil ativo no momento, se houver
+_perfil_ativo = None
+
+
+def _pilha():
+    pilha = getattr(_local, "pilha", None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+# Função para ligar ou desligar a captura; os argumentos omitidos ficam como estão
+def configurar(arquivo=..., perfil=..., memoria=...):
+    global ARQUIVO, PERFIL, MEMORIA
+    if arquivo is not ...:
+        ARQUIVO = arquivo
+    if perfil is not ...:
+        PERFIL = perfil
+    if memoria is not ...:
+        MEMORIA = bool(memoria)
+    if MEMORIA and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not MEMORIA and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def contar(nome, quantidade=1):
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+def definir(nome, valor):
+    with _trava:
+        _valores[nome] = valor
+
+
+# Ativar o perfil da etapa, se nenhum outro estiver ativo; devolve o perfil ou None
+def _iniciar_perfil(nome):
+    global _perfil_ativo
+    with _trava:
+        if _perfil_ativo is not None:
+            return None
+        perfil = _perfis.get(nome)
+        if perfil is None:
+            perfil = _perfis[nome] = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outra ferramenta de perfil (um depurador, por exemplo) está ativa
+            return None
+        _perfil_ativo = perfil
+    return perfil
+
+
+def _encerrar_perfil(perfil):
+    global _perfil_ativo
+    perfil.disable()
+    with _trava:
+        _perfil_ativo = None
+
+
+def _registrar(nome, decorrido, pico):
+    with _trava:
+        medidas = _etapas.get(nome)
+        if medidas is None:
+            medidas = _etapas[nome] = [0, 0.0, 0.0, 0.0, None]
+        medidas[0] += 1
+        medidas[1] += decorrido
+        medidas[2] = max(medidas[2], decorrido)
+        medidas[3] = decorrido
+        if pico is not None:
+            medidas[4] = pico if medidas[4] is None else max(medidas[4], pico)
+
+
+# Gerenciador de contexto (ou decorador) que mede uma etapa. Ao fim da etapa
+# mais externa da thread, com ARQUIVO definido, as métricas são gravadas.
+@contextlib.contextmanager
+def etapa(nome):
+    pilha = _pilha()
+    perfil = _iniciar_perfil(nome) if PERFIL else None
+    memoria = MEMORIA and tracemalloc.is_tracing()
+    inicio_memoria = 0
+    if memoria:
+        inicio_memoria, pico = tracemalloc.get_traced_memory()
+        # O pico é zerado para a etapa interna; o da externa até aqui é guardado
+        if pilha:
+            pilha[-1][1] = max(pilha[-1][1], pico)
+        tracemalloc.reset_peak()
+    pilha.append([inicio_memoria, 0])
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        decorrido = time.perf_counter() - inicio
+        if perfil is not None:
+            _encerrar_perfil(perfil)
+        inicio_memoria, pico_internas = pilha.pop()
+        pico = None
+        if memoria and tracemalloc.is_tracing():
+            pico = max(pico_internas, tracemalloc.get_traced_memory()[1])
+            if pilha:
+                pilha[-1][1] = max(pilha[-1][1], pico)
+            pico -= inicio_memoria
+        _registrar(nome, decorrido, pico)
+        if ARQUIVO and not pilha:
+            gravar(ARQUIVO)
+
+
+# Funções mais demoradas de um perfil, pelo tempo acumulado
+def _funcoes_perfil(perfil):
+    estatisticas = pstats.Stats(perfil).stats
+    funcoes = sorted(estatisticas.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "funcao": f"{arquivo}:{linha}({nome})",
+            "chamadas": chamadas,
+            "tempo_proprio": proprio,
+            "tempo_acumulado": acumulado,
+        }
+        for (arquivo, linha, nome), (_, chamadas, proprio, acumulado, _) in funcoes[:FUNCOES_PERFIL]
+    ]
+
+
+# Função que devolve as métricas acumuladas:
+#   {"etapas": {etapa: {"chamadas", "total", "media", "maximo", "ultimo", "pico_memoria"}},
+#    "contadores": {contador: valor}, "valores": {medida: último valor},
+#    "perfis": {etapa: [{"funcao", "chamadas", "tempo_proprio", "tempo_acumulado"}, ...]},
+#    "captura": {"perfil": diretório ou None, "memoria": bool}, "gerado_em": horário Unix}
+# Tempos em segundos e memória em bytes; "pico_memoria" só com a captura de memória.
+def relatorio():
+    with _trava:
+        etapas = {
+            nome: {
+                "chamadas": chamadas,
+                "total": total,
+                "media": total / chamadas,
+                "maximo": maximo,
+                "ultimo": ultimo,
+                "pico_memoria": pico,
+            }
+            for nome, (chamadas, total, maximo, ultimo, pico) in _etapas.items()
+        }
+        contadores = dict(_contadores)
+        valores = dict(_valores)
+        # O perfil ativo não pode ser lido sem interrompê-lo
+        perfis = {nome: perfil for nome, perfil in _perfis.items() if perfil is not _perfil_ativo}
+    return {
+        "etapas": etapas,
+        "contadores": contadores,
+        "valores": valores,
+        "perfis": {nome: _funcoes_perfil(perfil) for nome, perfil in perfis.items()},
+        "captura": {"perfil": PERFIL, "memoria": MEMORIA},
+        "gerado_em": time.time(),
+    }
+
+
+# Função para gravar o relatório num arquivo JSON (de forma atômica) e, com a
+# captura ligada, os perfis no diretório PERFIL
+def gravar(caminho=None):
+    caminho = caminho or ARQUIVO
+    dados = relatorio()
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+    if PERFIL:
+        os.makedirs(PERFIL, exist_ok=True)
+        with _trava:
+            perfis = [(nome, perfil) for nome, perfil in _perfis.items() if perfil is not _perfil_ativo]
+        for nome, perfil in perfis:
+            perfil.dump_stats(os.path.join(PERFIL, f"{nome}.prof"))
+    return caminho
+
+
+# Função que resume as métricas em linhas de texto, para exibir na interface
+def resumo():
+    dados = relatorio()
+    linhas = []
+    etapas = sorted(dados["etapas"].items(), key=lambda item: item[1]["total"], reverse=True)
+    for nome, medidas in etapas[:ETAPAS_RESUMO]:
+        linha = (f"{nome}: {medidas['chamadas']}x, total {medidas['total']:.3f}s,"
+                 f" máx. {medidas['maximo']:.3f}s")
+        if medidas["pico_memoria"] is not None:
+            linha += f", pico {medidas['pico_memoria'] / (1 << 20):.1f} MiB"
+        linhas.append(linha)
+    for nome, valor in sorted({**dados["contadores"], **dados["valores"]}.items()):
+        linhas.append(f"{nome}: {valor:.4g}" if isinstance(valor, float) else f"{nome}: {valor}")
+    return linhas
+
+
+def zerar():
+    with _trava:
+        _etapas.clear()
+        _contadores.clear()
+        _valores.clear()
+        _perfis.clear()
+
+
+# Função para incluir as opções de métricas num argparse.ArgumentParser; os
+# padrões vêm das variáveis de ambiente
+def adicionar_opcoes(parser):
+    grupo = parser.add_argument_group("métricas")
+    grupo.add_argument("--metricas", metavar="ARQUIVO",
+                       help="grava as métricas em JSON ao final (ver metricas.py)")
+    grupo.add_argument("--perfil", metavar="DIRETORIO", default=PERFIL,
+                       help="perfila as etapas com cProfile, gravando um arquivo .prof por etapa")
+    grupo.add_argument("--memoria", action="store_true", default=MEMORIA,
+                       help="mede o pico de memória de cada etapa com tracemalloc")
+
+
+# Função para ligar a captura pedida nas opções de adicionar_opcoes()
+def aplicar_opcoes(args):
+    configurar(perfil=args.perfil, memoria=args.memoria)
+
+
+if MEMORIA:
+    tracemalloc.start()
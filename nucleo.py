@@ -0,0 +1,708 @@
+"""
+Núcleo do Sistema de Alocação
+=============================
+
+Modelo de dados, persistência e alocação sem dependência de interface gráfica.
+Pode ser importado em servidores sem display, em tarefas agendadas (cron) e em
+processos de trabalho, sem o custo de inicializar o Tkinter. A interface em
+main.py é construída sobre este módulo.
+
+Os dados ficam no repositório `dados` (ver repositorio.py), com uma trava de
+leitura e escrita: todas as alterações feitas por este módulo acontecem sob a
+escrita, e a gravação, a exportação e a alocação em segundo plano trabalham
+sobre instantâneos copiados sob a leitura, então podem rodar em outras threads
+enquanto a interface edita. `professores` e `disciplinas` são as listas do
+repositório, sempre alteradas no lugar, de modo que quem as importou
+(`from nucleo import professores`) continua vendo os dados atuais depois de
+carregar_dados(); fora da thread que edita, leia-as sob `dados.leitura()` ou
+use instantaneo().
+
+As alterações de registros individuais são gravadas no diário (ver diario.py)
+em vez de regravar os arquivos JSON inteiros. Com BANCO_FILE definido, os
+dados ficam num banco SQLite (ver armazenamento.py).
+
+As operações principais são medidas como etapas das métricas (ver metricas.py):
+"carregar", "salvar", "alocar", "persistir", "adicionar_professor"...
+
+Funções principais:
+-----------------
+carregar_dados(): Carrega os dados dos arquivos JSON (reaplicando o diário) ou do banco
+CarregamentoEmSegundoPlano: Carregamento numa thread, com os registros entregues aos poucos
+salvar_dados(): Persiste todos os dados (compactando o diário, se em JSON), de qualquer thread
+instantaneo(): Cópia consistente dos dados, com a versão copiada
+exportar_grade(): Exporta a grade a partir de um instantâneo, de qualquer thread
+contar_uso_predios(): Conta as disciplinas de laboratório de cada prédio
+escolher_predio(): Escolhe o prédio menos usado entre os livres nos horários de uma disciplina
+regras_alocacao(): Regras de alocação de REGRAS_FILE (ver regras.py), compiladas
+alocar_professores(): Realiza a alocação automática de professores às disciplinas
+AlocacaoEmSegundoPlano: Alocação numa thread, com progresso e cancelamento
+TarefaEmSegundoPlano: Gravação ou exportação numa thread, sobre um instantâneo
+adicionar_*/editar_*/remover_*(): Alteram registros e reparam a alocação só onde necessário
+importar_professores()/importar_disciplinas(): Incluem muitos registros com uma única gravação
+observar(): Registra uma função avisada a cada alteração (usada pelas tabelas da interface)
+"""
+
+import functools
+import os
+import threading
+
+import alocacao
+import exportacao
+import importacao
+import metricas
+import regras
+from armazenamento import ArmazenamentoJSON, ArmazenamentoSQLite
+from diario import Diario
+from horarios import normalizar_campos
+from indices import IndicesDados
+from predios import IndicePredios
+from registros import Disciplina, Professor
+from repositorio import Repositorio
+
+# Arquivos de armazenamento
+PROFESSORES_FILE = "professores.json"
+DISCIPLINAS_FILE = "disciplinas.json"
+DIARIO_FILE = "alteracoes.jsonl"
+
+# Banco SQLite opcional (ou pela variável de ambiente ALOCACAO_BANCO); quando
+# definido, substitui os arquivos JSON e o diário
+BANCO_FILE = os.environ.get("ALOCACAO_BANCO")
+
+# Regras de alocação (ver regras.py); sem o arquivo, vale a regra original
+REGRAS_FILE = "regras.json"
+
+# Número mínimo de operações no diário antes de uma compactação automática
+LIMITE_DIARIO = 1000
+
+# Estruturas de dados: o repositório e as suas listas
+dados = Repositorio()
+professores = dados.professores
+disciplinas = dados.disciplinas
+COLECOES = ("professores", "disciplinas")
+
+# Alocação mantida entre edições (ver _alocacao_incremental)
+_incremental = None
+
+# Uso dos prédios de laboratório, mantido entre edições (ver _indice_predios)
+_predios = None
+
+# Índices por nome e das alocações, mantidos entre edições (ver _indices)
+_indices_dados = None
+
+# Armazenamento em uso, com a configuração que o criou (ver _obter_armazenamento)
+_armazenamento = None
+
+# Trava do armazenamento: gravações de threads diferentes não se misturam.
+# Quem também usa a trava dos dados a obtém antes desta.
+_trava_armazenamento = threading.RLock()
+
+# Regras compiladas, com o arquivo e a data de modificação lidos (ver regras_alocacao)
+_regras = None
+
+# Funções avisadas a cada alteração dos dados (ver observar)
+_observadores = []
+
+# Constantes
+AREAS_ATUACAO = [
+    "desenvolvimento web",
+    "desenvolvimento mobile",
+    "desenvolvimento de jogos",
+    "desenvolvimento desktop",
+    "infraestrutura de redes",
+    "infraestrutura cloud",
+    "segurança da informação",
+    "banco de dados",
+    "inteligência artificial",
+    "machine learning",
+    "computação gráfica",
+    "engenharia de software",
+    "sistemas distribuídos",
+    "arquitetura de software",
+    "devops",
+    "análise de dados",
+    "big data",
+    "iot",
+    "blockchain",
+    "realidade virtual/aumentada"
+]
+
+MODALIDADES = ["presencial", "ead", "híbrido"]
+
+# Campos que influenciam a alocação: editar apenas os demais (nome e, se as
+# regras não a usam, área de atuação) não realoca nada
+CAMPOS_ALOCACAO_PROFESSOR = ("disponibilidade", "modalidade", "max_disciplinas", "max_horas")
+CAMPOS_ALOCACAO_DISCIPLINA = ("tipo", "necessita_lab", "predio", "horario")
+
+# Prédios com laboratório e a capacidade de cada um (número máximo de
+# disciplinas de laboratório, None para ilimitado), na ordem de preferência
+PREDIOS = {"1": None, "2": None}
+
+# Função que devolve o armazenamento configurado: o banco BANCO_FILE, se
+# definido, ou os arquivos JSON com o diário DIARIO_FILE
+def _obter_armazenamento():
+    global _armazenamento
+    if BANCO_FILE:
+        configuracao = (BANCO_FILE,)
+    else:
+        configuracao = (PROFESSORES_FILE, DISCIPLINAS_FILE, DIARIO_FILE)
+    if _armazenamento is None or _armazenamento[0] != configuracao:
+        if BANCO_FILE:
+            _armazenamento = (configuracao, ArmazenamentoSQLite(BANCO_FILE))
+        else:
+            _armazenamento = (configuracao, ArmazenamentoJSON(*configuracao))
+    return _armazenamento[1]
+
+# Função que devolve as regras de alocação compiladas, lidas de REGRAS_FILE (se
+# existir) na primeira alocação e de novo quando o arquivo muda. Com regras
+# novas, o reparo incremental é refeito sobre elas.
+def regras_alocacao():
+    global _regras, _incremental
+    existe = bool(REGRAS_FILE) and os.path.exists(REGRAS_FILE)
+    configuracao = (REGRAS_FILE, os.path.getmtime(REGRAS_FILE) if existe else None)
+    if _regras is None or _regras[0] != configuracao:
+        compiladas = regras.ler_regras(REGRAS_FILE) if existe else regras.compilar()
+        if _regras is not None:
+            _incremental = None
+        _regras = (configuracao, compiladas)
+    return _regras[1]
+
+# Função que faz uma função do núcleo executar sob a escrita dos dados
+def _alteracao(funcao):
+    @functools.wraps(funcao)
+    def alterar(*args, **kwargs):
+        with dados.escrita():
+            return funcao(*args, **kwargs)
+    return alterar
+
+# Função para salvar todos os dados (nos arquivos JSON, compactando o diário,
+# ou no banco, numa única transação). Pode ser chamada de qualquer thread: os
+# dados são copiados sob a leitura e gravados sem travar as edições. Uma edição
+# feita durante a gravação espera por ela para ser registrada, então não é
+# apagada do diário pela compactação; se os dados mudaram entre a cópia e a
+# gravação, a gravação é feita sob a leitura, sobre os próprios dados.
+@metricas.etapa("salvar")
+def salvar_dados():
+    versao, copia_professores, copia_disciplinas = dados.instantaneo()
+    with _trava_armazenamento:
+        if dados.versao == versao:
+            _obter_armazenamento().salvar(copia_professores, copia_disciplinas)
+            return
+    with dados.leitura(), _trava_armazenamento:
+        _obter_armazenamento().salvar(professores, disciplinas)
+
+# Função para registrar uma função chamada a cada alteração dos dados em
+# memória, com o conjunto das coleções alteradas ({"professores", "disciplinas"})
+def observar(funcao):
+    _observadores.append(funcao)
+
+def _notificar(colecoes=COLECOES):
+    colecoes = set(colecoes)
+    for funcao in list(_observadores):
+        funcao(colecoes)
+
+# Função para gravar as operações de uma alteração, compactando quando o
+# diário ficaria maior que os próprios dados (custo amortizado constante por
+# alteração), e avisar os observadores das coleções alteradas. A compactação
+# já grava os dados com a alteração, então substitui o registro no diário.
+@metricas.etapa("persistir")
+def _persistir(operacoes):
+    with _trava_armazenamento:
+        armazenamento = _obter_armazenamento()
+        if armazenamento.pendentes + len(operacoes) > max(LIMITE_DIARIO, len(professores) + len(disciplinas)):
+            salvar_dados()
+        else:
+            armazenamento.registrar(operacoes)
+    _notificar({op["colecao"] for op in operacoes})
+
+# Função para carregar os dados ao iniciar o programa; os dados lidos
+# substituem os atuais de uma só vez, sob a escrita
+@metricas.etapa("carregar")
+def carregar_dados():
+    global _incremental, _predios, _indices_dados
+    with _trava_armazenamento:
+        carregados = _obter_armazenamento().carregar()
+    with dados.escrita():
+        _incremental = None
+        _predios = None
+        _indices_dados = None
+        dados.substituir(*carregados)
+        _notificar()
+
+# Classe que carrega os dados numa thread, para a interface aparecer antes do
+# fim da leitura. Os registros lidos dos instantâneos ficam em `lidos`
+# ({"professores": [...], "disciplinas": [...]}) à medida que chegam, para
+# serem exibidos aos poucos; os dados só passam a valer com aplicar(), chamada
+# na thread principal depois que em_andamento() devolve False.
+class CarregamentoEmSegundoPlano:
+    def __init__(self):
+        self.armazenamento = _obter_armazenamento()
+        self.lidos = {colecao: [] for colecao in COLECOES}
+        self.resultado = None
+        self.erro = None
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        try:
+            with metricas.etapa("carregar"), _trava_armazenamento:
+                self.resultado = self.armazenamento.carregar(parcial=self._receber)
+        except Exception as erro:
+            self.erro = erro
+
+    def _receber(self, colecao, registros):
+        self.lidos[colecao].extend(registros)
+
+    def em_andamento(self):
+        return self._thread.is_alive()
+
+    # Substituir os dados pelos carregados (com o diário reaplicado); devolve
+    # False se a leitura falhou
+    @_alteracao
+    def aplicar(self):
+        global _incremental, _predios, _indices_dados
+        if self.em_andamento() or self.erro is not None:
+            return False
+        _incremental = None
+        _predios = None
+        _indices_dados = None
+        dados.substituir(*self.resultado)
+        _notificar()
+        return True
+
+# Função que devolve o índice de uso dos prédios, montado na primeira consulta
+# (ou quando PREDIOS muda) e atualizado a cada alteração de disciplina. Deve
+# ser obtido antes de alterar a lista de disciplinas.
+def _indice_predios():
+    global _predios
+    if _predios is None or _predios.capacidades != PREDIOS:
+        _predios = IndicePredios(PREDIOS, disciplinas)
+    return _predios
+
+# Função para contar uso dos prédios (disciplinas de laboratório em cada um)
+def contar_uso_predios():
+    with dados.leitura():
+        return dict(_indice_predios().uso)
+
+# Função para escolher o prédio de uma disciplina de laboratório com o horário
+# informado: o menos usado entre os livres nesses horários (ver predios.py)
+def escolher_predio(horario=None):
+    with dados.leitura():
+        return _indice_predios().escolher(horario)
+
+# Função para alocar professores e persistir o resultado; com refinamento (em
+# segundos), a alocação é refinada por busca local (ver refinamento.py)
+@metricas.etapa("alocar")
+@_alteracao
+def alocar_professores(modo=alocacao.MODO_GULOSO, refinamento=0):
+    global _incremental, _indices_dados
+    alocacao.alocar(professores, disciplinas, modo=modo, regras=regras_alocacao(),
+                    tempo_refinamento=refinamento)
+    _incremental = None
+    _indices_dados = None
+    with metricas.etapa("salvar_alocacoes"), _trava_armazenamento:
+        _obter_armazenamento().salvar_alocacoes(professores, disciplinas)
+    _notificar()
+
+# Função que copia os dados, sob a leitura, para uso fora da thread que edita
+# (alocação, gravação, exportação): (versao, professores, disciplinas), com
+# cópias rasas dos registros (ver repositorio.py)
+def instantaneo():
+    return dados.instantaneo()
+
+# Função para exportar a grade (ver exportacao.py) a partir de uma cópia das
+# disciplinas; pode ser chamada de qualquer thread enquanto a interface edita
+def exportar_grade(destino, formato):
+    exportacao.escrever(dados.copiar("disciplinas"), destino, formato)
+
+# Função para aplicar de uma só vez o resultado de uma alocação feita sobre um
+# instantâneo; devolve False (sem alterar nada) se os dados mudaram desde então
+@metricas.etapa("aplicar_alocacao")
+def aplicar_alocacao(versao, professores_alocados, disciplinas_alocadas):
+    global _incremental, _indices_dados
+    with dados.escrita() as anterior:
+        if versao != anterior:
+            return False
+        for professor, alocado in zip(professores, professores_alocados):
+            professor["disciplinas_alocadas"] = alocado["disciplinas_alocadas"]
+        for disciplina, alocada in zip(disciplinas, disciplinas_alocadas):
+            disciplina["professor_alocado"] = alocada["professor_alocado"]
+        _incremental = None
+        _indices_dados = None
+        with _trava_armazenamento:
+            _obter_armazenamento().salvar_alocacoes(professores, disciplinas)
+        _notificar()
+        return True
+
+# Classe que executa a alocação numa thread, sobre um instantâneo dos dados
+# copiado pela própria thread, sem travar a interface. O progresso fica em
+# `progresso` (etapa, feitas, total); o resultado só é aplicado por aplicar(),
+# chamada na thread principal depois que em_andamento() devolve False.
+class AlocacaoEmSegundoPlano:
+    def __init__(self, modo=alocacao.MODO_GULOSO, refinamento=0):
+        self.modo = modo
+        self.refinamento = refinamento
+        self.regras = regras_alocacao()
+        self.versao = self.professores = self.disciplinas = None
+        self.progresso = (None, 0, len(disciplinas))
+        self.cancelada = False
+        self.erro = None
+        self._cancelar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        try:
+            self.versao, self.professores, self.disciplinas = instantaneo()
+            alocacao.alocar(self.professores, self.disciplinas, modo=self.modo, progresso=self._avisar,
+                            regras=self.regras, tempo_refinamento=self.refinamento)
+        except alocacao.AlocacaoCancelada:
+            self.cancelada = True
+        except Exception as erro:
+            self.erro = erro
+
+    def _avisar(self, etapa, feitas, total):
+        if self._cancelar.is_set():
+            raise alocacao.AlocacaoCancelada()
+        self.progresso = (etapa, feitas, total)
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def em_andamento(self):
+        return self._thread.is_alive()
+
+    # Aplicar o resultado; devolve False se a alocação foi cancelada, falhou ou
+    # se os dados foram alterados durante a execução
+    def aplicar(self):
+        if self.em_andamento() or self.cancelada or self.erro is not None:
+            return False
+        return aplicar_alocacao(self.versao, self.professores, self.disciplinas)
+
+# Classe que executa numa thread uma função que só lê os dados por instantâneos,
+# como salvar_dados() e exportar_grade(); o retorno fica em `resultado` e uma
+# falha em `erro`, depois que em_andamento() devolve False
+class TarefaEmSegundoPlano:
+    def __init__(self, funcao, *args):
+        self.resultado = None
+        self.erro = None
+        self._thread = threading.Thread(target=self._executar, args=(funcao, args), daemon=True)
+        self._thread.start()
+
+    def _executar(self, funcao, args):
+        try:
+            self.resultado = funcao(*args)
+        except Exception as erro:
+            self.erro = erro
+
+    def em_andamento(self):
+        return self._thread.is_alive()
+
+# Função que devolve o reparo incremental da alocação atual, criado na primeira
+# edição depois de uma alocação completa (ou None se nada foi alocado ainda)
+def _alocacao_incremental():
+    global _incremental
+    compiladas = regras_alocacao()
+    if _incremental is None and any(d.get("professor_alocado") for d in disciplinas):
+        _incremental = alocacao.AlocacaoIncremental(professores, disciplinas, regras=compiladas)
+    return _incremental
+
+# Função que devolve os índices por nome e das alocações (ver indices.py),
+# montados na primeira consulta e atualizados a cada alteração
+def _indices():
+    global _indices_dados
+    if _indices_dados is None:
+        _indices_dados = IndicesDados(professores, disciplinas)
+    return _indices_dados
+
+# Funções para buscar registros pelo nome (o primeiro registro com ele)
+def buscar_professor(nome):
+    with dados.leitura():
+        return _indices().professores.buscar(nome)
+
+def buscar_disciplina(nome):
+    with dados.leitura():
+        return _indices().disciplinas.buscar(nome)
+
+# Funções que acham os registros indicados por chaves: o id persistente do
+# registro (registro["id"], um int, que é a chave da linha nas tabelas, ver
+# tabelas.py) indica só aquele registro, mesmo com o nome repetido; um nome
+# (str) indica todos os registros com ele
+def _registros(indice, chaves):
+    encontrados = {}
+    for chave in chaves:
+        if isinstance(chave, int):
+            registro = indice.por_id.get(chave)
+            mesmos = [registro] if registro is not None else []
+        else:
+            mesmos = indice.todos(chave)
+        for registro in mesmos:
+            encontrados[registro["id"]] = registro
+    return list(encontrados.values())
+
+def _registro(indice, chave):
+    if isinstance(chave, int):
+        return indice.por_id.get(chave)
+    return indice.buscar(chave)
+
+# Função que monta as operações de diário dos registros alterados pelo reparo
+# incremental, exceto os já registrados (ou excluídos) pela própria operação,
+# e leva as disciplinas realocadas ao índice das alocações
+def _operacoes_incrementais(incremental, ignorar=()):
+    if incremental is None:
+        return []
+    ignorar = {registro["id"] for registro in ignorar}
+    professores_alterados, disciplinas_alteradas = incremental.drenar_alterados()
+    alocacoes = _indices().alocacoes
+    for disciplina in disciplinas_alteradas:
+        alocacoes.atualizar(disciplina)
+    operacoes = [Diario.salvar("professores", p["nome"], p)
+                 for p in professores_alterados if p["id"] not in ignorar]
+    operacoes += [Diario.salvar("disciplinas", d["nome"], d)
+                  for d in disciplinas_alteradas if d["id"] not in ignorar]
+    return operacoes
+
+# Função que indica se uma edição altera algum dos campos que influenciam a alocação
+def _altera_alocacao(registro, campos, campos_alocacao):
+    if regras_alocacao().area != regras.AREA_IGNORAR:
+        campos_alocacao += ("area_atuacao",)
+    return any(campo in campos and campos[campo] != registro.get(campo) for campo in campos_alocacao)
+
+# Funções para incluir, editar e excluir registros, sob a escrita dos dados. Se
+# já houve alocação, só as disciplinas afetadas pela alteração são realocadas;
+# as demais não mudam. Cada alteração é gravada no diário, sem regravar os
+# arquivos inteiros.
+@metricas.etapa("adicionar_professor")
+@_alteracao
+def adicionar_professor(professor):
+    professor = normalizar_campos(Professor.de(professor))
+    professor["id"] = dados.novo_id("professores")
+    incremental = _alocacao_incremental()
+    professores.append(professor)
+    _indices().professores.adicionar(professor)
+    if incremental is not None:
+        incremental.adicionar_professor(professor)
+    _persistir([Diario.salvar("professores", professor["nome"], professor)]
+               + _operacoes_incrementais(incremental, [professor]))
+
+@metricas.etapa("adicionar_disciplina")
+@_alteracao
+def adicionar_disciplina(disciplina):
+    disciplina = normalizar_campos(Disciplina.de(disciplina))
+    disciplina["id"] = dados.novo_id("disciplinas")
+    incremental = _alocacao_incremental()
+    _indice_predios().adicionar(disciplina)
+    disciplinas.append(disciplina)
+    _indices().disciplinas.adicionar(disciplina)
+    if incremental is not None:
+        incremental.adicionar_disciplina(disciplina)
+    _persistir([Diario.salvar("disciplinas", disciplina["nome"], disciplina)]
+               + _operacoes_incrementais(incremental, [disciplina]))
+
+# Na edição, só uma mudança dos campos usados pela alocação (disponibilidade,
+# modalidade, limites e, se as regras a usam, área) realoca as disciplinas do
+# professor; um novo nome é levado às disciplinas alocadas a ele. O professor é
+# indicado pela chave da linha da tabela ou, sem ela, pelo nome (ver _registro).
+@metricas.etapa("editar_professor")
+@_alteracao
+def editar_professor(chave, campos):
+    indices = _indices()
+    professor = _registro(indices.professores, chave)
+    if professor is None:
+        return None
+    nome_antigo = professor["nome"]
+    normalizar_campos(campos)
+    incremental = _alocacao_incremental()
+    if incremental is not None and _altera_alocacao(professor, campos, CAMPOS_ALOCACAO_PROFESSOR):
+        incremental.editar_professor(professor, campos)
+    else:
+        professor.update(campos)
+    operacoes = ([Diario.salvar("professores", nome_antigo, professor)]
+                 + _operacoes_incrementais(incremental, [professor]))
+
+    if professor["nome"] != nome_antigo:
+        indices.professores.renomear(professor, nome_antigo)
+        movidas = indices.alocacoes.renomear(nome_antigo, professor["nome"],
+                                             professor.get("disciplinas_alocadas") or [])
+        for disciplina in movidas:
+            disciplina["professor_alocado"] = professor["nome"]
+            operacoes.append(Diario.salvar("disciplinas", disciplina["nome"], disciplina))
+    _persistir(operacoes)
+    return professor
+
+# Na edição, só uma mudança de tipo, laboratório, horário ou (se as regras a
+# usam) área realoca a disciplina; um novo nome é levado à lista do professor
+# alocado a ela. A disciplina é indicada como em editar_professor.
+@metricas.etapa("editar_disciplina")
+@_alteracao
+def editar_disciplina(chave, campos):
+    indices = _indices()
+    disciplina = _registro(indices.disciplinas, chave)
+    if disciplina is None:
+        return None
+    nome_antigo = disciplina["nome"]
+    normalizar_campos(campos)
+    incremental = _alocacao_incremental()
+    indice = _indice_predios()
+    indice.remover(disciplina)
+    if incremental is not None and _altera_alocacao(disciplina, campos, CAMPOS_ALOCACAO_DISCIPLINA):
+        incremental.editar_disciplina(disciplina, campos)
+    else:
+        disciplina.update(campos)
+    indice.adicionar(disciplina)
+    operacoes = ([Diario.salvar("disciplinas", nome_antigo, disciplina)]
+                 + _operacoes_incrementais(incremental, [disciplina]))
+
+    if disciplina["nome"] != nome_antigo:
+        indices.disciplinas.renomear(disciplina, nome_antigo)
+        # Entre os professores com o nome alocado, o que tem a disciplina na lista
+        for professor in indices.professores.todos(disciplina.get("professor_alocado")):
+            alocadas = professor["disciplinas_alocadas"]
+            if nome_antigo in alocadas:
+                alocadas[alocadas.index(nome_antigo)] = disciplina["nome"]
+                operacoes.append(Diario.salvar("professores", professor["nome"], professor))
+                break
+    _persistir(operacoes)
+    return disciplina
+
+# Na exclusão, os registros são encontrados pelos índices (pelas chaves das
+# linhas ou pelos nomes, ver _registros) e as listas são compactadas numa
+# única passada
+@metricas.etapa("remover_professores")
+@_alteracao
+def remover_professores(chaves):
+    indices = _indices()
+    removidos = _registros(indices.professores, chaves)
+    incremental = _alocacao_incremental()
+    if removidos:
+        removidos_ids = {professor["id"] for professor in removidos}
+        professores[:] = [p for p in professores if p["id"] not in removidos_ids]
+    for professor in removidos:
+        indices.professores.remover(professor)
+    if incremental is not None:
+        for professor in removidos:
+            incremental.remover_professor(professor)
+    _persistir([Diario.remover("professores", p["nome"], p.get("id")) for p in removidos]
+               + _operacoes_incrementais(incremental, removidos))
+    return removidos
+
+# Funções que verificam um registro a importar; devolvem o motivo da recusa
+# ou None se o registro é válido
+def _problema_professor(professor):
+    if not professor["nome"]:
+        return "nome vazio"
+    if professor["modalidade"] not in MODALIDADES:
+        return f"modalidade desconhecida: {professor['modalidade']}"
+    for campo in ("max_disciplinas", "max_horas"):
+        valor = professor.get(campo)
+        if valor is not None and (isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor < 0):
+            return f"{campo} inválido: {valor!r}"
+    return None
+
+def _problema_disciplina(disciplina):
+    if not disciplina["nome"]:
+        return "nome vazio"
+    if disciplina["tipo"] not in MODALIDADES:
+        return f"tipo desconhecido: {disciplina['tipo']}"
+    if not disciplina["horario"]:
+        return "sem horário"
+    if disciplina.get("area_atuacao") and disciplina["area_atuacao"] not in AREAS_ATUACAO:
+        return f"área de atuação desconhecida: {disciplina['area_atuacao']}"
+    return None
+
+# Função que normaliza, valida e elimina repetições de registros a importar
+# (existentes: os nomes já cadastrados). Devolve os registros aceitos e os
+# recusados, como (posição, nome, motivo).
+def _preparar_importacao(registros, normalizar, problema, existentes):
+    nomes = set()
+    aceitos = []
+    recusados = []
+    for posicao, registro in enumerate(registros):
+        try:
+            registro = normalizar(registro)
+        except (KeyError, TypeError, ValueError, AttributeError) as erro:
+            recusados.append((posicao, None, f"registro inválido: {erro!r}"))
+            continue
+        motivo = problema(registro)
+        if motivo is None and (registro["nome"] in existentes or registro["nome"] in nomes):
+            motivo = "nome repetido"
+        if motivo is not None:
+            recusados.append((posicao, registro["nome"], motivo))
+            continue
+        nomes.add(registro["nome"])
+        aceitos.append(registro)
+    return aceitos, recusados
+
+# Funções para importar muitos registros de uma vez (por exemplo, de
+# importacao.ler_registros): os registros são normalizados, os inválidos e os
+# de nome já cadastrado (ou repetido na importação) são recusados, e os
+# aceitos são gravados numa única operação, com uma única atualização das
+# tabelas. Devolvem (aceitos, recusados), como _preparar_importacao.
+@metricas.etapa("importar_professores")
+@_alteracao
+def importar_professores(registros):
+    aceitos, recusados = _preparar_importacao(
+        registros, importacao.normalizar_professor, _problema_professor, _indices().professores)
+    if not aceitos:
+        return aceitos, recusados
+    for professor in aceitos:
+        professor["id"] = dados.novo_id("professores")
+    incremental = _alocacao_incremental()
+    professores.extend(aceitos)
+    for professor in aceitos:
+        _indices().professores.adicionar(professor)
+    if incremental is not None:
+        for professor in aceitos:
+            incremental.adicionar_professor(professor)
+    _persistir([Diario.salvar("professores", p["nome"], p) for p in aceitos]
+               + _operacoes_incrementais(incremental, aceitos))
+    return aceitos, recusados
+
+@metricas.etapa("importar_disciplinas")
+@_alteracao
+def importar_disciplinas(registros):
+    aceitos, recusados = _preparar_importacao(
+        registros, importacao.normalizar_disciplina, _problema_disciplina, _indices().disciplinas)
+    if not aceitos:
+        return aceitos, recusados
+    # Prédios das disciplinas de laboratório, escolhidos pelo índice de uso,
+    # que já conta as escolhidas antes na mesma importação
+    indice = _indice_predios()
+    for disciplina in aceitos:
+        if disciplina["necessita_lab"] and disciplina["predio"] is None:
+            disciplina["predio"] = indice.escolher(disciplina["horario"])
+        indice.adicionar(disciplina)
+    for disciplina in aceitos:
+        disciplina["id"] = dados.novo_id("disciplinas")
+    incremental = _alocacao_incremental()
+    disciplinas.extend(aceitos)
+    for disciplina in aceitos:
+        _indices().disciplinas.adicionar(disciplina)
+    if incremental is not None:
+        for disciplina in aceitos:
+            incremental.adicionar_disciplina(disciplina)
+    _persistir([Diario.salvar("disciplinas", d["nome"], d) for d in aceitos]
+               + _operacoes_incrementais(incremental, aceitos))
+    return aceitos, recusados
+
+@metricas.etapa("remover_disciplinas")
+@_alteracao
+def remover_disciplinas(chaves):
+    indices = _indices()
+    removidas = _registros(indices.disciplinas, chaves)
+    incremental = _alocacao_incremental()
+    indice = _indice_predios()
+    for disciplina in removidas:
+        indice.remover(disciplina)
+        indices.disciplinas.remover(disciplina)
+    if removidas:
+        removidas_ids = {disciplina["id"] for disciplina in removidas}
+        disciplinas[:] = [d for d in disciplinas if d["id"] not in removidas_ids]
+    if incremental is not None:
+        for disciplina in removidas:
+            incremental.remover_disciplina(disciplina)
+    operacoes = ([Diario.remover("disciplinas", d["nome"], d.get("id")) for d in removidas]
+                 + _operacoes_incrementais(incremental, removidas))
+    for disciplina in removidas:
+        indices.alocacoes.remover(disciplina)
+    _persistir(operacoes)
+    return removidas
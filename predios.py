@@ -0,0 +1,105 @@
+"""
+Prédios de Laboratório
+======================
+
+Índice de uso dos laboratórios, mantido a cada inclusão, edição e exclusão de
+disciplina em vez de recontado varrendo todas as disciplinas. Para cada prédio
+guarda o número de disciplinas de laboratório, quantas ocupam cada horário
+(chave (prédio, bit do horário), ver horarios.py) e a máscara dos horários
+ocupados, de modo que saber se um prédio está livre nos horários de uma
+disciplina é um único `&`.
+
+Cada prédio tem uma capacidade: o número máximo de disciplinas de laboratório
+(None para ilimitado). Como na alocação (ver alocacao.py), o laboratório de um
+prédio recebe uma única disciplina por horário.
+
+Classes:
+-------
+IndicePredios: Uso de cada prédio por horário e escolha do prédio de uma disciplina
+"""
+
+import horarios
+
+
+# Prédio do laboratório de uma disciplina, ou None se ela não usa laboratório
+def predio_da_disciplina(disciplina):
+    if disciplina.get("necessita_lab") and disciplina.get("predio"):
+        return disciplina["predio"]
+    return None
+
+
+# Função geradora dos bits de uma máscara de horários
+def _bits(valor):
+    while valor:
+        menor = valor & -valor
+        yield menor
+        valor ^= menor
+
+
+def _mascara(horario):
+    return horarios.mascara(horario) if horario else 0
+
+
+class IndicePredios:
+    def __init__(self, capacidades, disciplinas=()):
+        # Prédios configurados, na ordem de preferência em caso de empate
+        self.capacidades = dict(capacidades)
+        self.uso = {predio: 0 for predio in self.capacidades}
+        # (prédio, bit do horário) -> disciplinas de laboratório no horário
+        self.por_horario = {}
+        # prédio -> máscara dos horários com alguma disciplina de laboratório
+        self.ocupado = {predio: 0 for predio in self.capacidades}
+        for disciplina in disciplinas:
+            self.adicionar(disciplina)
+
+    # Contar uma disciplina (sem efeito se ela não usa laboratório)
+    def adicionar(self, disciplina):
+        predio = predio_da_disciplina(disciplina)
+        if predio is None:
+            return
+        self.uso[predio] = self.uso.get(predio, 0) + 1
+        ocupado = self.ocupado.get(predio, 0)
+        for bit in _bits(_mascara(disciplina.get("horario"))):
+            chave = (predio, bit)
+            self.por_horario[chave] = self.por_horario.get(chave, 0) + 1
+            ocupado |= bit
+        self.ocupado[predio] = ocupado
+
+    # Descontar uma disciplina já contada; deve receber o registro como estava
+    # quando foi contado (antes de uma edição)
+    def remover(self, disciplina):
+        predio = predio_da_disciplina(disciplina)
+        if predio is None or not self.uso.get(predio):
+            return
+        self.uso[predio] -= 1
+        for bit in _bits(_mascara(disciplina.get("horario"))):
+            chave = (predio, bit)
+            restantes = self.por_horario.get(chave, 0) - 1
+            if restantes > 0:
+                self.por_horario[chave] = restantes
+            else:
+                self.por_horario.pop(chave, None)
+                self.ocupado[predio] &= ~bit
+
+    def livre(self, predio, horario):
+        return self.ocupado.get(predio, 0) & _mascara(horario) == 0
+
+    def cheio(self, predio):
+        capacidade = self.capacidades.get(predio)
+        return capacidade is not None and self.uso.get(predio, 0) >= capacidade
+
+    # Escolher o prédio para uma disciplina de laboratório com o horário
+    # informado: o menos usado entre os livres nesses horários e abaixo da
+    # capacidade. Se nenhum estiver, o menos usado abaixo da capacidade e, por
+    # fim, o menos usado de todos. O custo depende só do número de prédios.
+    def escolher(self, horario=None):
+        valor = _mascara(horario)
+        melhor = None
+        melhor_chave = None
+        for predio in self.capacidades:
+            cheio = self.cheio(predio)
+            impedido = cheio or self.ocupado.get(predio, 0) & valor != 0
+            chave = (impedido, cheio, self.uso.get(predio, 0))
+            if melhor_chave is None or chave < melhor_chave:
+                melhor, melhor_chave = predio, chave
+        return melhor
@@ -0,0 +1,345 @@
+"""
+Refinamento da Alocação por Busca Local
+=======================================
+
+A regra gulosa equilibra a carga só no momento em que cada disciplina é
+visitada, então a distribuição final depende da ordem da lista. Este módulo
+melhora uma alocação já feita (gulosa ou por fluxo) com recozimento simulado
+(simulated annealing), minimizando
+
+    objetivo = PESO * não alocadas + P * variância das cargas
+
+onde P é o número de professores e PESO é maior que qualquer variação de
+P * variância num único movimento, de modo que alocar mais uma disciplina
+sempre compensa. Os movimentos são:
+
+- incluir: uma disciplina sem professor passa a um professor que pode recebê-la;
+- mover: uma disciplina passa do seu professor a outro;
+- trocar: duas disciplinas de professores diferentes trocam de professor
+  (não muda as cargas, mas libera horários para os outros movimentos).
+
+Todo movimento respeita as mesmas restrições da alocação (modalidade, área,
+limites de disciplinas e de horas, horários livres e laboratório, ver
+regras.py), verificadas com as máscaras de horários. A soma das cargas e a
+soma dos quadrados são mantidas a cada movimento, então a variação do
+objetivo é calculada em O(1), sem recontar as cargas. Os pesos de custo das
+regras não entram no objetivo.
+
+Movimentos piores são aceitos com probabilidade exp(-variação / temperatura),
+com a temperatura caindo até zero ao fim do tempo (ou dos movimentos)
+disponível. A melhor solução vista é a devolvida: os movimentos feitos depois
+dela ficam num registro e são desfeitos ao final.
+
+O sorteio usa random.Random(semente); com o número de movimentos fixo (e não
+o tempo), o resultado é reprodutível.
+
+Classes:
+-------
+BuscaLocal: Estado da busca, com as cargas e os horários livres de cada professor
+
+Funções principais:
+-----------------
+refinar(): Melhora as escolhas de uma alocação e devolve o objetivo antes e depois
+"""
+
+import math
+import random
+import time
+
+import horarios
+from regras import compilar as compilar_regras
+
+# Etapa informada à função de progresso (ver alocacao.alocar)
+ETAPA_REFINAMENTO = "refinamento"
+
+# Temperatura inicial, em unidades de carga ao quadrado: um movimento que
+# piora o objetivo em 1 começa aceito com probabilidade de cerca de 37%
+TEMPERATURA_INICIAL = 1.0
+
+# Movimentos entre duas verificações do relógio (e avisos de progresso)
+INTERVALO_VERIFICACAO = 512
+
+
+# Maior carga que um professor com o limite pode ter entre `total` disciplinas
+def _maior_carga(limite, total):
+    return total if limite == math.inf else min(limite, total)
+
+
+class BuscaLocal:
+    def __init__(self, professores, disciplinas, escolhas, regras=None, semente=None):
+        self.regras = compilar_regras(regras)
+        self.sorteio = random.Random(semente)
+        self.escolhas = list(escolhas)
+
+        self.modalidade = [p["modalidade"] for p in professores]
+        self.area = [p.get("area_atuacao") for p in professores]
+        self.disponibilidade = [horarios.mascara(p["disponibilidade"]) for p in professores]
+        limites = [self.regras.limites(p) for p in professores]
+        self.limite = [limite for limite, _ in limites]
+        self.limite_horas = [limite_horas for _, limite_horas in limites]
+        self.livre = list(self.disponibilidade)
+        self.carga = [0] * len(professores)
+        self.horas = [0] * len(professores)
+
+        self.exigida = [horarios.mascara(d["horario"]) for d in disciplinas]
+        self.horas_exigidas = [horarios.contar(exigida) for exigida in self.exigida]
+        self.grupo = [self.regras.grupo(d) for d in disciplinas]
+        self.predio = [d["predio"] if d.get("necessita_lab") and d.get("predio") else None
+                       for d in disciplinas]
+        self.ocupado_predio = {}
+
+        # Disciplinas de cada professor e sem professor, com a posição de cada
+        # uma na sua lista, para retirar em O(1)
+        self.de_professor = [[] for _ in professores]
+        self.pendentes = []
+        self.indice = [0] * len(disciplinas)
+        # (grupo, máscara exigida) -> (lista, conjunto) dos professores compatíveis
+        self.candidatos = {}
+
+        for i, posicao in enumerate(self.escolhas):
+            if posicao is None:
+                self._acrescentar(self.pendentes, i)
+            else:
+                self._ocupar(i, posicao)
+                self._ocupar_laboratorio(i)
+
+        self.professores = max(1, len(professores))
+        self.soma = sum(self.carga)
+        self.soma_quadrados = sum(carga * carga for carga in self.carga)
+        # Peso de uma disciplina sem professor: maior que a variação de
+        # P * variância ao incluir uma disciplina (no máximo 2 * carga + 1)
+        maior_carga = max((_maior_carga(limite, len(disciplinas)) for limite in self.limite), default=0)
+        self.peso = 2 * maior_carga + 2
+        # Movimentos feitos desde a melhor solução vista, para desfazer ao final
+        self.registro = []
+        self.movimentos = 0
+        self.aceitos = 0
+
+    def _acrescentar(self, lista, i):
+        self.indice[i] = len(lista)
+        lista.append(i)
+
+    def _retirar(self, lista, i):
+        posicao = self.indice[i]
+        ultima = lista.pop()
+        if ultima != i:
+            lista[posicao] = ultima
+            self.indice[ultima] = posicao
+
+    # Registrar a disciplina i no professor (sem atualizar as somas)
+    def _ocupar(self, i, posicao):
+        self.escolhas[i] = posicao
+        self.carga[posicao] += 1
+        self.horas[posicao] += self.horas_exigidas[i]
+        self.livre[posicao] &= ~self.exigida[i]
+        self._acrescentar(self.de_professor[posicao], i)
+
+    def _liberar(self, i):
+        posicao = self.escolhas[i]
+        self.escolhas[i] = None
+        self.carga[posicao] -= 1
+        self.horas[posicao] -= self.horas_exigidas[i]
+        self.livre[posicao] |= self.exigida[i]
+        self._retirar(self.de_professor[posicao], i)
+        return posicao
+
+    def _ocupar_laboratorio(self, i):
+        predio = self.predio[i]
+        if predio:
+            self.ocupado_predio[predio] = self.ocupado_predio.get(predio, 0) | self.exigida[i]
+
+    def _liberar_laboratorio(self, i):
+        predio = self.predio[i]
+        if predio:
+            self.ocupado_predio[predio] &= ~self.exigida[i]
+
+    # Professores que podem receber a disciplina com a agenda vazia (modalidade,
+    # área e disponibilidade), calculados uma vez por perfil
+    def _candidatos(self, i):
+        chave = (self.grupo[i], self.exigida[i])
+        candidatos = self.candidatos.get(chave)
+        if candidatos is None:
+            exigida = self.exigida[i]
+            lista = [posicao for posicao, modalidade in enumerate(self.modalidade)
+                     if exigida & ~self.disponibilidade[posicao] == 0
+                     and self.regras.compativel(modalidade, self.area[posicao], self.grupo[i])]
+            candidatos = self.candidatos[chave] = (lista, set(lista))
+        return candidatos
+
+    # Verificar se o professor recebe a disciplina i, com os horários livres
+    # acrescidos de `liberada` (a máscara de uma disciplina que ele cederia)
+    def _cabe(self, i, posicao, liberada=0, horas_liberadas=0, carga_liberada=0):
+        exigida = self.exigida[i]
+        return (self.carga[posicao] - carga_liberada < self.limite[posicao]
+                and exigida & ~(self.livre[posicao] | liberada) == 0
+                and self.horas[posicao] - horas_liberadas + self.horas_exigidas[i] <= self.limite_horas[posicao])
+
+    # Variação da soma dos quadrados das cargas ao somar `delta` à carga do professor
+    def _variacao_quadrados(self, posicao, delta):
+        carga = self.carga[posicao]
+        return (carga + delta) * (carga + delta) - carga * carga
+
+    # P * variância das cargas a partir das somas
+    def _dispersao(self, soma, soma_quadrados):
+        return soma_quadrados - soma * soma / self.professores
+
+    def objetivo(self):
+        return self.peso * len(self.pendentes) + self._dispersao(self.soma, self.soma_quadrados)
+
+    def resumo(self):
+        variancia = self._dispersao(self.soma, self.soma_quadrados) / self.professores
+        return {"nao_alocadas": len(self.pendentes), "variancia": variancia, "objetivo": self.objetivo()}
+
+    # Sortear um movimento viável; devolve (variação do objetivo, movimento) ou None
+    def _sortear(self):
+        sorteio = self.sorteio
+        if self.pendentes and sorteio.random() < 0.5:
+            i = self.pendentes[sorteio.randrange(len(self.pendentes))]
+            lista, _ = self._candidatos(i)
+            if not lista:
+                return None
+            destino = lista[sorteio.randrange(len(lista))]
+            predio = self.predio[i]
+            if not self._cabe(i, destino) or (predio and self.ocupado_predio.get(predio, 0) & self.exigida[i]):
+                return None
+            soma = self.soma + 1
+            quadrados = self.soma_quadrados + self._variacao_quadrados(destino, 1)
+            variacao = (-self.peso + self._dispersao(soma, quadrados)
+                        - self._dispersao(self.soma, self.soma_quadrados))
+            return variacao, ("incluir", i, destino)
+
+        if not self.escolhas:
+            return None
+        i = sorteio.randrange(len(self.escolhas))
+        origem = self.escolhas[i]
+        if origem is None:
+            return None
+        lista, _ = self._candidatos(i)
+        if not lista:
+            return None
+        destino = lista[sorteio.randrange(len(lista))]
+        if destino == origem:
+            return None
+
+        if sorteio.random() < 0.5:
+            if not self._cabe(i, destino):
+                return None
+            variacao = self._variacao_quadrados(origem, -1) + self._variacao_quadrados(destino, 1)
+            return variacao, ("mover", i, origem, destino)
+
+        # Troca com uma disciplina do professor de destino
+        outras = self.de_professor[destino]
+        if not outras:
+            return None
+        j = outras[sorteio.randrange(len(outras))]
+        if origem not in self._candidatos(j)[1]:
+            return None
+        horas_i = self.horas_exigidas[i]
+        horas_j = self.horas_exigidas[j]
+        if (not self._cabe(i, destino, self.exigida[j], horas_j, 1)
+                or not self._cabe(j, origem, self.exigida[i], horas_i, 1)):
+            return None
+        return 0, ("trocar", i, j)
+
+    def _aplicar(self, movimento):
+        tipo = movimento[0]
+        if tipo == "incluir":
+            _, i, destino = movimento
+            self._retirar(self.pendentes, i)
+            self.soma += 1
+            self.soma_quadrados += self._variacao_quadrados(destino, 1)
+            self._ocupar(i, destino)
+            self._ocupar_laboratorio(i)
+        elif tipo == "retirar":
+            _, i, origem = movimento
+            self.soma -= 1
+            self.soma_quadrados += self._variacao_quadrados(origem, -1)
+            self._liberar(i)
+            self._acrescentar(self.pendentes, i)
+            self._liberar_laboratorio(i)
+        elif tipo == "mover":
+            _, i, origem, destino = movimento
+            self.soma_quadrados += self._variacao_quadrados(origem, -1) + self._variacao_quadrados(destino, 1)
+            self._liberar(i)
+            self._ocupar(i, destino)
+        else:
+            _, i, j = movimento
+            origem = self._liberar(i)
+            destino = self._liberar(j)
+            self._ocupar(i, destino)
+            self._ocupar(j, origem)
+
+    # Movimento que desfaz outro
+    @staticmethod
+    def _inverso(movimento):
+        tipo = movimento[0]
+        if tipo == "incluir":
+            return ("retirar", movimento[1], movimento[2])
+        if tipo == "mover":
+            return ("mover", movimento[1], movimento[3], movimento[2])
+        return movimento
+
+    # Executar a busca por `tempo` segundos ou, se informado, por `movimentos`
+    # sorteios; devolve as escolhas da melhor solução vista
+    def executar(self, tempo=1.0, movimentos=None, progresso=None):
+        inicio = time.perf_counter()
+        atual = melhor = self.objetivo()
+        temperatura = TEMPERATURA_INICIAL
+        feitos = 0
+        sorteio = self.sorteio
+        while True:
+            if feitos % INTERVALO_VERIFICACAO == 0:
+                if movimentos is not None:
+                    fracao = feitos / movimentos if movimentos else 1.0
+                else:
+                    fracao = (time.perf_counter() - inicio) / tempo if tempo > 0 else 1.0
+                if fracao >= 1.0:
+                    break
+                temperatura = TEMPERATURA_INICIAL * (1.0 - fracao)
+                if progresso is not None:
+                    progresso(ETAPA_REFINAMENTO, int(fracao * 100), 100)
+            feitos += 1
+
+            sorteado = self._sortear()
+            if sorteado is None:
+                continue
+            variacao, movimento = sorteado
+            if variacao > 0 and (temperatura <= 0 or sorteio.random() >= math.exp(-variacao / temperatura)):
+                continue
+            self._aplicar(movimento)
+            self.aceitos += 1
+            atual += variacao
+            if atual < melhor - 1e-9:
+                melhor = atual
+                self.registro.clear()
+            else:
+                self.registro.append(movimento)
+
+        # Voltar à melhor solução vista
+        for movimento in reversed(self.registro):
+            self._aplicar(self._inverso(movimento))
+        self.registro.clear()
+        self.movimentos += feitos
+        if progresso is not None:
+            progresso(ETAPA_REFINAMENTO, 100, 100)
+        return self.escolhas
+
+
+# Função para refinar as escolhas de uma alocação (a posição do professor de
+# cada disciplina, ou None), sem alterar os registros. Devolve as novas
+# escolhas e um relatório {"antes": ..., "depois": ..., "movimentos",
+# "aceitos", "tempo"}, com "nao_alocadas", "variancia" e "objetivo" antes e
+# depois. As escolhas recebidas devem respeitar as regras.
+def refinar(professores, disciplinas, escolhas, regras=None, tempo=1.0, movimentos=None, semente=None,
+            progresso=None):
+    inicio = time.perf_counter()
+    busca = BuscaLocal(professores, disciplinas, escolhas, regras, semente)
+    antes = busca.resumo()
+    novas = busca.executar(tempo, movimentos, progresso)
+    return novas, {
+        "antes": antes,
+        "depois": busca.resumo(),
+        "movimentos": busca.movimentos,
+        "aceitos": busca.aceitos,
+        "tempo": time.perf_counter() - inicio,
+    }
@@ -0,0 +1,156 @@
+"""
+Registros de Professores e Disciplinas
+======================================
+
+Classes compactas (com __slots__) para os registros carregados em memória. Um
+dicionário guarda, em cada registro, uma tabela com as próprias chaves; estas
+classes guardam só os valores, o que reduz bastante a memória com dezenas de
+milhares de registros.
+
+Os registros se comportam como dicionários (registro["nome"], get, update,
+"predio" in registro, dict(registro)...), então o restante do sistema os usa
+da mesma forma que os dicionários lidos dos arquivos JSON. Um campo nunca
+atribuído se comporta como uma chave ausente, e chaves fora dos campos
+conhecidos são aceitas e guardadas à parte.
+
+O campo "id" é o identificador persistente do registro, atribuído pelo núcleo
+ao incluí-lo (ver repositorio.py) e usado pelo diário e pelo banco para achar
+o registro, já que os nomes podem se repetir. Os registros lidos por cli.py e
+lote.py não o têm.
+
+Para gravar em JSON, use default=serializar em json.dump/json.dumps.
+
+Classes:
+-------
+Professor: nome, area_atuacao, disponibilidade, modalidade, disciplinas_alocadas, id
+Disciplina: nome, tipo, necessita_lab, predio, horario, professor_alocado, id
+"""
+
+from collections.abc import MutableMapping
+from operator import attrgetter
+
+
+# Classe base: um mapeamento cujos campos conhecidos ficam em __slots__
+class Registro(MutableMapping):
+    __slots__ = ("_extras",)
+    CAMPOS = ()
+    _campos = frozenset()
+
+    def __init__(self, campos=(), **outros):
+        self._extras = None
+        if outros or not isinstance(campos, dict):
+            campos = dict(campos, **outros)
+        # Caminho rápido para os dicionários lidos dos arquivos JSON
+        for chave, valor in campos.items():
+            if chave in self._campos:
+                setattr(self, chave, valor)
+            else:
+                self[chave] = valor
+
+    # Converter um dicionário (ou registro de outro tipo) no registro da classe
+    @classmethod
+    def de(cls, registro):
+        if type(registro) is cls:
+            return registro
+        return cls(registro)
+
+    def __getitem__(self, chave):
+        if chave in self._campos:
+            try:
+                return getattr(self, chave)
+            except AttributeError:
+                pass
+        elif self._extras is not None and chave in self._extras:
+            return self._extras[chave]
+        raise KeyError(chave)
+
+    def get(self, chave, padrao=None):
+        if chave in self._campos:
+            return getattr(self, chave, padrao)
+        if self._extras is not None:
+            return self._extras.get(chave, padrao)
+        return padrao
+
+    def __setitem__(self, chave, valor):
+        if chave in self._campos:
+            setattr(self, chave, valor)
+        else:
+            if self._extras is None:
+                self._extras = {}
+            self._extras[chave] = valor
+
+    def __delitem__(self, chave):
+        if chave in self._campos:
+            try:
+                delattr(self, chave)
+                return
+            except AttributeError:
+                pass
+        elif self._extras is not None and chave in self._extras:
+            del self._extras[chave]
+            return
+        raise KeyError(chave)
+
+    def __contains__(self, chave):
+        if chave in self._campos:
+            return hasattr(self, chave)
+        return self._extras is not None and chave in self._extras
+
+    def __iter__(self):
+        for campo in self.CAMPOS:
+            if hasattr(self, campo):
+                yield campo
+        if self._extras is not None:
+            yield from self._extras
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dict()!r})"
+
+    # Cópia rasa, como dict.copy()
+    def copy(self):
+        copia = type(self).__new__(type(self))
+        copia._extras = dict(self._extras) if self._extras is not None else None
+        for campo in self.CAMPOS:
+            if hasattr(self, campo):
+                setattr(copia, campo, getattr(self, campo))
+        return copia
+
+    # Dicionário com os campos e as chaves extras, na ordem de iteração. Com
+    # todos os campos atribuídos (o caso comum) os valores são lidos de uma vez.
+    # O id, último campo, fica fora de _valores (e do zip, que para no menor),
+    # já que os registros sem id também são comuns.
+    def para_dict(self):
+        try:
+            campos = dict(zip(self.CAMPOS, self._valores(self)))
+        except AttributeError:
+            campos = {campo: getattr(self, campo) for campo in self.CAMPOS if hasattr(self, campo)}
+        else:
+            if hasattr(self, "id"):
+                campos["id"] = self.id
+        if self._extras:
+            campos.update(self._extras)
+        return campos
+
+
+class Professor(Registro):
+    CAMPOS = ("nome", "area_atuacao", "disponibilidade", "modalidade", "disciplinas_alocadas", "id")
+    __slots__ = CAMPOS
+    _campos = frozenset(CAMPOS)
+    _valores = attrgetter(*CAMPOS[:-1])
+
+
+class Disciplina(Registro):
+    CAMPOS = ("nome", "tipo", "necessita_lab", "predio", "horario", "professor_alocado", "id")
+    __slots__ = CAMPOS
+    _campos = frozenset(CAMPOS)
+    _valores = attrgetter(*CAMPOS[:-1])
+
+
+# Função para usar em json.dump(..., default=serializar)
+def serializar(objeto):
+    if isinstance(objeto, Registro):
+        return objeto.para_dict()
+    raise TypeError(f"Objeto do tipo {type(objeto).__name__} não é serializável em JSON")
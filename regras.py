@@ -0,0 +1,179 @@
+"""
+Regras de Alocação
+==================
+
+Regras declarativas da alocação, num dicionário (ou arquivo JSON) com as
+chaves abaixo; as omitidas ficam com o valor padrão, que reproduz a regra
+original (mesma modalidade, até 4 disciplinas, o professor menos carregado):
+
+    {
+        "max_disciplinas": 4,      # disciplinas por professor (null: sem limite)
+        "max_horas": null,         # horas semanais por professor (null: sem limite)
+        "area": "ignorar",         # "ignorar", "exigir" ou "preferir"
+        "modalidades": {           # tipos de disciplina que cada modalidade de professor atende
+            "híbrido": ["híbrido", "presencial", "ead"]
+        },
+        "pesos": {"carga": 1, "horas": 0, "area": 1, "modalidade": 0}
+    }
+
+- Cada horário da grade conta como uma hora semanal. Os limites podem ser
+  ajustados por professor pelos campos "max_disciplinas" e "max_horas" do
+  registro.
+- A área de uma disciplina é o campo opcional "area_atuacao" (uma das
+  AREAS_ATUACAO, como a dos professores). Com "exigir", uma disciplina com
+  área só recebe professores da mesma área; com "preferir", o peso "area" é
+  somado ao custo dos professores de outra área.
+- Uma modalidade ausente de "modalidades" atende só disciplinas do seu tipo.
+  MODALIDADES_HIBRIDO é a matriz em que professores híbridos atendem
+  disciplinas presenciais e EAD.
+- Entre os professores que podem receber uma disciplina, fica o de menor custo
+
+      carga * disciplinas + horas * horas semanais
+      + area * (área diferente) + modalidade * (modalidade diferente do tipo)
+
+  com empates resolvidos pela ordem do professor na lista.
+
+compilar() valida as regras e as transforma, uma vez por execução, nas tabelas
+e funções consultadas pelo motor (ver alocacao.py): a matriz de modalidades
+como dicionário, os limites de cada professor e uma função de custo
+especializada nos pesos diferentes de zero. Nada é interpretado por par
+(professor, disciplina) durante a alocação.
+
+Classes:
+-------
+RegrasCompiladas: Regras prontas para o motor de alocação
+
+Funções principais:
+-----------------
+compilar(): Valida e compila um dicionário de regras
+ler_regras(): Lê as regras de um arquivo JSON
+"""
+
+import json
+
+# Valores padrão de cada regra
+PADRAO = {
+    "max_disciplinas": 4,
+    "max_horas": None,
+    "area": "ignorar",
+    "modalidades": {},
+    "pesos": {"carga": 1, "horas": 0, "area": 1, "modalidade": 0},
+}
+
+AREA_IGNORAR = "ignorar"
+AREA_EXIGIR = "exigir"
+AREA_PREFERIR = "preferir"
+MODOS_AREA = [AREA_IGNORAR, AREA_EXIGIR, AREA_PREFERIR]
+
+# Matriz em que professores híbridos atendem também disciplinas presenciais e EAD
+MODALIDADES_HIBRIDO = {"híbrido": ["híbrido", "presencial", "ead"]}
+
+# Limite usado quando uma regra não limita (maior que qualquer carga possível)
+SEM_LIMITE = float("inf")
+
+
+def _limite(valor, nome):
+    if valor is None:
+        return SEM_LIMITE
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor < 0:
+        raise ValueError(f"Regra {nome} inválida: {valor!r} (use um número não negativo ou null)")
+    return valor
+
+
+# Função para montar a função de custo com só os pesos diferentes de zero.
+# Sem pesos além da carga (o padrão), o custo é a própria carga e não há função.
+def _compilar_custo(pesos, area):
+    carga = pesos["carga"]
+    horas = pesos["horas"]
+    outra_area = pesos["area"] if area == AREA_PREFERIR else 0
+    outra_modalidade = pesos["modalidade"]
+    if carga == 1 and not horas and not outra_area and not outra_modalidade:
+        return None
+    if not outra_area and not outra_modalidade:
+        return lambda disciplinas, horas_semanais, diferente_area, diferente_modalidade: (
+            carga * disciplinas + horas * horas_semanais)
+    return lambda disciplinas, horas_semanais, diferente_area, diferente_modalidade: (
+        carga * disciplinas + horas * horas_semanais
+        + outra_area * diferente_area + outra_modalidade * diferente_modalidade)
+
+
+class RegrasCompiladas:
+    def __init__(self, regras):
+        self.regras = regras
+        self.max_disciplinas = _limite(regras["max_disciplinas"], "max_disciplinas")
+        self.max_horas = _limite(regras["max_horas"], "max_horas")
+        self.area = regras["area"]
+        # modalidade do professor -> tipos de disciplina atendidos
+        self._atende = {modalidade: tuple(tipos) for modalidade, tipos in regras["modalidades"].items()}
+        self.custo = _compilar_custo(regras["pesos"], self.area)
+        # O custo depende da disciplina (área ou modalidade), e não só da carga
+        self.custo_por_grupo = (self.custo is not None
+                                and (regras["pesos"]["modalidade"] != 0
+                                     or (self.area == AREA_PREFERIR and regras["pesos"]["area"] != 0)))
+
+    # Tipos de disciplina atendidos por professores da modalidade
+    def atende(self, modalidade):
+        tipos = self._atende.get(modalidade)
+        if tipos is None:
+            tipos = self._atende[modalidade] = (modalidade,)
+        return tipos
+
+    # Grupo de uma disciplina: (tipo, área), com a área só se alguma regra a usa.
+    # Disciplinas do mesmo grupo e horário disputam os mesmos professores.
+    def grupo(self, disciplina):
+        if self.area == AREA_IGNORAR:
+            return (disciplina["tipo"], None)
+        return (disciplina["tipo"], disciplina.get("area_atuacao") or None)
+
+    # Limites (disciplinas, horas semanais) de um professor, com os ajustes do registro
+    def limites(self, professor):
+        max_disciplinas = professor.get("max_disciplinas")
+        max_horas = professor.get("max_horas")
+        return (self.max_disciplinas if max_disciplinas is None else _limite(max_disciplinas, "max_disciplinas"),
+                self.max_horas if max_horas is None else _limite(max_horas, "max_horas"))
+
+    # Verificar se um professor (modalidade, área) pode receber disciplinas do grupo
+    def compativel(self, modalidade, area, grupo):
+        tipo, area_grupo = grupo
+        if tipo not in self.atende(modalidade):
+            return False
+        return self.area != AREA_EXIGIR or area_grupo is None or area_grupo == area
+
+
+# Função para validar e compilar regras (um dicionário como o do início do
+# módulo, ou None para as regras padrão). max_disciplinas é o limite usado
+# quando as regras não definem um, para manter o parâmetro de alocacao.alocar().
+def compilar(regras=None, max_disciplinas=None):
+    if isinstance(regras, RegrasCompiladas):
+        return regras
+    regras = dict(regras or {})
+    desconhecidas = set(regras) - set(PADRAO)
+    if desconhecidas:
+        raise ValueError(f"Regras desconhecidas: {', '.join(sorted(desconhecidas))}")
+    if max_disciplinas is not None:
+        regras.setdefault("max_disciplinas", max_disciplinas)
+    completas = {**PADRAO, **regras}
+    pesos = regras.get("pesos") or {}
+    if not isinstance(pesos, dict):
+        raise ValueError("Regra pesos deve mapear cada peso a um número")
+    pesos_desconhecidos = set(pesos) - set(PADRAO["pesos"])
+    if pesos_desconhecidos:
+        raise ValueError(f"Pesos desconhecidos: {', '.join(sorted(pesos_desconhecidos))}")
+    for nome, valor in pesos.items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise ValueError(f"Peso {nome} inválido: {valor!r} (use um número)")
+    completas["pesos"] = {**PADRAO["pesos"], **pesos}
+    if completas["area"] not in MODOS_AREA:
+        raise ValueError(f"Regra area inválida: {completas['area']!r} (use {', '.join(MODOS_AREA)})")
+    if not isinstance(completas["modalidades"], dict):
+        raise ValueError("Regra modalidades deve mapear cada modalidade à lista de tipos atendidos")
+    for modalidade, tipos in completas["modalidades"].items():
+        if not isinstance(tipos, (list, tuple)) or not all(isinstance(t, str) for t in tipos):
+            raise ValueError(f"Regra modalidades inválida para {modalidade}: {tipos!r} (use uma lista de tipos)")
+    return RegrasCompiladas(completas)
+
+
+# Função para ler as regras de um arquivo JSON (já compiladas)
+def ler_regras(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return compilar(json.load(f))
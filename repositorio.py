@@ -0,0 +1,162 @@
+"""
+Repositório dos Dados
+=====================
+
+Professores e disciplinas em memória, compartilhados entre a thread da
+interface, que os edita, e as threads que os leem em segundo plano
+(alocação, gravação, exportação).
+
+As listas do repositório nunca são substituídas, só alteradas no lugar, então
+quem as guardou (como `nucleo.professores`) continua vendo os dados atuais.
+O acesso é controlado por uma trava de leitura e escrita:
+
+- escrita(): exclusiva. Toda alteração dos registros ou das listas acontece
+  dentro dela, e cada escrita incrementa a versão dos dados.
+- leitura(): compartilhada entre várias threads, excluindo as escritas.
+
+Uma thread pode ler dentro da própria escrita e repetir leituras e escritas
+aninhadas, mas não pode começar uma escrita dentro de uma leitura (a trava
+não é promovida). Escritas esperando têm preferência sobre novas leituras, e
+uma edição espera no máximo o fim das leituras em andamento.
+
+Os registros novos recebem de novo_id() o identificador persistente da sua
+coleção (ver registros.py), maior que todos os já carregados ou dados.
+
+Para leituras demoradas, instantaneo() copia os registros sob a trava de
+leitura e devolve a cópia com a versão copiada: a leitura continua sobre a
+cópia, sem travar as edições, e a versão indica se os dados mudaram desde
+então. As edições substituem os valores dos campos, exceto a lista
+"disciplinas_alocadas" dos professores, alterada no lugar pela alocação
+incremental e pelas renomeações, que por isso também é copiada.
+
+Classes:
+-------
+TravaLeituraEscrita: Trava de leitura compartilhada e escrita exclusiva, reentrante
+Instantaneo: Cópia dos dados numa versão (versao, professores, disciplinas)
+Repositorio: As listas de professores e disciplinas, com a trava e a versão
+"""
+
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+class TravaLeituraEscrita:
+    def __init__(self):
+        self._condicao = threading.Condition(threading.Lock())
+        # Leituras em andamento (de todas as threads) e escritas esperando
+        self._leitores = 0
+        self._esperando = 0
+        # Thread com a escrita e quantas escritas aninhadas ela fez
+        self._escritor = None
+        self._escritas = 0
+        # Leituras aninhadas da thread atual
+        self._local = threading.local()
+
+    @contextmanager
+    def leitura(self):
+        eu = threading.get_ident()
+        leituras = getattr(self._local, "leituras", 0)
+        with self._condicao:
+            # Uma leitura aninhada (ou dentro da própria escrita) não espera,
+            # ou ficaria presa atrás de uma escrita que espera por ela
+            if not leituras and self._escritor != eu:
+                while self._escritor is not None or self._esperando:
+                    self._condicao.wait()
+            self._leitores += 1
+        self._local.leituras = leituras + 1
+        try:
+            yield
+        finally:
+            self._local.leituras = leituras
+            with self._condicao:
+                self._leitores -= 1
+                if not self._leitores:
+                    self._condicao.notify_all()
+
+    @contextmanager
+    def escrita(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            if self._escritor == eu:
+                self._escritas += 1
+            else:
+                if getattr(self._local, "leituras", 0):
+                    raise RuntimeError("Escrita iniciada dentro de uma leitura dos dados")
+                self._esperando += 1
+                try:
+                    while self._escritor is not None or self._leitores:
+                        self._condicao.wait()
+                finally:
+                    self._esperando -= 1
+                self._escritor = eu
+                self._escritas = 1
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._escritas -= 1
+                if not self._escritas:
+                    self._escritor = None
+                    self._condicao.notify_all()
+
+
+Instantaneo = namedtuple("Instantaneo", ["versao", "professores", "disciplinas"])
+
+
+# Função para copiar um professor com a sua lista de disciplinas alocadas
+def _copiar_professor(professor):
+    copia = professor.copy()
+    alocadas = professor.get("disciplinas_alocadas")
+    if alocadas is not None:
+        copia["disciplinas_alocadas"] = list(alocadas)
+    return copia
+
+
+class Repositorio:
+    def __init__(self):
+        self.professores = []
+        self.disciplinas = []
+        # Incrementada a cada escrita; um instantâneo é atual enquanto ela não muda
+        self.versao = 0
+        self.trava = TravaLeituraEscrita()
+        # Próximo id de cada coleção (ver novo_id)
+        self._proximo = {"professores": 1, "disciplinas": 1}
+
+    def leitura(self):
+        return self.trava.leitura()
+
+    # Escrita exclusiva; devolve (no "as") a versão anterior a ela, para
+    # conferir se um instantâneo ainda era atual ao começar a escrita
+    @contextmanager
+    def escrita(self):
+        with self.trava.escrita():
+            anterior = self.versao
+            self.versao += 1
+            yield anterior
+
+    # Substituir todos os registros (ao carregar os dados)
+    def substituir(self, professores, disciplinas):
+        with self.escrita():
+            self.professores[:] = professores
+            self.disciplinas[:] = disciplinas
+            for colecao, registros in (("professores", professores), ("disciplinas", disciplinas)):
+                self._proximo[colecao] = max((r.get("id") or 0 for r in registros), default=0) + 1
+
+    # Id de um registro novo da coleção; deve ser chamada sob a escrita
+    def novo_id(self, colecao):
+        identificador = self._proximo[colecao]
+        self._proximo[colecao] += 1
+        return identificador
+
+    # Cópias dos registros de uma coleção ("professores" ou "disciplinas")
+    def copiar(self, colecao):
+        with self.leitura():
+            if colecao == "professores":
+                return [_copiar_professor(p) for p in self.professores]
+            return [d.copy() for d in self.disciplinas]
+
+    # Cópia dos dados, consistente entre as duas coleções, com a versão copiada
+    def instantaneo(self):
+        with self.leitura():
+            return Instantaneo(self.versao, self.copiar("professores"), self.copiar("disciplinas"))
@@ -0,0 +1,167 @@
+"""
+Tabelas da Interface
+====================
+
+Renderização das tabelas (ttk.Treeview) por diferença: a cada atualização só
+as linhas novas são inseridas, só as alteradas são reescritas e as excluídas
+são removidas numa única chamada, em vez de apagar e reinserir a tabela toda.
+
+Com muitas linhas (mais que LIMITE_VIRTUAL), a tabela é virtualizada: só a
+janela de linhas visíveis existe no Treeview, e a barra de rolagem e a roda do
+mouse movem essa janela sobre a lista em memória.
+
+Durante o carregamento inicial, acrescentar() insere só as linhas recém-lidas.
+
+As linhas inseridas, reescritas, movidas e removidas no Treeview são somadas
+aos contadores "tabelas.*" das métricas (ver metricas.py).
+
+Classes:
+-------
+TabelaDiferencial: Mantém um Treeview sincronizado com uma lista de registros
+"""
+
+import metricas
+
+# Número de linhas a partir do qual a tabela é virtualizada
+LIMITE_VIRTUAL = 5000
+
+# Altura aproximada de uma linha do Treeview, em pixels
+ALTURA_LINHA = 20
+
+# Linhas roladas por passo da roda do mouse
+PASSO_RODA = 3
+
+
+# Chave padrão de uma linha: o id persistente do registro (ver registros.py),
+# que não muda quando o registro é editado nem quando os dados são recarregados
+# (os nomes podem se repetir e mudam ao renomear)
+def chave_padrao(registro):
+    return str(registro["id"])
+
+
+class TabelaDiferencial:
+    def __init__(self, tree, barra, valores, chave=chave_padrao, limite_virtual=LIMITE_VIRTUAL):
+        self.tree = tree
+        self.barra = barra
+        self.valores = valores
+        self.chave = chave
+        self.limite_virtual = limite_virtual
+        # Todas as linhas (chave, valores), na ordem dos registros
+        self.linhas = []
+        # Linhas presentes no Treeview: chave -> valores, e a ordem delas
+        self.exibidas = {}
+        self.ordem = []
+        self.virtual = False
+        # Primeira linha da janela exibida, no modo virtual
+        self.inicio = 0
+
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(evento, self._roda, add="+")
+        self.tree.bind("<Configure>", self._redimensionar, add="+")
+
+    # Sincronizar a tabela com a lista de registros
+    def atualizar(self, registros):
+        self.linhas = [(self.chave(registro), self.valores(registro)) for registro in registros]
+        virtual = len(self.linhas) > self.limite_virtual
+        if virtual != self.virtual:
+            self._configurar_rolagem(virtual)
+        self._renderizar()
+
+    # Acrescentar registros no fim da tabela (carregamento aos poucos), sem
+    # recalcular as linhas já existentes
+    def acrescentar(self, registros):
+        novas = [(self.chave(registro), self.valores(registro)) for registro in registros]
+        if not novas:
+            return
+        self.linhas.extend(novas)
+        virtual = len(self.linhas) > self.limite_virtual
+        if virtual != self.virtual:
+            self._configurar_rolagem(virtual)
+        if self.virtual:
+            self._renderizar()
+            return
+        for chave, valores in novas:
+            self.tree.insert("", "end", iid=chave, values=valores)
+            self.exibidas[chave] = valores
+            self.ordem.append(chave)
+        metricas.contar("tabelas.linhas_inseridas", len(novas))
+
+    def _configurar_rolagem(self, virtual):
+        self.virtual = virtual
+        self.inicio = 0
+        if virtual:
+            self.barra.configure(command=self.rolar)
+            self.tree.configure(yscrollcommand="")
+        else:
+            self.barra.configure(command=self.tree.yview)
+            self.tree.configure(yscrollcommand=self.barra.set)
+
+    # Número de linhas que cabem na área visível da tabela
+    def visiveis(self):
+        return max(int(self.tree.cget("height")), self.tree.winfo_height() // ALTURA_LINHA)
+
+    def _renderizar(self):
+        if not self.virtual:
+            self._aplicar(self.linhas)
+            return
+        visiveis = self.visiveis()
+        self.inicio = max(0, min(self.inicio, len(self.linhas) - visiveis))
+        self._aplicar(self.linhas[self.inicio:self.inicio + visiveis])
+        total = len(self.linhas)
+        self.barra.set(self.inicio / total, min(1.0, (self.inicio + visiveis) / total))
+
+    # Levar o Treeview das linhas exibidas às linhas informadas com o mínimo de
+    # chamadas ao Tk
+    def _aplicar(self, linhas):
+        novas = dict(linhas)
+        removidas = [chave for chave in self.ordem if chave not in novas]
+        if removidas:
+            self.tree.delete(*removidas)
+
+        # As linhas mantidas só precisam ser movidas se a ordem relativa mudou
+        mantidas = [chave for chave, _ in linhas if chave in self.exibidas]
+        mover = mantidas != [chave for chave in self.ordem if chave in novas]
+        restantes = len(mantidas)
+        reescritas = 0
+
+        for indice, (chave, valores) in enumerate(linhas):
+            anteriores = self.exibidas.get(chave)
+            if anteriores is None:
+                # Depois da última linha mantida, inserir no fim é mais barato
+                self.tree.insert("", indice if restantes else "end", iid=chave, values=valores)
+                continue
+            restantes -= 1
+            if anteriores != valores:
+                self.tree.item(chave, values=valores)
+                reescritas += 1
+            if mover:
+                self.tree.move(chave, "", indice)
+
+        self.exibidas = novas
+        self.ordem = [chave for chave, _ in linhas]
+        metricas.contar("tabelas.linhas_inseridas", len(linhas) - len(mantidas))
+        metricas.contar("tabelas.linhas_reescritas", reescritas)
+        metricas.contar("tabelas.linhas_movidas", len(mantidas) if mover else 0)
+        metricas.contar("tabelas.linhas_removidas", len(removidas))
+
+    # Comando da barra de rolagem no modo virtual ("moveto" ou "scroll")
+    def rolar(self, acao, quantidade, unidade=None):
+        if acao == "moveto":
+            self.inicio = int(float(quantidade) * len(self.linhas))
+        else:
+            passo = self.visiveis() if unidade == "pages" else 1
+            self.inicio += int(quantidade) * passo
+        self._renderizar()
+
+    # Com a tabela redimensionada, cabem mais (ou menos) linhas na janela virtual
+    def _redimensionar(self, evento):
+        if self.virtual:
+            self._renderizar()
+
+    def _roda(self, evento):
+        if not self.virtual:
+            return None
+        para_cima = evento.num == 4 or getattr(evento, "delta", 0) > 0
+        self.rolar("scroll", -PASSO_RODA if para_cima else PASSO_RODA, "units")
+        # Impedir que a rolagem da janela principal também aconteça
+        return "break"